@@ -13,40 +13,72 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
-# Quick-start development settings - unsuitable for production
+# Deployment profile
+# DJANGO_ENV=production (set in the Dockerfile) turns DEBUG off, requires
+# DJANGO_SECRET_KEY, keeps database connections open between requests and
+# serves hashed, compressed static files. The default 'development' profile
+# keeps the quick-start settings below.
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
+PRODUCTION = os.environ.get('DJANGO_ENV', 'development') == 'production'
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-94()(u8wm-^n&7bvg^o1)*rr52d(+nhyx9nazm=qc**uibb1td'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    if PRODUCTION:
+        raise ImproperlyConfigured('DJANGO_SECRET_KEY must be set when DJANGO_ENV=production.')
+    SECRET_KEY = 'django-insecure-94()(u8wm-^n&7bvg^o1)*rr52d(+nhyx9nazm=qc**uibb1td'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '0' if PRODUCTION else '1') == '1'
 
-ALLOWED_HOSTS = [
-    '192.168.100.10', 
-    # Or for broader access (dev only!): '*'
-]
+# Comma separated; '*' allows any host (dev only!).
+ALLOWED_HOSTS = [h for h in os.environ.get('ALLOWED_HOSTS', '192.168.100.10').split(',') if h]
 
 
 # Application definition
 
+# Seconds a connection to the videos database is kept for the next request
+# (0 opens one per request). Django advises against persistent connections
+# under ASGI, so the production default is 0 with ASYNC_VIEWS=1.
+DB_CONN_MAX_AGE = int(os.environ.get(
+    'DB_CONN_MAX_AGE', '60' if PRODUCTION and os.environ.get('ASYNC_VIEWS', '0') != '1' else '0',
+))
+# DB_ENGINE=django.db.backends.sqlite3 with DB_NAME=<file> runs against a
+# SQLite stand-in, as `manage.py bench_server` does.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.mysql')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': DB_ENGINE,
         'NAME': os.environ.get('DB_NAME', 'alltdjli_pas'),
         'USER': os.environ.get('DB_USER', 'alltdjli'),
         'PASSWORD': os.environ.get('DB_PASS', 'Um+2W=$-N_b+'),
         'HOST': os.environ.get('DB_HOST', '192.168.100.149'),
         'PORT': os.environ.get('DB_PORT', '3306'),
-        'OPTIONS': {'charset': 'utf8mb4'},
-    }
+        'OPTIONS': {'charset': 'utf8mb4'} if DB_ENGINE.endswith('mysql') else {},
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        # Check a reused connection before the request's first query, so one
+        # dropped by MySQL's wait_timeout is replaced instead of failing.
+        'CONN_HEALTH_CHECKS': DB_CONN_MAX_AGE > 0,
+    },
+    # App-owned local state (search index, caches) kept next to the app rather
+    # than in the shared MySQL database.
+    'local': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('LOCAL_DB_PATH', BASE_DIR / 'local.sqlite3'),
+    },
 }
 
+DATABASE_ROUTERS = ['videos.routers.LocalStateRouter']
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -58,6 +90,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'videos.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +99,9 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if PRODUCTION:
+    # Serve STATIC_ROOT from the app; in development runserver serves static files itself.
+    MIDDLEWARE.insert(2, 'whitenoise.middleware.WhiteNoiseMiddleware')
 
 ROOT_URLCONF = 'atp_admin_ui.urls'
 
@@ -127,8 +163,97 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/'
+# Filled by `manage.py collectstatic` (run in the Docker build) and served by
+# WhiteNoise. In production file names carry a content hash, so they are cached
+# for good, and gzip/brotli copies are stored next to them.
+STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage' if PRODUCTION
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Video search
+# 'orm' runs icontains filters against the videos table, 'index' uses the local
+# full-text index built by `manage.py build_search_index`. A dotted path to a
+# custom backend class is also accepted.
+
+VIDEOS_SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'orm')
+
+
+# Video list pagination
+# 'page' numbers pages with COUNT + OFFSET, 'cursor' seeks on (created_at, id)
+# so deep pages cost the same as the first. `?paging=cursor` opts in per request.
+
+VIDEOS_PAGINATION = os.environ.get('LIST_PAGINATION', 'page')
+
+
+# Video list columns
+# Columns shown until a user picks their own (comma separated, default: all).
+# Text columns are cut to VIDEOS_LIST_TRUNCATE characters by the query.
+
+VIDEOS_LIST_COLUMNS = [c for c in os.environ.get('LIST_COLUMNS', '').split(',') if c]
+VIDEOS_LIST_TRUNCATE = int(os.environ.get('LIST_TRUNCATE', '100'))
+
+
+# List result cache
+# Pages of list/search results (primary keys and counts) are cached in the
+# 'results' cache. RESULT_CACHE=file (default) shares them between worker
+# processes through RESULT_CACHE_DIR; 'locmem' keeps them per process and
+# 'off' disables caching. Entries expire after RESULT_CACHE_TTL seconds.
+
+RESULT_CACHE = os.environ.get('RESULT_CACHE', 'file')
+RESULT_CACHE_BACKENDS = {
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if RESULT_CACHE in RESULT_CACHE_BACKENDS:
+    CACHES['results'] = {
+        'BACKEND': RESULT_CACHE_BACKENDS[RESULT_CACHE],
+        'LOCATION': os.environ.get('RESULT_CACHE_DIR', str(BASE_DIR / 'cache')) if RESULT_CACHE == 'file' else 'results',
+        'TIMEOUT': int(os.environ.get('RESULT_CACHE_TTL', '300')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+VIDEOS_RESULT_CACHE = 'results' if 'results' in CACHES else None
+
+
+# Background jobs
+# 'thread' runs queued jobs in a background thread of the web process,
+# 'worker' leaves them to `manage.py run_jobs` worker processes.
+
+VIDEOS_JOBS_MODE = os.environ.get('JOBS_MODE', 'thread')
+
+
+# Async views
+# With ASYNC_VIEWS=1 the list and edit pages use the async views in
+# videos/async_views.py; serve the app from asgi.py (see gunicorn.conf.py).
+# Upload parsing runs on a pool of VIDEOS_FS_WORKERS threads.
+
+VIDEOS_ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+VIDEOS_FS_WORKERS = int(os.environ.get('FS_WORKERS', '8'))
+
+
+# Performance metrics
+# Every response carries a Server-Timing header; totals are served at /metrics/.
+# Set METRICS_DIR to a directory shared by all processes (gunicorn workers,
+# run_jobs) so /metrics/ reports their sum rather than one worker's numbers.
+
+VIDEOS_METRICS_DIR = os.environ.get('METRICS_DIR') or None
+
+
+# JSON sidecars
+# SIDECAR_ENCODER=orjson encodes and parses sidecars with orjson (pip install
+# orjson); the default uses the standard library json module.
+
+VIDEOS_SIDECAR_ENCODER = os.environ.get('SIDECAR_ENCODER', 'json')
@@ -0,0 +1,7 @@
+#!/bin/sh
+# Container entrypoint: create or upgrade the app-owned tables in the local
+# SQLite file (LOCAL_DB_PATH) before running the command, so a plain
+# `podman run` of the image works without a separate migrate step.
+set -e
+python manage.py migrate --database=local --noinput
+exec "$@"
@@ -0,0 +1,36 @@
+# gunicorn.conf.py
+# Production server, run with DJANGO_ENV=production (see settings.py):
+#   gunicorn -c gunicorn.conf.py
+# Serves wsgi.py on threaded workers, or asgi.py on uvicorn workers when
+# ASYNC_VIEWS=1 so the async views get an event loop.
+import os
+
+# Imported up front: child_exit runs in the master's SIGCHLD handling.
+from videos.metrics import mark_process_dead
+
+bind = os.environ.get('BIND', '0.0.0.0:8001')
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+if os.environ.get('ASYNC_VIEWS', '0') == '1':
+    wsgi_app = 'atp_admin_ui.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'atp_admin_ui.wsgi:application'
+    worker_class = 'gthread'
+    # Each thread keeps its own persistent database connection (CONN_MAX_AGE).
+    threads = int(os.environ.get('WEB_THREADS', '4'))
+# Large uploads are slow requests, not hung workers.
+timeout = int(os.environ.get('WEB_TIMEOUT', '600'))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so a slow leak cannot grow without bound.
+max_requests = 2000
+max_requests_jitter = 200
+# Heartbeat files on tmpfs; a container's overlay filesystem can stall them.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = '-'
+
+
+def child_exit(server, worker):
+    # Workers fold their own metrics file as they exit; this covers the ones
+    # that were killed (timeout, OOM) and would leave it in METRICS_DIR.
+    mark_process_dead(worker.pid, os.environ.get('METRICS_DIR'))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VideosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'videos'
+
+    def ready(self):
+        # Register job queue tasks and the SQL timing hook.
+        from . import tasks, bulk, duplicates, facets, media, metrics  # noqa: F401
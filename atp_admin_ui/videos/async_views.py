@@ -0,0 +1,106 @@
+# videos/async_views.py
+"""Async variants of the list and edit views, used when ASYNC_VIEWS is on.
+
+Under ASGI these keep no worker thread busy while waiting: plain querysets
+are counted and paged with the async ORM, with the result cache read and
+written off the event loop, and parsing an upload into FS_PATH
+runs on a bounded thread pool (``VIDEOS_FS_WORKERS``) so a slow volume cannot
+take every thread with it. Everything else reuses the sync views' code.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import QuerySet
+from django.http import Http404
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import Video
+from .resultcache import aload_page, alookup, aquery_key, astore, get_cache
+from .uploads import StagedUploadHandler
+from .views import VideoListView, VideoUpdateView
+
+FS_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'VIDEOS_FS_WORKERS', 8), thread_name_prefix='videos-fs',
+)
+
+
+async def run_fs(func, *args, **kwargs):
+    """Run blocking filesystem work on the bounded FS executor."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables over so the work is counted against this request.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(FS_EXECUTOR, partial(context.run, func, *args, **kwargs))
+
+
+class AsyncVideoListView(VideoListView):
+    async def get(self, request, *args, **kwargs):
+        self.object_list = await sync_to_async(self.get_queryset)()
+        self.page_parts = await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        context = await sync_to_async(self.get_context_data)()
+        return self.render_to_response(context)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        if self.cursor_mode() or not isinstance(queryset, QuerySet):
+            return await sync_to_async(super().paginate_queryset)(queryset, page_size)
+        cached = get_cache() is not None
+        # The plain paginator: VideoListView.get_paginator reads the cache synchronously.
+        paginator = super(VideoListView, self).get_paginator(queryset, page_size)
+        key = await aquery_key(queryset, 'count') if cached else None
+        count = await alookup(key) if key else None
+        if count is None:
+            count = await queryset.acount()
+            if key:
+                await astore(key, count)
+        # Paginator.count is a cached_property; fill it without a sync query.
+        paginator.count = count
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page_number = paginator.num_pages if page == 'last' else int(page)
+        except ValueError:
+            raise Http404('Page is not “last”, nor can it be converted to an int.')
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as e:
+            raise Http404(f'Invalid page ({page_number}): {e}')
+        key = await aquery_key(queryset, page_size, page.number) if cached else None
+        pks = await alookup(key) if key else None
+        if pks is None:
+            page.object_list = [video async for video in page.object_list]
+            if key:
+                await astore(key, [video.pk for video in page.object_list])
+        else:
+            page.object_list = await aload_page(queryset, pks)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.page_parts
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncVideoUpdateView(VideoUpdateView):
+    async def aget_object(self):
+        try:
+            return await self.get_queryset().aget(pk=self.kwargs[self.pk_url_kwarg])
+        except Video.DoesNotExist:
+            raise Http404('No video found matching the query')
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        # The context reads the video's media probes and stats its thumbnail.
+        context = await sync_to_async(self.get_context_data)()
+        return self.render_to_response(context)
+
+    async def post(self, request, *args, **kwargs):
+        request.upload_handlers.insert(0, StagedUploadHandler(request))
+        # Parsing the multipart body is what writes uploads into FS_PATH.
+        await run_fs(lambda: request.FILES)
+        return await sync_to_async(self._post)(request, *args, **kwargs)
+
+    async def put(self, *args, **kwargs):
+        return await self.post(*args, **kwargs)
@@ -0,0 +1,157 @@
+# videos/bench.py
+"""Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks never touch the production database: they register a throwaway
+SQLite alias, create the (unmanaged) videos table in it and fill it with
+synthetic rows. ``bench_suite`` goes further and swaps ``default`` and
+``local`` for SQLite files, so whole requests can be replayed.
+"""
+import os
+import random
+import statistics
+import string
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connections
+
+from .models import Video
+from .paths import get_fs_path
+
+PREACHERS = [
+    'Pastor Steven Anderson', 'Pastor Roger Jimenez', 'Pastor Aaron Thompson',
+    'Pastor Jonathan Shelley', 'Evangelist Oliver Morales', 'Brother Ramsey',
+]
+CATEGORIES = ['Sermons', 'Documentaries', 'Soulwinning', 'Music', 'Bible Study']
+LANGUAGES = ['en', 'es', 'de', 'ru', 'pt']
+WORDS = [
+    'faith', 'grace', 'salvation', 'prophecy', 'romans', 'genesis', 'psalms',
+    'church', 'baptism', 'heaven', 'gospel', 'revelation', 'proverbs', 'daniel',
+]
+
+
+@contextmanager
+def bench_database(path, alias='bench', create_table=True):
+    """Register a SQLite database at ``path`` as ``alias``, with a videos table."""
+    connections.databases[alias] = connections.configure_settings({
+        'default': connections.databases['default'],
+        alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path)},
+    })[alias]
+    try:
+        if create_table:
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(Video)
+        yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+
+@contextmanager
+def swapped_databases(directory, aliases=('default', 'local')):
+    """Point ``aliases`` at migrated SQLite files in ``directory`` for the whole app.
+
+    Views, jobs and signal handlers all see the swap, which lasts until the
+    block exits; the configured databases are never connected to. ``default``
+    also gets an empty videos table.
+    """
+    saved = {alias: connections.databases[alias] for alias in aliases}
+    configured = connections.configure_settings({
+        'default': connections.databases['default'],
+        **{alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(directory, f'{alias}.sqlite3')}
+           for alias in aliases},
+    })
+
+    def reset():
+        for connection in connections.all(initialized_only=True):
+            if connection.alias in aliases:
+                connection.close()
+                del connections[connection.alias]
+
+    reset()
+    try:
+        for alias in aliases:
+            connections.databases[alias] = configured[alias]
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+        if 'default' in aliases:
+            with connections['default'].schema_editor() as editor:
+                editor.create_model(Video)
+        yield
+    finally:
+        reset()
+        connections.databases.update(saved)
+
+
+def generate_media(videos, exts=('mp4', 'jpg'), size=4096):
+    """Write a ``size`` byte placeholder for each of ``exts`` of every video under FS_PATH."""
+    content = b'\0' * size
+    for video in videos:
+        for ext in exts:
+            with open(get_fs_path(video, ext), 'wb') as f:
+                f.write(content)
+
+
+def _title(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).title()
+
+
+def generate_videos(count, using, duplicate_rate=0.0, code_size=200, batch_size=5000, seed=0):
+    """Bulk insert ``count`` synthetic rows; ``duplicate_rate`` reuses video_ids."""
+    rng = random.Random(seed)
+    batch = []
+    for pk in range(1, count + 1):
+        if pk > 1 and rng.random() < duplicate_rate:
+            video_id = f'vid{rng.randint(1, pk - 1):08d}'
+        else:
+            video_id = f'vid{pk:08d}'
+        title = _title(rng, rng.randint(2, 6))
+        day = f'20{rng.randint(10, 24):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+        category = rng.choice(CATEGORIES)
+        preacher = rng.choice(PREACHERS)
+        rel = f'video/{category.lower().replace(" ", "_")}/{video_id}_{pk}.mp4'
+        batch.append(Video(
+            id=pk,
+            vid_category=category,
+            search_category=category.lower(),
+            vid_preacher=preacher,
+            name=title,
+            vid_title=title,
+            vid_code=''.join(rng.choices(string.ascii_letters + ' ', k=code_size)),
+            date=f'{day} 00:00:00',
+            vid_url=f'https://www.kjv1611only.com/{rel}',
+            video_id=video_id,
+            main_category=f'{category} ({preacher})',
+            profile_id=rng.randint(1, 50),
+            created_at=f'{day} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}',
+            clicks=rng.randint(0, 10000),
+            shorts=0,
+            language=rng.choice(LANGUAGES),
+            thumb_url=f'https://www.kjv1611only.com/{rel[:-4]}.jpg',
+        ))
+        if len(batch) >= batch_size:
+            Video.objects.using(using).bulk_create(batch)
+            batch = []
+    if batch:
+        Video.objects.using(using).bulk_create(batch)
+
+
+def measure(func, repeat=5):
+    """Run ``func`` ``repeat`` times and return timing stats in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'min': timings[0],
+        'median': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        'max': timings[-1],
+    }
+
+
+def format_stats(stats):
+    return ' '.join(f'{k}={v:.2f}ms' for k, v in stats.items())
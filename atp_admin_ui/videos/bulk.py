@@ -0,0 +1,127 @@
+# videos/bulk.py
+"""Bulk edit/delete actions on many videos, run on the job queue.
+
+Database changes are issued as one UPDATE/DELETE per batch of ids; the file
+side (sidecar rewrites, file deletion) runs on a thread pool. Progress is
+recorded on the ``Job`` row so the job page can poll it.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ValidationError
+
+from .duplicates import KEY_FIELDS, invalidate_groups
+from .filestatus import invalidate_file_statuses
+from .jobs import enqueue, task
+from .media import remove_probes
+from .mappings import DB_FIELDS
+from .metrics import track_fs
+from .models import Video
+from .paths import MEDIA_EXTENSIONS, resolve_fs_path
+from .resultcache import invalidate_results
+from .facets import FACET_FIELDS, record_change
+from .search import get_search_backend
+from .sidecars import write_sql_params
+from .thumbnails import remove_derivatives
+
+ACTIONS = {
+    'set_field': 'Set field value',
+    'delete_db': 'Delete DB entries only',
+    'delete_all': 'Delete all files and DB entries',
+}
+EDITABLE_FIELDS = [f for f in DB_FIELDS if f != 'id']
+FACET_COLUMNS = [DB_FIELDS.index(f) for f in FACET_FIELDS]
+
+BATCH_SIZE = 1000
+FILE_WORKERS = 8
+
+
+def start_bulk_job(action, ids, field=None, value=None):
+    """Validate a bulk action and queue it as a Job."""
+    if action not in ACTIONS:
+        raise ValidationError(f'Unknown bulk action: {action}')
+    if not ids:
+        raise ValidationError('No videos selected.')
+    payload = {'ids': sorted(set(ids))}
+    if action == 'set_field':
+        if field not in EDITABLE_FIELDS:
+            raise ValidationError(f'Field cannot be bulk edited: {field}')
+        model_field = Video._meta.get_field(field)
+        value = model_field.to_python(value if value != '' or not model_field.null else None)
+        payload.update(field=field, value=value)
+    return enqueue(f'bulk_{action}', payload, total=len(payload['ids']))
+
+
+def _batches(ids):
+    for i in range(0, len(ids), BATCH_SIZE):
+        yield ids[i:i + BATCH_SIZE]
+
+
+def _rewrite_sidecar(row):
+    path = resolve_fs_path(row[DB_FIELDS.index('vid_url')], 'json')
+    try:
+        return write_sql_params(path, dict(zip(DB_FIELDS, row)))
+    except FileNotFoundError:
+        return False
+
+
+def _delete_files(vid_url):
+    deleted = 0
+    for ext in MEDIA_EXTENSIONS:
+        try:
+            with track_fs('unlink'):
+                os.remove(resolve_fs_path(vid_url, ext))
+            deleted += 1
+        except FileNotFoundError:
+            pass
+    remove_derivatives(vid_url)
+    return deleted
+
+
+@task('bulk_set_field')
+def run_set_field(job):
+    field, value = job.payload['field'], job.payload['value']
+    backend = get_search_backend()
+    with ThreadPoolExecutor(FILE_WORKERS) as pool:
+        for batch in _batches(job.payload['ids']):
+            if field in FACET_FIELDS:
+                before = list(Video.objects.filter(pk__in=batch).values_list(*FACET_FIELDS))
+            updated = Video.objects.filter(pk__in=batch).update(**{field: value})
+            invalidate_results()
+            rows = list(Video.objects.filter(pk__in=batch).values_list(*DB_FIELDS))
+            if field in FACET_FIELDS:
+                record_change(removed=before, added=[[row[i] for i in FACET_COLUMNS] for row in rows])
+            if field in KEY_FIELDS:
+                invalidate_groups()
+            rewritten = sum(pool.map(_rewrite_sidecar, rows))
+            backend.update_many(Video(**dict(zip(DB_FIELDS, row))) for row in rows)
+            job.advance(len(batch), f'{updated} rows set {field}={value!r}, {rewritten} sidecars rewritten')
+
+
+def run_delete(job, delete_files):
+    backend = get_search_backend()
+    with ThreadPoolExecutor(FILE_WORKERS) as pool:
+        for batch in _batches(job.payload['ids']):
+            deleted_files = 0
+            removed = list(Video.objects.filter(pk__in=batch).values_list(*FACET_FIELDS))
+            if delete_files:
+                vid_urls = Video.objects.filter(pk__in=batch).values_list('vid_url', flat=True)
+                deleted_files = sum(pool.map(_delete_files, list(vid_urls)))
+            deleted, _ = Video.objects.filter(pk__in=batch).delete()
+            invalidate_results()
+            record_change(removed=removed)
+            invalidate_groups()
+            backend.remove_many(batch)
+            invalidate_file_statuses(batch)
+            remove_probes(batch)
+            job.advance(len(batch), f'{deleted} rows deleted, {deleted_files} files deleted')
+
+
+@task('bulk_delete_db')
+def run_delete_db(job):
+    run_delete(job, delete_files=False)
+
+
+@task('bulk_delete_all')
+def run_delete_all(job):
+    run_delete(job, delete_files=True)
@@ -0,0 +1,88 @@
+# videos/columns.py
+"""Visible columns of the video list.
+
+The list query loads only the selected columns (plus the few the page always
+needs), long text columns are cut short by the database, and each row's cells
+are computed once in Python instead of through a template filter per cell.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import TextField
+from django.db.models.functions import Substr
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .mappings import DB_FIELDS
+from .models import Video
+
+# Row link, file status lookup and cursor paging.
+ALWAYS_LOADED = ['id', 'vid_url', 'created_at']
+COOKIE_NAME = 'list_columns'
+
+
+def default_columns():
+    return [c for c in getattr(settings, 'VIDEOS_LIST_COLUMNS', None) or DB_FIELDS if c in DB_FIELDS]
+
+
+def truncate_at():
+    return getattr(settings, 'VIDEOS_LIST_TRUNCATE', 100)
+
+
+def parse_columns(value):
+    """Columns from a comma separated list, in DB_FIELDS order; None if none are valid."""
+    wanted = set(value.split(',')) if value else set()
+    return [c for c in DB_FIELDS if c in wanted] or None
+
+
+def long_text_columns(columns):
+    return [c for c in columns if isinstance(Video._meta.get_field(c), TextField)]
+
+
+def preview_name(column):
+    return f'{column}_preview'
+
+
+def project(queryset, columns):
+    """Restrict ``queryset`` to the fields rendering ``columns`` needs."""
+    long_text = long_text_columns(columns)
+    loaded = dict.fromkeys(c for c in ALWAYS_LOADED + columns if c not in long_text)
+    # One character past the limit tells the accessor whether to add an ellipsis.
+    previews = {preview_name(c): Substr(c, 1, truncate_at() + 1) for c in long_text}
+    return queryset.only(*loaded).annotate(**previews)
+
+
+def _truncated(column, limit):
+    get = attrgetter(preview_name(column))
+
+    def accessor(video):
+        value = get(video)
+        if value and len(value) > limit:
+            return value[:limit] + '…'
+        return value
+    return accessor
+
+
+def _link(video):
+    return format_html('<a href="{}">{}</a>', reverse('video_update', args=[video.id]), video.id)
+
+
+def compile_accessors(columns):
+    """One ``accessor(video) -> cell`` per column."""
+    long_text = long_text_columns(columns)
+    limit = truncate_at()
+    accessors = []
+    for column in columns:
+        if column == 'id':
+            accessors.append(_link)
+        elif column in long_text:
+            accessors.append(_truncated(column, limit))
+        else:
+            accessors.append(attrgetter(column))
+    return accessors
+
+
+def build_rows(videos, columns):
+    """``[(video, cells)]`` for the list template."""
+    accessors = compile_accessors(columns)
+    return [(video, [accessor(video) for accessor in accessors]) for video in videos]
@@ -0,0 +1,128 @@
+# videos/duplicates.py
+"""Duplicate detection over the videos table.
+
+Duplicate groups are computed with one GROUP BY per key and materialized into
+``DuplicateGroup`` in the local database, so the list view pages over the
+stored groups and only loads the videos of the groups on the current page.
+Stale groups, and groups after videos are saved or deleted, are rebuilt by a
+``duplicates`` job rather than in the request that notices them.
+``iter_duplicate_rows`` streams every duplicated row with a single windowed
+query for bulk reports.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Value, Window
+from django.db.models.functions import Concat, Left, Lower, Trim
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import Video, DuplicateGroup
+
+DUPLICATE_KEYS = {
+    'video_id': 'Video ID',
+    'vid_url': 'Video URL',
+    'title_date': 'Title + date',
+}
+
+MAX_AGE = timedelta(minutes=10)
+# Columns the keys are computed from; saves that change none of them keep the groups.
+KEY_FIELDS = {'video_id', 'vid_url', 'name', 'date'}
+
+
+def key_expression(key_name):
+    if key_name == 'title_date':
+        return Concat(Lower(Trim('name')), Value('|'), Left('date', 10))
+    if key_name not in DUPLICATE_KEYS:
+        raise ValueError(f'Unknown duplicate key: {key_name}')
+    return F(key_name)
+
+
+def group_queryset(key_name, using='default'):
+    """``{'dup_key', 'count', 'newest'}`` for every key shared by more than one video."""
+    return (
+        Video.objects.using(using)
+        .annotate(dup_key=key_expression(key_name))
+        .values('dup_key')
+        .annotate(count=Count('id'), newest=Max('created_at'))
+        .filter(count__gt=1)
+        .order_by()
+    )
+
+
+def refresh_groups(key_name, using='default', batch_size=5000):
+    """Recompute the duplicate groups for ``key_name`` and store them."""
+    groups = group_queryset(key_name, using)
+    now = timezone.now()
+    with transaction.atomic(using='local'):
+        DuplicateGroup.objects.filter(key_name=key_name).delete()
+        batch = []
+        for group in groups.iterator(chunk_size=batch_size):
+            batch.append(DuplicateGroup(
+                key_name=key_name, key=group['dup_key'], count=group['count'],
+                newest=group['newest'] or '', refreshed_at=now,
+            ))
+            if len(batch) >= batch_size:
+                DuplicateGroup.objects.bulk_create(batch)
+                batch = []
+        DuplicateGroup.objects.bulk_create(batch)
+        # Marker row so an empty result still counts as fresh.
+        DuplicateGroup.objects.create(key_name=key_name, key='', count=0, newest='', refreshed_at=now)
+
+
+def last_refreshed(key_name):
+    marker = DuplicateGroup.objects.filter(key_name=key_name, count=0).first()
+    return marker.refreshed_at if marker else None
+
+
+def queue_refresh(key_name):
+    return enqueue('duplicates', {'key_name': key_name}, key=f'duplicates:{key_name}', total=1)
+
+
+@task('duplicates')
+def run_refresh(job):
+    refresh_groups(job.payload['key_name'])
+    job.advance(1, f"Duplicate groups by {job.payload['key_name']} refreshed.")
+
+
+def invalidate_groups():
+    """Queue a refresh of every stored key, after videos were deleted or their KEY_FIELDS changed."""
+    for key_name in DuplicateGroup.objects.filter(count=0).values_list('key_name', flat=True):
+        queue_refresh(key_name)
+
+
+def get_groups(key_name, max_age=MAX_AGE):
+    """Stored groups for ``key_name``, newest first; queues a refresh when they are stale or missing."""
+    refreshed = last_refreshed(key_name)
+    if refreshed is None or timezone.now() - refreshed > max_age:
+        queue_refresh(key_name)
+    return DuplicateGroup.objects.filter(key_name=key_name, count__gt=1).order_by('-newest', 'key')
+
+
+def group_members(key_name, keys, using='default'):
+    if key_name == 'title_date':
+        videos = Video.objects.using(using).annotate(dup_key=key_expression(key_name)).filter(dup_key__in=keys)
+    else:
+        videos = Video.objects.using(using).filter(**{f'{key_name}__in': keys}).annotate(dup_key=F(key_name))
+    return videos.order_by('-created_at')
+
+
+def videos_for_groups(key_name, keys):
+    """Videos of the given groups as ``{key: [video, ...]}`` in ``keys`` order."""
+    grouped = {key: [] for key in keys}
+    for video in group_members(key_name, keys):
+        grouped.setdefault(video.dup_key, []).append(video)
+    return grouped
+
+
+def iter_duplicate_rows(key_name, fields, using='default', chunk_size=2000):
+    """Yield ``(dup_key, count, *fields)`` for every duplicated row, grouped by key."""
+    expression = key_expression(key_name)
+    rows = (
+        Video.objects.using(using)
+        .annotate(dup_key=expression, dup_count=Window(Count('id'), partition_by=[expression]))
+        .filter(dup_count__gt=1)
+        .order_by('dup_key', '-created_at')
+        .values_list('dup_key', 'dup_count', *fields)
+    )
+    return rows.iterator(chunk_size=chunk_size)
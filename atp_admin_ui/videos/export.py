@@ -0,0 +1,94 @@
+# videos/export.py
+"""Streaming CSV and JSON Lines exports of the video list.
+
+Rows are read ``CHUNK_SIZE`` at a time and encoded as they go out, so an
+export holds one chunk in memory whatever its size. ``VideoExportView``
+feeds these generators to a ``StreamingHttpResponse``.
+"""
+import csv
+import json
+import zlib
+
+from django.db import connections
+
+from .mappings import DB_FIELDS
+from .pagination import CursorPaginator
+from .search import RankedResults
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+CREATED_AT = DB_FIELDS.index('created_at')
+
+
+def iter_rows(results, chunk_size=CHUNK_SIZE):
+    """``DB_FIELDS`` tuples of a list queryset or ranked search results, in list order."""
+    if isinstance(results, RankedResults):
+        for start in range(0, len(results.pks), chunk_size):
+            chunk = results.pks[start:start + chunk_size]
+            rows = {row[0]: row for row in results.queryset.filter(pk__in=chunk).values_list(*DB_FIELDS)}
+            yield from (rows[pk] for pk in chunk if pk in rows)
+        return
+    if connections[results.db].vendor != 'mysql':
+        yield from results.values_list(*DB_FIELDS).iterator(chunk_size=chunk_size)
+        return
+    # MySQLdb buffers a whole result set client-side, so iterator() would
+    # not bound memory there; seek through the list ordering instead.
+    paginator = CursorPaginator(results, chunk_size)
+    rows = list(paginator.queryset.values_list(*DB_FIELDS)[:chunk_size])
+    while rows:
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+        rows = list(paginator.seek(last[CREATED_AT], last[0], 'next').values_list(*DB_FIELDS)[:chunk_size])
+
+
+class _Echo:
+    """File-like object whose ``write`` returns what it was given, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(DB_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(DB_FIELDS, row)), ensure_ascii=False) + '\n'
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Join lines into UTF-8 chunks of about ``size`` bytes, so the server writes blocks, not rows."""
+    parts, length = [], 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(parts).encode()
+            parts, length = [], 0
+    if parts:
+        yield ''.join(parts).encode()
+
+
+def gzipped(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(results, fmt, compress=False):
+    lines = csv_lines if fmt == 'csv' else jsonl_lines
+    chunks = buffered(lines(iter_rows(results)))
+    return gzipped(chunks) if compress else chunks
@@ -0,0 +1,144 @@
+# videos/facets.py
+"""Faceted filtering of the video list with precomputed counts.
+
+The number of videos per value of each ``FACET_FIELDS`` column is stored in
+``FacetCount`` in the local database. It is rebuilt with one GROUP BY per
+field by a ``facets`` job queued when they are older than ``MAX_AGE`` (or by
+``manage.py refresh_facets``) and adjusted in between by ``record_change``
+whenever the app saves or deletes videos, so drawing the facet panel is a
+single indexed read. Counts are for the whole catalogue, not for the current
+filter: counting within the results would take those GROUP BYs on every
+filtered request.
+"""
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import Video, FacetCount
+
+FACET_FIELDS = ['vid_category', 'search_category', 'main_category', 'vid_preacher', 'language']
+# Values shown per facet, besides the selected ones.
+FACET_LIMIT = 15
+MAX_AGE = timedelta(hours=1)
+
+
+def selected_facets(params):
+    """``{field: [values]}`` of the facet filters in a QueryDict."""
+    return {field: params.getlist(field) for field in FACET_FIELDS if params.getlist(field)}
+
+
+def filter_facets(queryset, params):
+    """Restrict ``queryset`` to the selected values: any value of a facet, all facets."""
+    for field, values in selected_facets(params).items():
+        queryset = queryset.filter(**{f'{field}__in': values})
+    return queryset
+
+
+def refresh_facets(using='default'):
+    """Recompute every facet count from the videos table."""
+    now = timezone.now()
+    with transaction.atomic(using='local'):
+        FacetCount.objects.all().delete()
+        for field in FACET_FIELDS:
+            counts = Video.objects.using(using).values_list(field).annotate(count=Count('id')).order_by()
+            FacetCount.objects.bulk_create(
+                FacetCount(field=field, value=value or '', count=count, refreshed_at=now) for value, count in counts
+            )
+        # Marker row so an empty catalogue still counts as fresh.
+        FacetCount.objects.create(field='', value='', count=0, refreshed_at=now)
+
+
+def last_refreshed():
+    marker = FacetCount.objects.filter(field='').first()
+    return marker.refreshed_at if marker else None
+
+
+def queue_refresh():
+    return enqueue('facets', {}, key='facets', total=1)
+
+
+@task('facets')
+def run_refresh(job):
+    refresh_facets()
+    job.advance(1, 'Facet counts refreshed.')
+
+
+def facet_rows(videos):
+    """``FACET_FIELDS`` tuples of model instances, for ``record_change``."""
+    return [tuple(getattr(video, field) for field in FACET_FIELDS) for video in videos]
+
+
+def record_change(removed=(), added=()):
+    """Adjust the stored counts for rows removed and added, as ``FACET_FIELDS`` tuples.
+
+    An update is the old row removed and the new one added.
+    """
+    delta = Counter()
+    for rows, sign in ((added, 1), (removed, -1)):
+        for row in rows:
+            for field, value in zip(FACET_FIELDS, row):
+                delta[field, value or ''] += sign
+    delta = {key: n for key, n in delta.items() if n}
+    if not delta or last_refreshed() is None:
+        # Nothing changed, or nothing stored yet: the first read builds the table.
+        return
+    now = timezone.now()
+    with transaction.atomic(using='local'):
+        for (field, value), n in delta.items():
+            updated = FacetCount.objects.filter(field=field, value=value).update(count=F('count') + n)
+            if not updated and n > 0:
+                FacetCount.objects.create(field=field, value=value, count=n, refreshed_at=now)
+        FacetCount.objects.filter(count__lte=0).exclude(field='').delete()
+
+
+def get_facets(selected=None, limit=FACET_LIMIT, max_age=MAX_AGE):
+    """``{field: [(value, count)]}``, most common first; queues a refresh when the counts are stale or missing.
+
+    Each facet lists its ``limit`` most common values plus any ``selected`` ones.
+    """
+    refreshed = last_refreshed()
+    if refreshed is None or timezone.now() - refreshed > max_age:
+        queue_refresh()
+    selected = selected or {}
+    facets = {}
+    for field in FACET_FIELDS:
+        # One short read of the (field, -count) index per facet.
+        counts = dict(FacetCount.objects.filter(field=field).order_by('-count').values_list('value', 'count')[:limit])
+        values = [v for v in selected.get(field, []) if v not in counts]
+        if values:
+            counts.update(FacetCount.objects.filter(field=field, value__in=values).values_list('value', 'count'))
+            for value in values:
+                counts.setdefault(value, 0)
+        facets[field] = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return facets
+
+
+def facet_panel(params):
+    """Facets with a link toggling each value, for the list sidebar; facets without values are left out."""
+    selected = selected_facets(params)
+    base = [(key, value) for key in ('q', 'field', 'paging', 'broken') for value in params.getlist(key)]
+    panel = []
+    for field, counts in get_facets(selected).items():
+        if not counts:
+            continue
+        entries = []
+        for value, count in counts:
+            chosen = value in selected.get(field, [])
+            toggled = {f: [v for v in vs if not (f == field and v == value)] for f, vs in selected.items()}
+            if not chosen:
+                toggled.setdefault(field, []).append(value)
+            query = base + [(f, v) for f, vs in toggled.items() for v in vs]
+            entries.append({'value': value, 'count': count, 'selected': chosen, 'url': '?' + urlencode(query)})
+        panel.append((field, entries))
+    return panel
+
+
+def facet_query(params):
+    """The selected facets as ``&field=value`` pairs to append to list links."""
+    pairs = [(field, value) for field, values in selected_facets(params).items() for value in values]
+    return '&' + urlencode(pairs) if pairs else ''
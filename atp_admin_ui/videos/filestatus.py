@@ -0,0 +1,123 @@
+# videos/filestatus.py
+"""Cache of which sidecar files (mp4/mp3/vtt/jpg/json) exist for each video.
+
+Statuses are stored in ``FileStatus`` in the local database. They are filled
+by ``manage.py scan_files`` and, for rows the scanner has not seen yet, on
+demand with one ``os.scandir`` per directory rather than a stat per file.
+Upload and delete paths call ``invalidate_file_status`` so the next read
+re-checks the disk, and a full scan drops the statuses of videos that no
+longer exist.
+"""
+import os
+from collections import OrderedDict
+
+from django.utils import timezone
+
+from .metrics import track_fs
+from .models import FileStatus
+from .paths import MEDIA_EXTENSIONS, resolve_fs_path
+
+
+class DirectoryListing:
+    """``os.scandir`` results per directory, keeping the most recent ``max_dirs``."""
+
+    def __init__(self, max_dirs=256):
+        self.max_dirs = max_dirs
+        self.listings = OrderedDict()
+
+    def get(self, dir_path):
+        if dir_path in self.listings:
+            self.listings.move_to_end(dir_path)
+            return self.listings[dir_path]
+        entries = {}
+        try:
+            with track_fs('scandir'), os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries[entry.name] = (stat.st_size, stat.st_mtime)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            pass
+        self.listings[dir_path] = entries
+        if len(self.listings) > self.max_dirs:
+            self.listings.popitem(last=False)
+        return entries
+
+    def statuses(self, video_id, vid_url, now):
+        for ext in MEDIA_EXTENSIONS:
+            size, mtime = None, None
+            # A row without a URL has no files to look for.
+            if vid_url:
+                path = resolve_fs_path(vid_url, ext)
+                size, mtime = self.get(os.path.dirname(path)).get(os.path.basename(path), (None, None))
+            yield FileStatus(
+                video_id=video_id, ext=ext, exists=size is not None,
+                size=size, mtime=mtime, checked_at=now,
+            )
+
+
+def save_statuses(statuses):
+    FileStatus.objects.bulk_create(
+        statuses, update_conflicts=True, unique_fields=['video_id', 'ext'],
+        update_fields=['exists', 'size', 'mtime', 'checked_at'],
+    )
+
+
+def get_file_status(videos):
+    """``{video.id: [FileStatus per MEDIA_EXTENSIONS]}`` for the given videos."""
+    videos = list(videos)
+    cached = {}
+    for status in FileStatus.objects.filter(video_id__in=[v.id for v in videos]):
+        cached.setdefault(status.video_id, {})[status.ext] = status
+
+    missing = [v for v in videos if len(cached.get(v.id, ())) < len(MEDIA_EXTENSIONS)]
+    if missing:
+        listing = DirectoryListing()
+        now = timezone.now()
+        fresh = []
+        for video in missing:
+            for status in listing.statuses(video.id, video.vid_url, now):
+                cached.setdefault(video.id, {})[status.ext] = status
+                fresh.append(status)
+        save_statuses(fresh)
+    return {video_id: [by_ext[ext] for ext in MEDIA_EXTENSIONS] for video_id, by_ext in cached.items()}
+
+
+def attach_file_status(videos):
+    """Set ``video.file_status`` on each video for templates."""
+    videos = list(videos)
+    statuses = get_file_status(videos)
+    for video in videos:
+        video.file_status = statuses.get(video.id, [])
+    return videos
+
+
+def invalidate_file_status(video_id):
+    FileStatus.objects.filter(video_id=video_id).delete()
+
+
+def invalidate_file_statuses(video_ids):
+    FileStatus.objects.filter(video_id__in=video_ids).delete()
+
+
+def scan(rows, batch_size=2000):
+    """Refresh statuses for the ``(id, vid_url)`` rows of every video; returns the number scanned.
+
+    Rows ordered by ``vid_url`` keep each directory's listing hot in the cache.
+    Statuses the scan did not refresh belong to deleted videos and are removed.
+    """
+    started = timezone.now()
+    listing = DirectoryListing()
+    batch = []
+    count = 0
+    for video_id, vid_url in rows:
+        now = timezone.now()
+        batch.extend(listing.statuses(video_id, vid_url, now))
+        count += 1
+        if len(batch) >= batch_size:
+            save_statuses(batch)
+            batch = []
+    save_statuses(batch)
+    # Statuses checked on demand during the scan are newer than ``started`` and kept.
+    FileStatus.objects.filter(checked_at__lt=started).delete()
+    return count
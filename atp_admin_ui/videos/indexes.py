@@ -0,0 +1,158 @@
+# videos/indexes.py
+"""Index advice for the unmanaged ``videos`` table.
+
+Django never creates indexes on ``videos`` (``managed = False``), so this
+module lists the indexes the app's queries rely on, checks which exist,
+and explains the queries the views issue to show whether they use them.
+``manage.py index_advisor`` reports on this and can emit or apply the DDL.
+"""
+from dataclasses import dataclass, field
+
+from django.db import connections, models
+
+from .columns import project
+from .duplicates import DUPLICATE_KEYS, group_members, group_queryset
+from .mappings import DB_FIELDS
+from .models import Video
+from .pagination import CursorPaginator
+from .search import ORMSearchBackend, SEARCH_FIELDS
+
+RECOMMENDED_INDEXES = {
+    # List ordering, cursor seeks, and the order search results are returned in.
+    'videos_created_at_id': ['created_at', 'id'],
+    # Duplicate groups keyed on video_id and loading their members.
+    'videos_video_id': ['video_id'],
+    # The same for groups keyed on vid_url.
+    'videos_vid_url': ['vid_url'],
+}
+
+PAGE_SIZE = 50
+SAMPLE_CREATED_AT = '2020-01-01 00:00:00'
+
+
+@dataclass
+class Probe:
+    label: str
+    queryset: object
+    # Index the query should use once the recommended indexes exist.
+    expects: str = None
+    # Sorting is fine for queries that only return a handful of rows.
+    allow_sort: bool = False
+
+
+@dataclass
+class Plan:
+    indexes: set = field(default_factory=set)
+    full_scan: bool = False
+    sort: bool = False
+    detail: str = ''
+
+
+def recommended_index(name):
+    return models.Index(fields=RECOMMENDED_INDEXES[name], name=name)
+
+
+def probes(using='default'):
+    """The queries the list, search and duplicates views issue, with sample values."""
+    base = Video.objects.using(using).order_by('-created_at')
+    yield Probe('list page', project(base, DB_FIELDS)[:PAGE_SIZE], 'videos_created_at_id')
+    paginator = CursorPaginator(base, PAGE_SIZE)
+    yield Probe('cursor page', paginator.seek(SAMPLE_CREATED_AT, 1000, 'next')[:PAGE_SIZE], 'videos_created_at_id')
+
+    backend = ORMSearchBackend()
+    for name in DB_FIELDS:
+        sample = '1' if name not in SEARCH_FIELDS else 'grace'
+        expects = 'videos_created_at_id' if name in SEARCH_FIELDS else None
+        if name == 'id':
+            expects = 'PRIMARY'
+        yield Probe(f'search {name}', backend.search(base, name, sample)[:PAGE_SIZE], expects)
+
+    for key_name in DUPLICATE_KEYS:
+        expects = f'videos_{key_name}' if f'videos_{key_name}' in RECOMMENDED_INDEXES else None
+        yield Probe(f'duplicates by {key_name}', group_queryset(key_name, using), expects)
+        yield Probe(f'duplicate members by {key_name}', group_members(key_name, ['a', 'b'], using), expects, True)
+
+
+def existing_indexes(using='default'):
+    """``{name: [columns]}`` of the indexes on the videos table."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, Video._meta.db_table)
+    return {
+        name: info['columns'] for name, info in constraints.items()
+        if info['index'] or info['primary_key'] or info['unique']
+    }
+
+
+def missing_indexes(using='default'):
+    """Names of recommended indexes not covered by a prefix of an existing index."""
+    existing = existing_indexes(using).values()
+    return [
+        name for name, columns in RECOMMENDED_INDEXES.items()
+        if not any(list(have[:len(columns)]) == columns for have in existing)
+    ]
+
+
+def index_sql(names, using='default'):
+    """DDL creating the named recommended indexes."""
+    with connections[using].schema_editor(collect_sql=True) as editor:
+        for name in names:
+            editor.add_index(Video, recommended_index(name))
+    return editor.collected_sql
+
+
+def create_indexes(names, using='default'):
+    with connections[using].schema_editor() as editor:
+        for name in names:
+            editor.add_index(Video, recommended_index(name))
+
+
+def explain(queryset):
+    """Plan of ``queryset`` on its database, from EXPLAIN (MySQL) or EXPLAIN QUERY PLAN (SQLite)."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    plan = Plan()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            details = [row[-1] for row in cursor.fetchall()]
+            for detail in details:
+                words = detail.split()
+                if words[:1] == ['SCAN'] and 'INDEX' not in words and words[1] == Video._meta.db_table:
+                    plan.full_scan = True
+                if 'INDEX' in words:
+                    plan.indexes.add(words[words.index('INDEX') + 1])
+                if 'PRIMARY' in words:
+                    plan.indexes.add('PRIMARY')
+                if 'TEMP B-TREE' in detail and 'ORDER BY' in detail:
+                    plan.sort = True
+            plan.detail = '; '.join(details)
+        else:
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [c[0] for c in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            for row in rows:
+                if row['table'] != Video._meta.db_table:
+                    continue
+                if row['type'] == 'ALL':
+                    plan.full_scan = True
+                if row['key']:
+                    plan.indexes.add(row['key'])
+                if 'filesort' in (row['Extra'] or ''):
+                    plan.sort = True
+            plan.detail = '; '.join(
+                f"type={r['type']} key={r['key']} rows={r['rows']} extra={r['Extra']}" for r in rows
+            )
+    return plan
+
+
+def regressions(using):
+    """``[(probe, plan)]`` for probes whose plan does not use the expected index."""
+    failed = []
+    for probe in probes(using):
+        if probe.expects is None:
+            continue
+        plan = explain(probe.queryset)
+        if probe.expects not in plan.indexes or (plan.sort and not probe.allow_sort):
+            failed.append((probe, plan))
+    return failed
@@ -0,0 +1,118 @@
+# videos/jobs.py
+"""A small job queue stored in the local SQLite database.
+
+Views ``enqueue`` work (sidecar rewrites, file deletes, bulk actions) and
+return immediately; ``manage.py run_jobs`` worker processes claim queued jobs
+and run the task registered for their ``kind``. Failed jobs are retried with
+exponential backoff up to ``max_attempts``. With ``JOBS_MODE=thread`` (the
+default, for setups without a worker) the queue is drained by a background
+thread in the web process instead.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+
+RETRY_DELAY = 5
+STALE_AFTER = timedelta(minutes=30)
+
+
+def task(kind):
+    """Register ``func(job)`` as the runner for jobs of ``kind``."""
+    def register(func):
+        TASKS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload, key=None, total=0):
+    """Queue a job, or refresh the payload of a queued job with the same ``key``."""
+    with transaction.atomic(using='local'):
+        job = Job.objects.filter(kind=kind, key=key, status=Job.QUEUED).first() if key else None
+        if job:
+            job.payload = payload
+            job.total = total
+            job.save(update_fields=['payload', 'total', 'updated_at'])
+        else:
+            job = Job.objects.create(kind=kind, payload=payload, key=key, total=total)
+    if getattr(settings, 'VIDEOS_JOBS_MODE', 'thread') == 'thread':
+        threading.Thread(target=_drain_in_thread, daemon=True).start()
+    return job
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(worker):
+    """Mark the oldest runnable job as running for ``worker`` and return it."""
+    now = timezone.now()
+    # Jobs left running by a worker that died are put back in the queue. Running
+    # jobs refresh locked_at whenever they advance, so only silent ones expire.
+    Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - STALE_AFTER).update(status=Job.QUEUED)
+    while True:
+        pk = (
+            Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by('run_after', 'pk').values_list('pk', flat=True).first()
+        )
+        if pk is None:
+            return None
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1, updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+
+
+def run(job):
+    job.update(done=0)
+    try:
+        TASKS[job.kind](job)
+    except Exception as e:
+        note = f'Attempt {job.attempts} failed: {e}\n'
+        if job.attempts < job.max_attempts:
+            delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.update(status=Job.QUEUED, run_after=timezone.now() + timedelta(seconds=delay),
+                       log=Concat(F('log'), Value(note)))
+        else:
+            job.update(status=Job.FAILED, log=Concat(F('log'), Value(note)))
+    else:
+        job.update(status=Job.DONE)
+
+
+def drain(worker=None):
+    """Run queued jobs until none are runnable; returns how many ran."""
+    worker = worker or worker_name()
+    count = 0
+    while True:
+        job = claim(worker)
+        if job is None:
+            return count
+        run(job)
+        count += 1
+
+
+def _drain_in_thread():
+    try:
+        drain()
+    finally:
+        connections.close_all()
+
+
+def work(poll_interval=1.0, stop=None):
+    """Worker loop for ``run_jobs``: drain the queue, then poll."""
+    worker = worker_name()
+    while not (stop and stop.is_set()):
+        if not drain(worker):
+            time.sleep(poll_interval)
@@ -0,0 +1,53 @@
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+
+from videos.bench import bench_database, generate_videos, measure, format_stats
+from videos.columns import build_rows, project
+from videos.mappings import DB_FIELDS
+from videos.models import Video
+
+# The table body as list.html rendered it before column projection.
+LEGACY_TABLE = engines['django'].from_string('''{% load custom_filters %}
+{% for video in object_list %}<tr>{% for field in fields %}<td>
+{% if field == 'id' %}<a href="{% url 'video_update' video.id %}">{{ video.id }}</a>{% else %}{{ video|get_attr:field }}{% endif %}
+</td>{% endfor %}</tr>{% endfor %}''')
+
+TABLE = engines['django'].from_string('''
+{% for video, cells in rows %}<tr>{% for cell in cells %}<td>{{ cell }}</td>{% endfor %}</tr>{% endfor %}''')
+
+
+class Command(BaseCommand):
+    help = 'Time loading and rendering a page of the video list with full rows versus projected columns.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000)
+        parser.add_argument('--page-size', type=int, nargs='+', default=[50, 500])
+        parser.add_argument('--code-size', type=int, default=20_000, help='Characters of vid_code per row.')
+        parser.add_argument(
+            '--columns', default=','.join(DB_FIELDS), help='Comma separated columns for the projected page.',
+        )
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        columns = [c for c in options['columns'].split(',') if c in DB_FIELDS]
+        with tempfile.TemporaryDirectory() as tmp, bench_database(Path(tmp) / 'videos.sqlite3') as using:
+            self.stdout.write(f"Generating {options['rows']} rows with {options['code_size']} character vid_code...")
+            generate_videos(options['rows'], using, code_size=options['code_size'])
+            base = Video.objects.using(using).order_by('-created_at')
+
+            for size in options['page_size']:
+                def legacy():
+                    return LEGACY_TABLE.render({'object_list': list(base[:size]), 'fields': DB_FIELDS})
+
+                def projected():
+                    return TABLE.render({'rows': build_rows(project(base, columns)[:size], columns)})
+
+                legacy_html, projected_html = legacy(), projected()
+                self.stdout.write(f'{size} rows:')
+                self.stdout.write(f'  full rows + get_attr:  {format_stats(measure(legacy, options["repeat"]))} '
+                                  f'({len(legacy_html) // 1024} KiB)')
+                self.stdout.write(f'  projected + accessors: {format_stats(measure(projected, options["repeat"]))} '
+                                  f'({len(projected_html) // 1024} KiB)')
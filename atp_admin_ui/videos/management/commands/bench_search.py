@@ -0,0 +1,57 @@
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from videos.bench import bench_database, generate_videos, measure, format_stats
+from videos.models import Video
+from videos.search import ORMSearchBackend, IndexSearchBackend, SEARCH_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Compare first-page search latency of the icontains path and the local index on synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument(
+            '--query', nargs=2, action='append', metavar=('FIELD', 'Q'),
+            help='Field and query to time; may be repeated.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        queries = options['query'] or [
+            ('vid_preacher', 'anderson'), ('name', 'grace'), ('vid_title', 'romans gen'), ('video_id', '0001234'),
+        ]
+        for field, _ in queries:
+            if field not in SEARCH_FIELDS:
+                self.stderr.write(f'{field} is not a text field; the index would fall back to the ORM.')
+
+        for rows in options['rows']:
+            with tempfile.TemporaryDirectory() as tmp, \
+                    bench_database(Path(tmp) / 'videos.sqlite3') as using, \
+                    bench_database(Path(tmp) / 'index.sqlite3', 'bench_index', create_table=False) as index_using:
+                self.stdout.write(f'Generating {rows} rows...')
+                generate_videos(rows, using)
+                index = IndexSearchBackend(using=index_using)
+                index.create_tables()
+                values = Video.objects.using(using).values_list('pk', *SEARCH_FIELDS)
+                batch = []
+                for row in values.iterator(chunk_size=5000):
+                    batch.append(row)
+                    if len(batch) >= 5000:
+                        index.index_rows(batch, replace=False)
+                        batch = []
+                index.index_rows(batch, replace=False)
+                index.optimize()
+
+                base = Video.objects.using(using).order_by('-created_at')
+                for field, q in queries:
+                    for label, backend in (('icontains', ORMSearchBackend()), ('index', index)):
+                        def first_page():
+                            page = Paginator(backend.search(base, field, q), 50).page(1)
+                            return page.paginator.count, list(page.object_list)
+
+                        stats = measure(first_page, options['repeat'])
+                        self.stdout.write(f'rows={rows} {field}={q!r} {label:<9} {format_stats(stats)}')
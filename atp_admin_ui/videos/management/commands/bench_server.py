@@ -0,0 +1,126 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from videos.bench import bench_database, generate_videos
+
+PROFILES = {
+    # What docker-compose.yml ran before: the development server with DEBUG on
+    # and a new database connection per request.
+    'current': {
+        'command': ['manage.py', 'runserver', '--noreload', '{bind}'],
+        'env': {'DJANGO_ENV': 'development', 'DB_CONN_MAX_AGE': '0'},
+    },
+    'production': {
+        'command': ['-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        'env': {'DJANGO_ENV': 'production', 'ASYNC_VIEWS': '0'},
+    },
+    'production-async': {
+        'command': ['-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        'env': {'DJANGO_ENV': 'production', 'ASYNC_VIEWS': '1'},
+    },
+}
+PATHS = ['', '?q=grace+romans', '1/', 'static/admin/css/base.css']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the app under each server profile against a SQLite stand-in of the videos table '
+        '(or the configured database) and run loadtest on it, to compare requests/second.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000)
+        parser.add_argument('--profile', action='append', choices=list(PROFILES), help='Default: all.')
+        parser.add_argument('--path', action='append', help=f'Paths to GET, cycled (default: {PATHS}).')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=500, help='Requests per concurrency level.')
+        parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes (WEB_CONCURRENCY).')
+        parser.add_argument(
+            '--configured-db', action='store_true',
+            help='Use DATABASES["default"] as configured (e.g. a local MySQL copy) instead of a SQLite stand-in.',
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            env = {
+                **os.environ,
+                'LOCAL_DB_PATH': str(tmp / 'local.sqlite3'),
+                'RESULT_CACHE_DIR': str(tmp / 'cache'),
+                'STATIC_ROOT': str(tmp / 'static'),
+                'FS_PATH': str(tmp / 'fs'),
+                'METRICS_DIR': '',
+                'JOBS_MODE': 'worker',
+                'ALLOWED_HOSTS': '127.0.0.1,localhost',
+                'DJANGO_SECRET_KEY': 'bench-server',
+                'WEB_CONCURRENCY': str(options['workers']),
+            }
+            if not options['configured_db']:
+                database = tmp / 'videos.sqlite3'
+                env.update(DB_ENGINE='django.db.backends.sqlite3', DB_NAME=str(database))
+                with bench_database(database) as using:
+                    self.stdout.write(f"Generating {options['rows']} rows...")
+                    generate_videos(options['rows'], using)
+                self.manage(env, 'migrate', '--noinput')
+            self.manage(env, 'migrate', '--noinput', '--database=local')
+            self.manage({**env, 'DJANGO_ENV': 'production'}, 'collectstatic', '--noinput')
+
+            for name in options['profile'] or list(PROFILES):
+                self.stdout.write(f'\n{name}')
+                self.run_profile(name, env, options)
+
+    def manage(self, env, *args):
+        subprocess.run(
+            [sys.executable, 'manage.py', *args], cwd=settings.BASE_DIR, env=env, check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def run_profile(self, name, env, options):
+        profile = PROFILES[name]
+        bind = f'127.0.0.1:{free_port()}'
+        command = [sys.executable] + [arg.format(bind=bind) for arg in profile['command']]
+        server = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env={**env, **profile['env'], 'BIND': bind},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        url = f'http://{bind}/'
+        try:
+            self.wait_for(server, url)
+            call_command(
+                'loadtest', url=url, path=options['path'] or PATHS,
+                concurrency=options['concurrency'], requests=options['requests'], stdout=self.stdout,
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def wait_for(self, server, url, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Server exited with status {server.returncode}.')
+            try:
+                with urllib.request.urlopen(url, timeout=5):
+                    return
+            except urllib.error.HTTPError as e:
+                raise CommandError(f'{url} answered {e.code}.')
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Server did not answer on {url} within {timeout}s.')
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from videos.bench import bench_database, generate_videos
+from videos.models import Video
+from videos.paths import get_fs_path
+from videos.sidecars import regenerate, sql_params_for, write_sidecar
+
+
+def legacy_write(video, path):
+    """The previous writer: always load, replace and rewrite the whole file."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {}
+    data['sql_params'] = sql_params_for(video)
+    with open(path + '.tmp', 'w') as f:
+        f.write(json.dumps(data, indent=4))
+    os.replace(path + '.tmp', path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time regenerating the JSON sidecars of a synthetic catalogue: the previous always-rewrite writer, '
+        'the hash-skipping writer with the json and orjson encoders, and the process pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--fs-path', help='Directory standing in for FS_PATH (default: a temp dir).')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with tempfile.TemporaryDirectory(dir=options['fs_path']) as fs_path, \
+                bench_database(Path(fs_path) / 'videos.sqlite3') as using:
+            os.environ['FS_PATH'] = fs_path
+            self.stdout.write(f'Generating {rows} rows...')
+            generate_videos(rows, using)
+            queryset = Video.objects.using(using).order_by()
+            videos = list(queryset)
+            paths = [get_fs_path(video, 'json') for video in videos]
+            for video, path in zip(videos, paths):
+                write_sidecar(video, path)
+
+            def serial(label, write):
+                started = time.perf_counter()
+                results = Counter(write(video, path) for video, path in zip(videos, paths))
+                self.report(label, rows, time.perf_counter() - started, results)
+
+            serial('hash skip, unchanged', write_sidecar)
+            for video in videos:
+                video.clicks += 1
+            serial('hash skip, all changed', write_sidecar)
+            serial('legacy read-modify-write', legacy_write)
+            try:
+                import orjson  # noqa: F401
+            except ImportError:
+                self.stdout.write('orjson not installed, skipping the orjson runs.')
+            else:
+                with override_settings(VIDEOS_SIDECAR_ENCODER='orjson'):
+                    for video in videos:
+                        video.clicks += 1
+                    serial('orjson, all changed', write_sidecar)
+                    serial('orjson, unchanged', write_sidecar)
+
+            queryset.update(clicks=0)
+            started = time.perf_counter()
+            results = Counter(regenerate(queryset, options['workers']))
+            self.report(f"process pool ({options['workers']} workers), all changed", rows,
+                        time.perf_counter() - started, results)
+            started = time.perf_counter()
+            results = Counter(regenerate(queryset, options['workers']))
+            self.report(f"process pool ({options['workers']} workers), unchanged", rows,
+                        time.perf_counter() - started, results)
+
+    def report(self, label, rows, elapsed, results):
+        counts = ', '.join(f'{count} {result}' for result, count in sorted(results.items()) if result)
+        self.stdout.write(f'{label:<44} {elapsed:7.2f}s {rows / elapsed:9.0f} rows/s  {counts}')
@@ -0,0 +1,245 @@
+import io
+import json
+import os
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from videos.bench import generate_media, generate_videos, measure, swapped_databases
+from videos.duplicates import refresh_groups
+from videos.facets import refresh_facets
+from videos.forms import VideoForm
+from videos.jobs import drain
+from videos.metrics import TOTALS
+from videos.models import Video
+from videos.paths import get_fs_path
+from videos.sidecars import write_sidecar
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'bench_baseline.json'
+# Filesystem operations that write file content (see track_fs).
+WRITE_OPS = ('upload_write', 'commit_copy', 'resumable_write', 'sidecar_write')
+# Generator options a baseline was recorded with; counts are only comparable between equal runs.
+PARAMS = ('rows', 'duplicate_rate', 'code_size', 'media_kb', 'upload_kb', 'seed', 'search_backend')
+
+
+def bytes_written():
+    return sum(TOTALS[f'atp_fs_bytes_total{{op="{op}"}}'] for op in WRITE_OPS)
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the hot paths of the videos app (list paging, search, facets, duplicates, export, edit page, '
+        'save and uploads, sidecar rewrites) against a synthetic SQLite catalogue and a temp FS_PATH tree. '
+        'Reports queries, bytes written and latency per operation and fails when they regress past a stored baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000)
+        parser.add_argument('--duplicate-rate', type=float, default=0.02)
+        parser.add_argument('--code-size', type=int, default=200, help='Characters of vid_code per row.')
+        parser.add_argument('--media-kb', type=int, default=4, help='Size of each placeholder .mp4/.jpg.')
+        parser.add_argument('--upload-kb', type=int, default=1024, help='Size of the uploaded video.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--search-backend', choices=['orm', 'index'], default='orm')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--scenario', action='append', help='Only run these scenarios (default: all).')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline file to compare with.')
+        parser.add_argument(
+            '--save-baseline', action='store_true', help='Write this run to the baseline file instead of comparing.',
+        )
+        parser.add_argument(
+            '--max-slowdown', type=float, default=1.5,
+            help='Fail when an operation\'s median exceeds its baseline by this factor (0: ignore latency).',
+        )
+        parser.add_argument('--query-slack', type=int, default=0, help='Extra queries allowed over the baseline.')
+
+    def handle(self, *args, **options):
+        params = {name: options[name] for name in PARAMS}
+        baseline = None
+        if not options['save_baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except FileNotFoundError:
+                self.stderr.write(f"No baseline at {options['baseline']}; run with --save-baseline to record one.")
+            if baseline and baseline['params'] != params:
+                raise CommandError(
+                    f"The baseline was recorded with {baseline['params']}; rerun with those options "
+                    'or record a new baseline with --save-baseline.'
+                )
+
+        with tempfile.TemporaryDirectory() as tmp, ExitStack() as stack:
+            fs_path = os.path.join(tmp, 'fs')
+            stack.enter_context(swapped_databases(tmp))
+            # As deployed: DEBUG off, CSRF enforced (see scenarios) and the file
+            # result cache on. Jobs are drained by the scenarios that queue them.
+            stack.enter_context(override_settings(
+                ALLOWED_HOSTS=['testserver'], DEBUG=False, VIDEOS_JOBS_MODE='worker', VIDEOS_METRICS_DIR=None,
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'results': {
+                        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                        'LOCATION': os.path.join(tmp, 'cache'),
+                    },
+                },
+                VIDEOS_RESULT_CACHE='results', VIDEOS_SEARCH_BACKEND=options['search_backend'],
+            ))
+            previous_fs_path = os.environ.get('FS_PATH')
+            os.environ['FS_PATH'] = fs_path
+            try:
+                self.prepare(options)
+                results = self.run_scenarios(options)
+            finally:
+                if previous_fs_path is None:
+                    del os.environ['FS_PATH']
+                else:
+                    os.environ['FS_PATH'] = previous_fs_path
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump({'params': params, 'results': results}, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}."))
+        elif baseline:
+            self.compare(results, baseline['results'], options)
+
+    def prepare(self, options):
+        rows = options['rows']
+        self.stdout.write(f'Generating {rows} rows and their media and sidecars...')
+        generate_videos(
+            rows, 'default', duplicate_rate=options['duplicate_rate'], code_size=options['code_size'],
+            seed=options['seed'],
+        )
+        videos = Video.objects.order_by('pk')
+        generate_media(videos.only('pk', 'vid_url').iterator(), size=options['media_kb'] * 1024)
+        for video in videos.iterator():
+            write_sidecar(video, get_fs_path(video, 'json'))
+        refresh_facets()
+        # As kept fresh by the duplicates job, so the pages read stored groups.
+        for key_name in ('video_id', 'title_date'):
+            refresh_groups(key_name)
+        if options['search_backend'] == 'index':
+            call_command('build_search_index', stdout=io.StringIO())
+
+    def scenarios(self, options):
+        """``{name: callable returning a response}``; each call is one timed operation."""
+        client = Client(enforce_csrf_checks=True)
+        video = Video.objects.get(pk=options['rows'] // 2)
+        edit_url = reverse('video_update', args=[video.pk])
+        client.get(edit_url)
+        fields = {
+            name: '' if value is None else value
+            for name, value in ((f, getattr(video, f)) for f in VideoForm._meta.fields)
+        }
+        fields['csrfmiddlewaretoken'] = client.cookies['csrftoken'].value
+        upload = os.urandom(options['upload_kb'] * 1024)
+        saves = iter(range(1, 1_000_000))
+
+        def get(url):
+            return lambda: client.get(url)
+
+        def save(**files):
+            # A different clicks value each time, so the sidecar is rewritten;
+            # the jobs the save queues (sidecar, media probe) count towards it.
+            def post():
+                response = client.post(edit_url, {**fields, 'clicks': video.clicks + next(saves), **{
+                    field: SimpleUploadedFile(name, content) for field, (name, content) in files.items()
+                }})
+                drain()
+                return response
+            return post
+
+        # Not the edited row, whose sidecar the saves keep changing.
+        sidecar_videos = list(Video.objects.exclude(pk=video.pk).order_by('pk')[:500])
+
+        def rewrite_sidecars():
+            for v in sidecar_videos:
+                write_sidecar(v, get_fs_path(v, 'json'))
+
+        list_url = reverse('video_list')
+        return {
+            'list_page': get(list_url),
+            'list_page_deep': get(f'{list_url}?page={options["rows"] // 100}'),
+            'list_cursor': get(f'{list_url}?paging=cursor'),
+            'list_facet': get(f'{list_url}?vid_category=Sermons&language=en'),
+            'search_name': get(f'{list_url}?q=grace+romans&field=name'),
+            'search_video_id': get(f'{list_url}?q=000123&field=video_id'),
+            'list_broken': get(f'{list_url}?broken=1'),
+            'duplicates': get(f'{list_url}?duplicates=1&key=video_id'),
+            'duplicates_title_date': get(f'{list_url}?duplicates=1&key=title_date'),
+            'export_csv': get(f'{reverse("video_export")}?format=csv'),
+            'edit_page': get(edit_url),
+            'edit_save': save(),
+            'upload_vtt': save(vtt_file=('bench.vtt', b'WEBVTT\n\n00:00.000 --> 00:01.000\nbench\n')),
+            'upload_video': save(video_file=('bench.mp4', upload)),
+            'sidecars_unchanged_500': rewrite_sidecars,
+        }
+
+    def run_scenarios(self, options):
+        scenarios = self.scenarios(options)
+        unknown = set(options['scenario'] or ()) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}. Choose from {', '.join(scenarios)}.")
+        results = {}
+        for name, operation in scenarios.items():
+            if options['scenario'] and name not in options['scenario']:
+                continue
+            # One counted run (query capture slows queries down), then the timed
+            # runs; list pages are counted with a cold result cache, timed warm.
+            written = bytes_written()
+            with ExitStack() as stack:
+                captures = [stack.enter_context(CaptureQueriesContext(connections[a])) for a in ('default', 'local')]
+                response = self.consume(operation())
+            # A POST that answers 200 re-rendered the form with errors instead of saving.
+            if response is not None and (response.status_code >= 400 or (
+                    response.status_code == 200 and response.wsgi_request.method == 'POST')):
+                raise CommandError(f'{name} answered {response.status_code}; it no longer exercises its path.')
+            results[name] = {
+                'queries': sum(len(capture) for capture in captures),
+                'bytes_written': int(bytes_written() - written),
+                **{k: round(v, 3) for k, v in measure(lambda: self.consume(operation()), options['repeat']).items()},
+            }
+            self.stdout.write(
+                f"{name:<24} {results[name]['queries']:>3} queries {results[name]['bytes_written']:>9} B written | "
+                f"median {results[name]['median']:8.2f} ms p95 {results[name]['p95']:8.2f} ms "
+                f"max {results[name]['max']:8.2f} ms"
+            )
+        return results
+
+    def consume(self, response):
+        """Read a streamed body, whose rows are only queried while it is sent."""
+        if response is not None and response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def compare(self, results, baseline, options):
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                self.stderr.write(f'{name}: not in the baseline.')
+                continue
+            if result['queries'] > expected['queries'] + options['query_slack']:
+                regressions.append(f"{name}: {result['queries']} queries, baseline {expected['queries']}")
+            if result['bytes_written'] > expected['bytes_written']:
+                regressions.append(
+                    f"{name}: {result['bytes_written']} bytes written, baseline {expected['bytes_written']}"
+                )
+            slowdown = result['median'] / expected['median'] if expected['median'] else 0
+            if options['max_slowdown'] and slowdown > options['max_slowdown']:
+                regressions.append(
+                    f"{name}: median {result['median']:.2f} ms, {slowdown:.1f}x the baseline {expected['median']:.2f} ms"
+                )
+        for regression in regressions:
+            self.stderr.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions against {options['baseline']}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.core.management.base import BaseCommand
+
+from videos.uploads import StagedUploadHandler, commit_upload
+
+
+def feed(handler, size, block):
+    handler.new_file('video_file', 'bench.mp4', 'video/mp4', size)
+    sent = 0
+    while sent < size:
+        chunk = block[:min(len(block), size - sent)]
+        handler.receive_data_chunk(chunk, sent)
+        sent += len(chunk)
+    return handler.file_complete(size)
+
+
+class Command(BaseCommand):
+    help = 'Compare the previous spool-then-copy upload path with the staged upload handler for large files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, nargs='+', default=[64, 512, 2048])
+        parser.add_argument('--fs-path', help='Directory standing in for FS_PATH (default: a temp dir).')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(dir=options['fs_path']) as fs_path:
+            os.environ['FS_PATH'] = fs_path
+            block = os.urandom(StagedUploadHandler.chunk_size)
+            target = os.path.join(fs_path, 'video', 'bench.mp4')
+            os.makedirs(os.path.dirname(target))
+            for size_mb in options['size_mb']:
+                size = size_mb * 1024 * 1024
+
+                # Previous path: Django spools to FILE_UPLOAD_TEMP_DIR, then the
+                # view copies the spooled file chunk by chunk over the live path.
+                start = time.perf_counter()
+                uploaded = feed(TemporaryFileUploadHandler(), size, block)
+                with open(target, 'wb') as destination:
+                    for chunk in uploaded.chunks():
+                        destination.write(chunk)
+                uploaded.close()
+                legacy = time.perf_counter() - start
+
+                start = time.perf_counter()
+                uploaded = feed(StagedUploadHandler(), size, block)
+                metrics = commit_upload(uploaded, target)
+                uploaded.close()
+                staged = time.perf_counter() - start
+
+                self.stdout.write(
+                    f'{size_mb} MB: spool+copy {legacy:.2f}s ({size_mb / legacy:.0f} MB/s, {2 * size_mb} MB written) | '
+                    f'staged+rename {staged:.2f}s ({size_mb / staged:.0f} MB/s, {size_mb} MB written, incl. sha256 + fsync)'
+                )
+                self.stdout.write(f'  staged receive: {metrics}')
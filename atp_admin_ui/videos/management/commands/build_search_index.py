@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from videos.models import Video
+from videos.search import IndexSearchBackend, SEARCH_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Build or rebuild the local full-text index used by SEARCH_BACKEND=index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only index rows with an id above the highest id already indexed.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--database', default='default', help='Database holding the videos table.')
+        parser.add_argument('--index-database', default='local', help='Database holding the search index.')
+
+    def handle(self, *args, **options):
+        backend = IndexSearchBackend(using=options['index_database'])
+        backend.create_tables(drop=not options['incremental'])
+        queryset = Video.objects.using(options['database']).order_by('pk')
+        if options['incremental']:
+            queryset = queryset.filter(pk__gt=backend.max_indexed_pk())
+
+        replace = options['incremental']
+        batch_size = options['batch_size']
+        batch = []
+        total = 0
+        for row in queryset.values_list('pk', *SEARCH_FIELDS).iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                backend.index_rows(batch, replace=replace)
+                total += len(batch)
+                batch = []
+                self.stdout.write(f'Indexed {total} rows...')
+        backend.index_rows(batch, replace=replace)
+        total += len(batch)
+        backend.optimize()
+        self.stdout.write(self.style.SUCCESS(f'Search index ready: {total} rows indexed.'))
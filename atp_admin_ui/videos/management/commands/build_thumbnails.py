@@ -0,0 +1,50 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.core.management.base import BaseCommand
+
+from videos.models import Video
+from videos.thumbnails import FORMATS, WIDTHS, generate
+
+
+def build(vid_url, force=False):
+    """``(written, error)`` for one video; runs in a worker process."""
+    try:
+        return generate(vid_url, force=force), None
+    except FileNotFoundError:
+        return 0, None
+    except Exception as e:
+        return 0, f'{vid_url}: {e}'
+
+
+class Command(BaseCommand):
+    help = (
+        f'Create missing or outdated thumbnail derivatives ({", ".join(map(str, WIDTHS))}px, '
+        f'{" and ".join(FORMATS)}) for every video with a .jpg under FS_PATH.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--force', action='store_true', help='Rewrite derivatives that are up to date.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        vid_urls = list(Video.objects.order_by().values_list('vid_url', flat=True).iterator(chunk_size=5000))
+        videos = written = errors = 0
+        # Resizing is CPU bound, so it runs in processes rather than threads.
+        with ProcessPoolExecutor(options['workers'], initializer=django.setup) as pool:
+            for count, error in pool.map(partial(build, force=options['force']), vid_urls, chunksize=32):
+                videos += 1
+                written += count
+                if error:
+                    errors += 1
+                    self.stderr.write(error)
+                if videos % 1000 == 0:
+                    self.stderr.write(f'{videos}/{len(vid_urls)} videos, {written} derivatives written')
+        self.stdout.write(
+            f'Checked {videos} videos in {time.perf_counter() - started:.1f}s: '
+            f'{written} derivatives written, {errors} errors.'
+        )
@@ -0,0 +1,48 @@
+import csv
+import json
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+
+from videos.duplicates import DUPLICATE_KEYS, refresh_groups, iter_duplicate_rows
+
+REPORT_FIELDS = ['id', 'video_id', 'name', 'date', 'created_at', 'vid_url']
+
+
+class Command(BaseCommand):
+    help = 'Report duplicate video groups as CSV or JSON, or refresh the stored groups used by the list view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--key', choices=list(DUPLICATE_KEYS), default='video_id')
+        parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+        parser.add_argument(
+            '--refresh', action='store_true',
+            help='Recompute the stored duplicate groups instead of printing a report.',
+        )
+
+    def handle(self, *args, **options):
+        key_name = options['key']
+        if options['refresh']:
+            refresh_groups(key_name)
+            self.stderr.write(self.style.SUCCESS(f'Duplicate groups for {key_name} refreshed.'))
+            return
+
+        rows = iter_duplicate_rows(key_name, REPORT_FIELDS)
+        if options['format'] == 'csv':
+            writer = csv.writer(self.stdout)
+            writer.writerow(['dup_key', 'count'] + REPORT_FIELDS)
+            for row in rows:
+                writer.writerow(row)
+            return
+
+        # A JSON array written one group at a time, so memory stays bounded.
+        self.stdout.write('[', ending='')
+        for i, (key, group) in enumerate(groupby(rows, key=lambda row: row[0])):
+            group = list(group)
+            entry = {
+                'key': key,
+                'count': group[0][1],
+                'videos': [dict(zip(REPORT_FIELDS, row[2:])) for row in group],
+            }
+            self.stdout.write((',' if i else '') + '\n' + json.dumps(entry), ending='')
+        self.stdout.write('\n]')
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+
+from videos.duplicates import invalidate_groups
+from videos.facets import FACET_FIELDS, facet_rows, record_change
+from videos.mappings import DB_FIELDS
+from videos.models import Video
+from videos.paths import walk_parallel
+from videos.resultcache import invalidate_results
+from videos.search import get_search_backend
+from videos.sidecars import clean_sql_params, read_sidecar
+
+UPDATE_FIELDS = [f for f in DB_FIELDS if f != 'id']
+
+
+def parse_sidecar(path):
+    """``(path, values, error)`` for one sidecar; runs in a worker process."""
+    try:
+        return path, clean_sql_params(read_sidecar(path).get('sql_params')), None
+    except ValidationError as e:
+        return path, None, '; '.join(e.messages)
+    except (OSError, ValueError, AttributeError) as e:
+        return path, None, str(e)
+
+
+def batches(paths, size):
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Create or update videos rows from the sql_params of the JSON sidecars under FS_PATH. '
+        'Sidecars are parsed in parallel and validated against the videos columns; rows are upserted in batches. '
+        'With --dry-run the differences are only reported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Directory to import from (default: FS_PATH).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing.')
+        parser.add_argument('--format', choices=['text', 'json'], default='text')
+
+    def emit(self, kind, **details):
+        if self.format == 'json':
+            self.stdout.write(json.dumps({'kind': kind, **details}, default=str))
+        else:
+            self.stdout.write('\t'.join([kind] + [str(v) for v in details.values()]))
+
+    def handle(self, *args, **options):
+        self.format = options['format']
+        self.dry_run = options['dry_run']
+        self.counts = dict.fromkeys(['created', 'updated', 'unchanged', 'invalid', 'duplicate'], 0)
+        # Ids already taken by a sidecar of the directory being read. The walk
+        # yields a directory's files together, so this never outgrows one
+        # directory, however many sidecars the tree holds.
+        self.directory, self.seen = None, {}
+        self.backend = get_search_backend()
+        root = options['path'] or os.getenv('FS_PATH', '/data')
+        paths = (path for files in walk_parallel(root, ('.json',), options['workers']) for path in files)
+        started = time.perf_counter()
+        parsed = 0
+        # Parsing is CPU bound, so it runs in processes; the generators keep
+        # only one batch of paths and rows in memory at a time.
+        with ProcessPoolExecutor(options['workers'], initializer=django.setup) as pool:
+            for batch in batches(paths, options['batch_size']):
+                self.import_batch(list(pool.map(parse_sidecar, batch, chunksize=64)))
+                parsed += len(batch)
+                if parsed // 10_000 > (parsed - len(batch)) // 10_000:
+                    self.stderr.write(f'{parsed} sidecars, {parsed / (time.perf_counter() - started):.0f}/s')
+        if not self.dry_run and (self.counts['created'] or self.counts['updated']):
+            invalidate_results()
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{k}={v}' for k, v in self.counts.items())
+        self.stderr.write(
+            f"{'Checked' if self.dry_run else 'Imported'} {parsed} sidecars in {elapsed:.1f}s "
+            f"({parsed / elapsed if elapsed else 0:.0f} rows/s): {summary}"
+        )
+
+    def import_batch(self, results):
+        rows = {}
+        for path, values, error in results:
+            directory = os.path.dirname(path)
+            if directory != self.directory:
+                self.directory, self.seen = directory, {}
+            if error:
+                self.counts['invalid'] += 1
+                self.emit('invalid', path=path, error=error)
+            elif values['id'] in self.seen or values['id'] in rows:
+                # A batch cannot upsert one id twice either.
+                first = self.seen.get(values['id']) or rows[values['id']][0]
+                self.counts['duplicate'] += 1
+                self.emit('duplicate', id=values['id'], path=path, first=first)
+            else:
+                self.seen[values['id']] = path
+                rows[values['id']] = (path, values)
+
+        current = {
+            row[0]: dict(zip(DB_FIELDS, row))
+            for row in Video.objects.filter(pk__in=list(rows)).values_list(*DB_FIELDS)
+        }
+        created, updated = [], []
+        for pk, (path, values) in rows.items():
+            if pk not in current:
+                created.append(Video(**values))
+                if self.dry_run:
+                    self.emit('create', id=pk, path=path)
+                continue
+            changed = [f for f in UPDATE_FIELDS if current[pk][f] != values[f]]
+            if not changed:
+                self.counts['unchanged'] += 1
+                continue
+            updated.append(Video(**values))
+            if self.dry_run:
+                for f in changed:
+                    self.emit('update', id=pk, field=f, old=current[pk][f], new=values[f])
+        self.counts['created'] += len(created)
+        self.counts['updated'] += len(updated)
+        if self.dry_run or not (created or updated):
+            return
+
+        using = router.db_for_write(Video)
+        features = connections[using].features
+        with transaction.atomic(using=using):
+            if features.supports_update_conflicts:
+                # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target.
+                unique_fields = ['id'] if features.supports_update_conflicts_with_target else None
+                Video.objects.bulk_create(
+                    created + updated, update_conflicts=True, unique_fields=unique_fields, update_fields=UPDATE_FIELDS,
+                )
+            else:
+                Video.objects.bulk_create(created)
+                Video.objects.bulk_update(updated, UPDATE_FIELDS)
+        self.backend.update_many(created + updated)
+        record_change(
+            removed=[tuple(current[video.pk][f] for f in FACET_FIELDS) for video in updated],
+            added=facet_rows(created + updated),
+        )
+        invalidate_groups()
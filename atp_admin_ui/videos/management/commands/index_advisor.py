@@ -0,0 +1,80 @@
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from videos.bench import bench_database, generate_videos
+from videos.indexes import (
+    RECOMMENDED_INDEXES, create_indexes, existing_indexes, explain, index_sql, missing_indexes, probes, regressions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Report which recommended indexes on the videos table are missing and how the queries issued by the '
+        'list, search and duplicates views are planned. Emits (--sql) or applies (--apply) the missing DDL. '
+        '--check creates the indexes on a synthetic SQLite stand-in and fails if a query stops using them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--explain', action='store_true', help='Print the plan of every query.')
+        parser.add_argument('--sql', action='store_true', help='Print DDL for the missing indexes.')
+        parser.add_argument('--apply', action='store_true', help='Create the missing indexes.')
+        parser.add_argument('--check', action='store_true', help='Run the query-plan regression check.')
+        parser.add_argument('--rows', type=int, default=20_000, help='Rows in the --check stand-in.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            return self.check_plans(options['rows'])
+
+        using = options['database']
+        self.stdout.write(f'Indexes on videos ({connections[using].vendor}):')
+        for name, columns in existing_indexes(using).items():
+            self.stdout.write(f"  {name} ({', '.join(columns)})")
+
+        missing = missing_indexes(using)
+        for name in missing:
+            self.stdout.write(f"Missing: {name} ({', '.join(RECOMMENDED_INDEXES[name])})")
+        if not missing:
+            self.stdout.write('All recommended indexes exist.')
+
+        self.report_plans(using, options['explain'])
+
+        if missing and options['sql']:
+            for statement in index_sql(missing, using):
+                self.stdout.write(statement)
+        if missing and options['apply']:
+            create_indexes(missing, using)
+            self.stdout.write(f"Created {', '.join(missing)}.")
+
+    def report_plans(self, using, verbose):
+        for probe in probes(using):
+            plan = explain(probe.queryset)
+            notes = []
+            if plan.full_scan:
+                notes.append('full scan')
+            if plan.sort and not probe.allow_sort:
+                notes.append('sorts')
+            if probe.expects and probe.expects not in plan.indexes:
+                notes.append(f'does not use {probe.expects}')
+            status = ', '.join(notes) or 'ok'
+            used = ', '.join(sorted(plan.indexes)) or '-'
+            self.stdout.write(f'{probe.label:<36} {status:<52} indexes: {used}')
+            if verbose:
+                self.stdout.write(f'    {plan.detail}')
+
+    def check_plans(self, rows):
+        with tempfile.TemporaryDirectory() as tmp, bench_database(Path(tmp) / 'videos.sqlite3') as using:
+            generate_videos(rows, using, duplicate_rate=0.1)
+            create_indexes(list(RECOMMENDED_INDEXES), using)
+            with connections[using].cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.report_plans(using, verbose=False)
+            failed = regressions(using)
+        if failed:
+            for probe, plan in failed:
+                self.stderr.write(f'{probe.label}: expected {probe.expects}, got {plan.detail}')
+            raise CommandError(f'{len(failed)} queries no longer use their index.')
+        self.stdout.write('Query plans OK.')
@@ -0,0 +1,132 @@
+import http.cookiejar
+import os
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class FormFields(HTMLParser):
+    """Collect the current values of a page's form fields."""
+
+    def __init__(self):
+        super().__init__()
+        self.fields = {}
+        self.textarea = None
+        self.select = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = attrs.get('name')
+        if tag == 'input' and name and attrs.get('type') not in ('file', 'submit', 'checkbox'):
+            self.fields[name] = attrs.get('value') or ''
+        elif tag == 'input' and name and attrs.get('type') == 'checkbox' and 'checked' in attrs:
+            self.fields[name] = attrs.get('value') or 'on'
+        elif tag == 'textarea' and name:
+            self.textarea = name
+            self.fields[name] = ''
+        elif tag == 'option' and 'selected' in attrs and self.select:
+            self.fields[self.select] = attrs.get('value') or ''
+        if tag == 'select':
+            self.select = name
+
+    def handle_endtag(self, tag):
+        if tag == 'textarea':
+            self.textarea = None
+        elif tag == 'select':
+            self.select = None
+
+    def handle_data(self, data):
+        if self.textarea:
+            self.fields[self.textarea] += data
+
+
+def multipart(fields, file_field, filename, content):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Send concurrent requests to a running server and report requests/second and latency. '
+        'Run it once against the sync deployment and once with ASYNC_VIEWS=1 under gunicorn.conf.py to compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8001/', help='Base URL of the server.')
+        parser.add_argument('--path', action='append', help='Paths to GET, cycled (default: the list page).')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level.')
+        parser.add_argument(
+            '--upload-pk', type=int,
+            help='POST a file to the edit page of this video instead of GETs. Its files are overwritten; use a test row.',
+        )
+        parser.add_argument('--upload-field', default='vtt_file')
+        parser.add_argument('--upload-kb', type=int, default=1024)
+
+    def handle(self, *args, **options):
+        base = options['url']
+        if options['upload_pk']:
+            edit_url = urljoin(base, f"{options['upload_pk']}/")
+            payload = self.upload_request(edit_url, options)
+            make_request = lambda i: payload()
+        else:
+            paths = options['path'] or ['']
+            make_request = lambda i: urllib.request.Request(urljoin(base, paths[i % len(paths)]))
+
+        for concurrency in options['concurrency']:
+            def send(i):
+                start = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(make_request(i), timeout=300) as response:
+                        response.read()
+                        ok = response.status < 400
+                except urllib.error.HTTPError as e:
+                    ok = e.code < 400
+                except OSError:
+                    ok = False
+                return time.perf_counter() - start, ok
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                results = list(pool.map(send, range(options['requests'])))
+            elapsed = time.perf_counter() - start
+            latencies = sorted(r[0] * 1000 for r in results)
+            errors = sum(1 for r in results if not r[1])
+            self.stdout.write(
+                f'concurrency {concurrency:>3}: {len(results) / elapsed:7.1f} req/s | '
+                f'p50 {statistics.median(latencies):7.1f} ms | '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1]:7.1f} ms | '
+                f'max {latencies[-1]:7.1f} ms | errors {errors}'
+            )
+
+    def upload_request(self, edit_url, options):
+        """Return a factory for POSTs that resubmit the edit form with a file attached."""
+        jar = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+        try:
+            with opener.open(edit_url) as response:
+                page = response.read().decode()
+        except OSError as e:
+            raise CommandError(f'Could not load {edit_url}: {e}')
+        parser = FormFields()
+        parser.feed(page)
+        cookies = '; '.join(f'{c.name}={c.value}' for c in jar)
+        content = os.urandom(options['upload_kb'] * 1024)
+        body, content_type = multipart(parser.fields, options['upload_field'], 'loadtest.bin', content)
+        headers = {'Content-Type': content_type, 'Cookie': cookies, 'Referer': edit_url}
+        return lambda: urllib.request.Request(edit_url, data=body, headers=headers, method='POST')
@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from videos.media import PROBED_EXTENSIONS, refresh_all
+from videos.models import MediaProbe, Video
+
+
+class Command(BaseCommand):
+    help = (
+        f"Hash and parse the headers of every video's {'/'.join(PROBED_EXTENSIONS)} files under FS_PATH, "
+        'recording unreadable or mismatched media. Files whose size and mtime are unchanged since the last '
+        'run are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help='Re-probe files that have not changed.')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running, rescanning every INTERVAL seconds (0 scans once).',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.scan(options)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def scan(self, options):
+        started = time.perf_counter()
+        rows = Video.objects.order_by('vid_url').values_list('id', 'vid_url').iterator(chunk_size=5000)
+        videos = probed = removed = 0
+        for count, batch_probed, batch_removed in refresh_all(
+            rows, options['workers'], options['batch_size'], options['force'],
+        ):
+            videos += count
+            probed += batch_probed
+            removed += batch_removed
+        # Probes of videos deleted outside the app.
+        existing = set(Video.objects.values_list('id', flat=True).iterator(chunk_size=5000))
+        orphans = [pk for pk in MediaProbe.objects.values_list('video_id', flat=True).distinct() if pk not in existing]
+        for i in range(0, len(orphans), 500):
+            MediaProbe.objects.filter(video_id__in=orphans[i:i + 500]).delete()
+        broken = MediaProbe.objects.exclude(error='', mismatch='').values('video_id').distinct().count()
+        self.stdout.write(
+            f'Checked files of {videos} videos in {time.perf_counter() - started:.1f}s: {probed} probed, '
+            f'{removed + len(orphans)} stale probes removed, {broken} videos with broken media.'
+        )
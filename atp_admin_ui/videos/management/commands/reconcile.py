@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from videos.mappings import DB_FIELDS
+from videos.models import Video
+from videos.paths import resolve_fs_path, walk_parallel
+from videos.sidecars import read_sql_params, write_sql_params
+
+TRACKED_EXTENSIONS = ('.mp4', '.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the videos table with the files under FS_PATH and report rows without a vid_url, '
+        'rows without an mp4, mp4/json files without a row, and JSON sidecars whose sql_params differ '
+        'from the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--format', choices=['text', 'json'], default='text')
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Rewrite drifted sidecars from the database. Missing and orphaned files are only reported.',
+        )
+
+    def emit(self, kind, **details):
+        if self.format == 'json':
+            self.stdout.write(json.dumps({'kind': kind, **details}))
+        else:
+            self.stdout.write('\t'.join([kind] + [str(v) for v in details.values()]))
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def handle(self, *args, **options):
+        self.format = options['format']
+        self.counts = {}
+        started = time.perf_counter()
+        # Both sides of the comparison are spooled to an on-disk SQLite file,
+        # so memory stays flat however many files and rows there are.
+        with tempfile.TemporaryDirectory() as tmp:
+            db = sqlite3.connect(os.path.join(tmp, 'reconcile.sqlite3'))
+            db.execute('CREATE TABLE fs (path TEXT PRIMARY KEY)')
+            db.execute('CREATE TABLE rows (id INTEGER, mp4 TEXT, json TEXT)')
+
+            files = 0
+            for paths in walk_parallel(os.getenv('FS_PATH', '/data'), TRACKED_EXTENSIONS, options['workers']):
+                db.executemany('INSERT OR IGNORE INTO fs VALUES (?)', [(p,) for p in paths])
+                files += len(paths)
+            db.execute('CREATE INDEX rows_mp4 ON rows (mp4)')
+            db.execute('CREATE INDEX rows_json ON rows (json)')
+            self.stderr.write(f'Found {files} mp4/json files in {time.perf_counter() - started:.1f}s.')
+
+            rows = Video.objects.order_by().values_list(*DB_FIELDS).iterator(chunk_size=options['batch_size'])
+            vid_url = DB_FIELDS.index('vid_url')
+            with ThreadPoolExecutor(options['workers']) as pool:
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= options['batch_size']:
+                        self.check_rows(db, pool, batch, vid_url, options['fix'])
+                        batch = []
+                self.check_rows(db, pool, batch, vid_url, options['fix'])
+
+            for pk, path in db.execute('SELECT id, mp4 FROM rows WHERE mp4 NOT IN (SELECT path FROM fs)'):
+                self.emit('missing_file', id=pk, path=path)
+            orphans = db.execute(
+                'SELECT path FROM fs WHERE path NOT IN (SELECT mp4 FROM rows) AND path NOT IN (SELECT json FROM rows)'
+            )
+            for (path,) in orphans:
+                self.emit('orphan_sidecar' if path.endswith('.json') else 'orphan_file', path=path)
+            db.close()
+
+        summary = ', '.join(f'{k}={v}' for k, v in sorted(self.counts.items())) or 'no differences'
+        self.stderr.write(f'Reconciled in {time.perf_counter() - started:.1f}s: {summary}')
+
+    def check_rows(self, db, pool, batch, vid_url, fix):
+        # Rows without a URL have no files to compare; they are reported on their own.
+        for row in batch:
+            if not row[vid_url]:
+                self.emit('missing_url', id=row[0])
+        batch = [row for row in batch if row[vid_url]]
+        entries = []
+        for row in batch:
+            entries.append((row[0], resolve_fs_path(row[vid_url]), resolve_fs_path(row[vid_url], 'json')))
+        db.executemany('INSERT INTO rows VALUES (?, ?, ?)', entries)
+
+        with_sidecar = [
+            (row, entry[2]) for row, entry in zip(batch, entries)
+            if db.execute('SELECT 1 FROM fs WHERE path = ?', (entry[2],)).fetchone()
+        ]
+        for (row, path), current in zip(with_sidecar, pool.map(read_sql_params, [p for _, p in with_sidecar])):
+            expected = json.loads(json.dumps(dict(zip(DB_FIELDS, row))))
+            if current == expected:
+                continue
+            current = current or {}
+            changed = sorted(k for k in set(expected) | set(current) if current.get(k) != expected.get(k))
+            self.emit('sidecar_drift', id=row[0], path=path, fields=','.join(changed))
+            if fix:
+                try:
+                    write_sql_params(path, expected)
+                except (OSError, ValueError) as e:
+                    self.stderr.write(f'Could not fix {path}: {e}')
@@ -0,0 +1,54 @@
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import FieldError
+
+from videos.models import Video
+from videos.sidecars import regenerate
+
+
+def parse_filter(value):
+    lookup, sep, term = value.partition('=')
+    if not sep:
+        raise CommandError(f'Invalid --filter {value!r}, expected field__lookup=value.')
+    return lookup, term
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the JSON sidecar of every video (or of those matching --filter), creating missing ones. '
+        'Sidecars whose sql_params already match the database are left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filter', action='append', default=[], type=parse_filter,
+            help='Django lookup restricting the videos, e.g. --filter vid_preacher__icontains=anderson. Repeatable.',
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            queryset = Video.objects.filter(**dict(options['filter']))
+            total = queryset.count()
+        except FieldError as e:
+            raise CommandError(e)
+        started = time.perf_counter()
+        results = Counter()
+        for done, result in enumerate(regenerate(queryset, options['workers'], options['batch_size']), 1):
+            if result.startswith('error'):
+                results['errors'] += 1
+                self.stderr.write(result)
+            else:
+                results[result] += 1
+            if done % 10_000 == 0:
+                self.stderr.write(f'{done}/{total} sidecars')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Checked {total} sidecars in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f}/s): "
+            f"{results['created']} created, {results['updated']} updated, {results['unchanged']} unchanged, "
+            f"{results['errors']} errors."
+        )
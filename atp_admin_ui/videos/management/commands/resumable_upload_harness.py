@@ -0,0 +1,92 @@
+import hashlib
+import os
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from videos.resumable import ResumableUpload
+
+
+class SimulatedDisconnect(ConnectionResetError):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Offline check of the resumable upload store: sends a random file in parallel chunks, '
+        'cutting transfers off at random points, and resumes until the file is complete.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=32)
+        parser.add_argument('--chunk-kb', type=int, default=1024)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--interrupt-rate', type=float, default=0.3)
+        parser.add_argument('--max-rounds', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        payload = os.urandom(options['size_mb'] * 1024 * 1024)
+        chunk_size = options['chunk_kb'] * 1024
+        interrupts = 0
+        sent = 0
+
+        def send(upload, start, end):
+            nonlocal interrupts, sent
+            cut = rng.randint(start, end - 1) if rng.random() < options['interrupt_rate'] else None
+
+            def body():
+                nonlocal interrupts, sent
+                for position in range(start, end, 64 * 1024):
+                    piece = payload[position:min(position + 64 * 1024, end)]
+                    if cut is not None and position + len(piece) > cut:
+                        yield piece[:cut - position]
+                        sent += cut - position
+                        interrupts += 1
+                        raise SimulatedDisconnect()
+                    sent += len(piece)
+                    yield piece
+
+            try:
+                upload.write(start, body())
+            except SimulatedDisconnect:
+                pass
+
+        with tempfile.TemporaryDirectory() as tmp:
+            target = os.path.join(tmp, 'video.mp4')
+            ResumableUpload(target, tmp).create(len(payload))
+            for round_number in range(1, options['max_rounds'] + 1):
+                # A fresh object per round: all resume state must come from disk.
+                upload = ResumableUpload(target, tmp)
+                missing = upload.missing_ranges()
+                if not missing:
+                    break
+                tasks = [
+                    (start, min(start + chunk_size, end))
+                    for range_start, end in missing
+                    for start in range(range_start, end, chunk_size)
+                ]
+                with ThreadPoolExecutor(options['workers']) as pool:
+                    list(pool.map(lambda task: send(upload, *task), tasks))
+                self.stdout.write(
+                    f'round {round_number}: {len(tasks)} chunks, offset {upload.offset}/{len(payload)}, '
+                    f'{len(upload.missing_ranges())} gaps left'
+                )
+            else:
+                raise CommandError(f"Upload still incomplete after {options['max_rounds']} rounds.")
+
+            upload.finish()
+            with open(target, 'rb') as f:
+                received = hashlib.sha256(f.read()).hexdigest()
+            if received != hashlib.sha256(payload).hexdigest():
+                raise CommandError('Assembled file does not match the source.')
+            leftovers = sorted(set(os.listdir(tmp)) - {'video.mp4'})
+            if leftovers:
+                raise CommandError(f'Partial files left behind: {leftovers}')
+        self.stdout.write(self.style.SUCCESS(
+            f'OK: {len(payload)} bytes assembled after {interrupts} interruptions, '
+            f'{sent - len(payload)} bytes re-sent.'
+        ))
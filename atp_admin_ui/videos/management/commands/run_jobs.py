@@ -0,0 +1,43 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from videos.jobs import drain, work
+
+
+def _worker(poll_interval):
+    stop = multiprocessing.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    work(poll_interval, stop)
+
+
+class Command(BaseCommand):
+    help = 'Run job queue workers (sidecar rewrites, file deletes, bulk actions). Use with JOBS_MODE=worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes.')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Run every runnable job, then exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.stdout.write(f'Ran {drain()} jobs.')
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_worker, args=(options['poll_interval'],), daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} job workers.")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
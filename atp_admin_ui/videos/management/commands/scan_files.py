@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from videos.filestatus import scan
+from videos.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Refresh the cached presence/size of every video\'s mp4/mp3/vtt/jpg/json files under FS_PATH.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running, rescanning every INTERVAL seconds (0 scans once).',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            rows = Video.objects.order_by('vid_url').values_list('id', 'vid_url').iterator(chunk_size=5000)
+            count = scan(rows, options['batch_size'])
+            self.stdout.write(f'Scanned files of {count} videos in {time.perf_counter() - started:.1f}s.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,311 @@
+# videos/media.py
+"""Integrity and metadata index of each video's mp4, mp3 and vtt files.
+
+``probe_file`` memory-maps a file, hashes it and reads just enough of its
+headers to describe it: the mp4 duration from the ``moov/mvhd`` box, the
+first mp3 frame header (plus the Xing/Info frame count for VBR files) and
+the number of WebVTT cues. Results are stored in ``MediaProbe`` in the local
+database. ``refresh`` only re-probes files whose size or mtime changed and
+runs the probes on a process pool; it is driven by ``manage.py probe_media``
+and by a ``probe_media`` job queued after uploads.
+
+A probe records an ``error`` when its file cannot be parsed, and a
+``mismatch`` when the files of one video disagree (audio and video lengths
+differ, subtitles run past the end of the video). Videos with either are
+"broken" and can be listed with ``?broken=1``.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .metrics import track_fs
+from .models import MediaProbe, Video
+from .paths import resolve_fs_path
+
+PROBED_EXTENSIONS = ('mp4', 'mp3', 'vtt')
+# Largest difference between the mp4 and mp3 lengths not reported as a mismatch.
+DURATION_TOLERANCE = 5.0
+# How far into an mp3 (after any ID3 tag) to look for the first frame.
+MP3_SYNC_WINDOW = 64 * 1024
+
+MP3_VERSIONS = {0: '2.5', 2: '2', 3: '1'}
+MP3_BITRATES = {
+    '1': [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    '2': [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {'1': [44100, 48000, 32000], '2': [22050, 24000, 16000], '2.5': [11025, 12000, 8000]}
+VTT_TIMESTAMP = re.compile(r'(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})')
+
+
+class ProbeError(ValueError):
+    pass
+
+
+def _boxes(data, start, end):
+    """``(type, payload_start, box_end)`` of the ISO BMFF boxes between ``start`` and ``end``."""
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise ProbeError('truncated box header')
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise ProbeError(f"box '{kind.decode('latin-1')}' runs past the end of the file (truncated?)")
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def mp4_info(data):
+    for kind, start, end in _boxes(data, 0, len(data)):
+        if kind != b'moov':
+            continue
+        for child, payload, child_end in _boxes(data, start, end):
+            if child != b'mvhd':
+                continue
+            version = data[payload]
+            if version == 1:
+                timescale, duration = struct.unpack_from('>IQ', data, payload + 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', data, payload + 12)
+            if not timescale:
+                raise ProbeError('mvhd has a zero timescale')
+            return {'duration': duration / timescale}
+        raise ProbeError('moov box has no mvhd header')
+    raise ProbeError('no moov box (incomplete upload or not an mp4)')
+
+
+def _skip_id3(data):
+    if data[:3] == b'ID3' and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size + (10 if data[5] & 0x10 else 0)
+    return 0
+
+
+def mp3_info(data):
+    start = _skip_id3(data)
+    window = data[start:start + MP3_SYNC_WINDOW]
+    offset = -1
+    while True:
+        offset = window.find(b'\xff', offset + 1)
+        if offset < 0 or offset + 4 > len(window):
+            raise ProbeError('no MPEG audio frame header found')
+        header = struct.unpack_from('>I', window, offset)[0]
+        if header >> 21 != 0x7ff:
+            continue
+        version = MP3_VERSIONS.get((header >> 19) & 3)
+        layer = (header >> 17) & 3
+        bitrate_index = (header >> 12) & 15
+        rate_index = (header >> 10) & 3
+        if version and layer == 1 and 0 < bitrate_index < 15 and rate_index < 3:
+            break
+    bitrate = MP3_BITRATES['1' if version == '1' else '2'][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    mono = (header >> 6) & 3 == 3
+    samples_per_frame = 1152 if version == '1' else 576
+    info = {
+        'version': version, 'bitrate': bitrate // 1000, 'sample_rate': sample_rate,
+        'channels': 'mono' if mono else 'stereo', 'vbr': False,
+    }
+    # A Xing/Info frame after the side information holds the frame count.
+    side_info = (17 if mono else 32) if version == '1' else (9 if mono else 17)
+    tag = start + offset + 4 + side_info
+    if data[tag:tag + 4] in (b'Xing', b'Info') and struct.unpack_from('>I', data, tag + 4)[0] & 1:
+        frames = struct.unpack_from('>I', data, tag + 8)[0]
+        info['vbr'] = data[tag:tag + 4] == b'Xing'
+        info['duration'] = frames * samples_per_frame / sample_rate
+    else:
+        info['duration'] = (len(data) - start - offset) * 8 / bitrate
+    return info
+
+
+def vtt_info(data):
+    text = bytes(data).decode('utf-8-sig', errors='replace')
+    if not text.startswith('WEBVTT'):
+        raise ProbeError('missing WEBVTT header')
+    cues, last_end = 0, 0.0
+    for line in text.splitlines():
+        if '-->' not in line:
+            continue
+        match = VTT_TIMESTAMP.match(line.split('-->', 1)[1].strip())
+        if not match:
+            raise ProbeError(f'invalid cue timing: {line.strip()[:60]}')
+        hours, minutes, seconds, millis = match.groups()
+        last_end = max(last_end, int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000)
+        cues += 1
+    return {'cues': cues, 'duration': last_end}
+
+
+PARSERS = {'mp4': mp4_info, 'mp3': mp3_info, 'vtt': vtt_info}
+
+
+def probe_file(path, ext):
+    """Size, mtime, sha256 and header metadata of one file; runs in a worker process."""
+    stat = os.stat(path)
+    result = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': '', 'details': {}, 'error': ''}
+    if not stat.st_size:
+        result['error'] = 'empty file'
+        return result
+    with track_fs('media_probe', stat.st_size), open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        result['sha256'] = hashlib.sha256(data).hexdigest()
+        try:
+            result['details'] = PARSERS[ext](data)
+        except (ProbeError, struct.error, IndexError) as e:
+            result['error'] = str(e) or 'unreadable header'
+    return result
+
+
+def _probe_task(item):
+    video_id, ext, path = item
+    try:
+        return video_id, ext, probe_file(path, ext)
+    except OSError:
+        # Deleted between the stat and the probe.
+        return video_id, ext, None
+
+
+def mismatches(probes):
+    """``{ext: message}`` for files of one video that contradict each other."""
+    durations = {
+        ext: probe.details.get('duration') for ext, probe in probes.items() if not probe.error
+    }
+    video = durations.get('mp4')
+    found = {}
+    if video is not None and durations.get('mp3') is not None:
+        if abs(durations['mp3'] - video) > max(DURATION_TOLERANCE, 0.02 * video):
+            found['mp3'] = f"audio is {durations['mp3']:.0f}s long, video {video:.0f}s"
+    if video is not None and durations.get('vtt') is not None:
+        if durations['vtt'] > video + DURATION_TOLERANCE:
+            found['vtt'] = f"subtitles end at {durations['vtt']:.0f}s, video is {video:.0f}s long"
+    return found
+
+
+def _stale(rows, force):
+    """Files of ``(id, vid_url)`` rows that need probing, and probes of files that are gone."""
+    stored = {}
+    for probe in MediaProbe.objects.filter(video_id__in=[video_id for video_id, _ in rows]):
+        stored[probe.video_id, probe.ext] = probe
+    todo, gone = [], []
+    for video_id, vid_url in rows:
+        for ext in PROBED_EXTENSIONS:
+            path = resolve_fs_path(vid_url, ext)
+            probe = stored.get((video_id, ext))
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if probe:
+                    gone.append(probe.pk)
+                continue
+            if force or not probe or probe.size != stat.st_size or probe.mtime != stat.st_mtime:
+                todo.append((video_id, ext, path))
+    return todo, gone
+
+
+def _save(results, gone):
+    now = timezone.now()
+    probes = [
+        MediaProbe(
+            video_id=video_id, ext=ext, size=result['size'], mtime=result['mtime'], sha256=result['sha256'],
+            duration=result['details'].get('duration'), details=result['details'], error=result['error'][:255],
+            probed_at=now,
+        )
+        for video_id, ext, result in results if result is not None
+    ]
+    MediaProbe.objects.filter(pk__in=gone).delete()
+    MediaProbe.objects.bulk_create(
+        probes, update_conflicts=True, unique_fields=['video_id', 'ext'],
+        update_fields=['size', 'mtime', 'sha256', 'duration', 'details', 'error', 'probed_at'],
+    )
+    # Cross-file checks for every video whose files changed.
+    changed = {video_id for video_id, _, _ in results}
+    by_video = {}
+    for probe in MediaProbe.objects.filter(video_id__in=changed):
+        by_video.setdefault(probe.video_id, {})[probe.ext] = probe
+    updates = []
+    for files in by_video.values():
+        found = mismatches(files)
+        for ext, probe in files.items():
+            if probe.mismatch != found.get(ext, ''):
+                probe.mismatch = found.get(ext, '')
+                updates.append(probe)
+    MediaProbe.objects.bulk_update(updates, ['mismatch'])
+    return len(probes)
+
+
+def refresh(rows, pool=None, force=False):
+    """Probe the new or changed files of ``(id, vid_url)`` rows; returns ``(probed, removed)``.
+
+    ``pool`` is an executor to probe on; without one files are probed inline.
+    """
+    todo, gone = _stale(rows, force)
+    results = list(pool.map(_probe_task, todo, chunksize=8) if pool else map(_probe_task, todo))
+    return _save(results, gone), len(gone)
+
+
+def refresh_all(rows, workers=None, batch_size=500, force=False):
+    """Run ``refresh`` over an iterable of ``(id, vid_url)`` rows, yielding per-batch counts."""
+    with ProcessPoolExecutor(workers, initializer=django.setup) as pool:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield len(batch), *refresh(batch, pool, force)
+                batch = []
+        if batch:
+            yield len(batch), *refresh(batch, pool, force)
+
+
+def remove_probes(video_ids, exts=PROBED_EXTENSIONS):
+    MediaProbe.objects.filter(video_id__in=video_ids, ext__in=exts).delete()
+
+
+def probes_for(video):
+    """Stored probes of a video by extension, each marked ``stale`` if its file changed since."""
+    probes = {probe.ext: probe for probe in MediaProbe.objects.filter(video_id=video.pk)}
+    for ext, probe in probes.items():
+        probe.summary = ', '.join(f'{key}: {value}' for key, value in probe.details.items() if key != 'duration')
+        try:
+            stat = os.stat(resolve_fs_path(video.vid_url, ext))
+            probe.stale = (stat.st_size, stat.st_mtime) != (probe.size, probe.mtime)
+        except OSError:
+            probe.stale = True
+    return [probes[ext] for ext in PROBED_EXTENSIONS if ext in probes]
+
+
+def broken_video_ids():
+    return set(
+        MediaProbe.objects.exclude(error='', mismatch='').values_list('video_id', flat=True)
+    )
+
+
+def filter_broken(queryset, params):
+    """Only videos with an unreadable or mismatched file when ``broken=1`` is set."""
+    if params.get('broken') == '1':
+        queryset = queryset.filter(pk__in=broken_video_ids())
+    return queryset
+
+
+def queue_probe(video):
+    return enqueue('probe_media', {'video_id': video.pk}, key=f'probe_media:{video.pk}')
+
+
+@task('probe_media')
+def probe_media(job):
+    video = Video.objects.filter(pk=job.payload['video_id']).values_list('id', 'vid_url').first()
+    if video is None:
+        job.advance(1, 'Video no longer exists, nothing to probe.')
+        return
+    probed, removed = refresh([video])
+    job.advance(1, f'{probed} files probed, {removed} probes of deleted files removed.')
@@ -0,0 +1,284 @@
+# videos/metrics.py
+"""Request-level performance counters.
+
+``PerformanceMiddleware`` times each request together with the SQL it runs,
+its template rendering and the filesystem work done inside ``track_fs``.
+Per-request numbers go out in a ``Server-Timing`` header; running totals per
+view and per filesystem operation are served in Prometheus text format by
+``MetricsView``. With ``VIDEOS_METRICS_DIR`` set, every process writes its
+totals there (at most once a second) and the endpoint sums all of them, so
+each gunicorn worker, job worker and pool child is counted. A process folds
+its file into the host's retired totals when it exits, and gunicorn's master
+does the same through ``mark_process_dead`` for workers that were killed, so
+the directory does not grow with every process ever started.
+"""
+import contextvars
+import fcntl
+import json
+import multiprocessing.util
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils.deprecation import MiddlewareMixin
+
+FLUSH_INTERVAL = 1.0
+
+_current = contextvars.ContextVar('videos_request_stats', default=None)
+_lock = threading.Lock()
+_last_flush = 0.0
+_retire_registered = False
+# Running totals keyed on the Prometheus series, e.g. 'atp_requests_total{view="video_list"}'.
+TOTALS = defaultdict(float)
+
+
+def _reset_after_fork():
+    # A forked child (pool worker, gunicorn worker) counts only its own work.
+    global _lock, _last_flush, _retire_registered
+    _lock = threading.Lock()
+    _last_flush = 0.0
+    _retire_registered = False
+    TOTALS.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class RequestStats:
+    __slots__ = ('started', 'sql_count', 'sql_time', 'template_time', 'fs_count', 'fs_bytes', 'fs_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.fs_count = 0
+        self.fs_bytes = 0
+        self.fs_time = 0.0
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'fs;dur={self.fs_time * 1000:.1f};desc="{self.fs_count} ops, {self.fs_bytes} bytes"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def current_stats():
+    return _current.get()
+
+
+def _add(values):
+    global _last_flush, _retire_registered
+    directory = getattr(settings, 'VIDEOS_METRICS_DIR', None)
+    snapshot = None
+    with _lock:
+        for series, value in values.items():
+            TOTALS[series] += value
+        if directory and not _retire_registered:
+            _retire_registered = True
+            # Runs at interpreter exit and also when a multiprocessing child
+            # (run_jobs worker, ProcessPoolExecutor worker) finishes, where
+            # plain atexit hooks are skipped.
+            multiprocessing.util.Finalize(None, _retire, args=(os.getpid(), directory), exitpriority=0)
+        now = time.monotonic()
+        if directory and now - _last_flush >= FLUSH_INTERVAL:
+            _last_flush = now
+            snapshot = dict(TOTALS)
+    if snapshot is not None:
+        _write_snapshot(directory, snapshot)
+
+
+def _write_snapshot(directory, snapshot, name=None):
+    os.makedirs(directory, exist_ok=True)
+    name = name or f'{socket.gethostname()}-{os.getpid()}'
+    path = os.path.join(directory, f'{name}.json')
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_snapshot(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def mark_process_dead(pid, directory):
+    """Add the totals of exited process ``pid`` to this host's retired file and remove its own.
+
+    Called by each process as it exits and from gunicorn's ``child_exit``
+    hook in the master; a lock file serializes the updates. The sums served
+    at /metrics/ stay the same, so the counters do not look reset to
+    Prometheus.
+    """
+    if not directory:
+        return
+    host = socket.gethostname()
+    path = os.path.join(directory, f'{host}-{pid}.json')
+    retired_name = f'{host}-retired'
+    with open(os.path.join(directory, retired_name + '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            snapshot = _read_snapshot(path)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            snapshot = {}
+        try:
+            retired = defaultdict(float, _read_snapshot(os.path.join(directory, retired_name + '.json')))
+        except (FileNotFoundError, ValueError):
+            retired = defaultdict(float)
+        for series, value in snapshot.items():
+            retired[series] += value
+        _write_snapshot(directory, retired, retired_name)
+        os.remove(path)
+
+
+def _retire(pid, directory):
+    """Write this process's final totals and fold them into the retired file, at exit."""
+    if os.getpid() != pid:
+        # Inherited by a child forked without multiprocessing, e.g. a gunicorn worker.
+        return
+    with _lock:
+        snapshot = dict(TOTALS)
+    try:
+        _write_snapshot(directory, snapshot)
+        mark_process_dead(os.getpid(), directory)
+    except OSError:
+        pass
+
+
+def _record_sql(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - start
+
+
+def install_sql_hook(sender, connection, **kwargs):
+    if _record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_sql)
+
+
+connection_created.connect(install_sql_hook)
+
+
+def record_count(series, value=1):
+    """Add ``value`` to the counter ``series``, e.g. 'atp_result_cache_hits_total'."""
+    _add({series: value})
+
+
+def process_totals():
+    """Totals of this process only."""
+    with _lock:
+        return dict(TOTALS)
+
+
+def record_fs(op, nbytes, seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.fs_count += 1
+        stats.fs_bytes += nbytes
+        stats.fs_time += seconds
+    _add({
+        f'atp_fs_operations_total{{op="{op}"}}': 1,
+        f'atp_fs_bytes_total{{op="{op}"}}': nbytes,
+        f'atp_fs_seconds_total{{op="{op}"}}': seconds,
+    })
+
+
+@contextmanager
+def track_fs(op, nbytes=0):
+    """Count the filesystem work in the block as one ``op`` of ``nbytes`` bytes."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_fs(op, nbytes, time.perf_counter() - start)
+
+
+class PerformanceMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        request.perf_stats = RequestStats()
+        _current.set(request.perf_stats)
+
+    def process_template_response(self, request, response):
+        stats = getattr(request, 'perf_stats', None)
+        if stats is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                stats.template_time += time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+    def process_response(self, request, response):
+        stats = getattr(request, 'perf_stats', None)
+        if stats is None:
+            return response
+        _current.set(None)
+        total = time.perf_counter() - stats.started
+        response['Server-Timing'] = stats.server_timing(total)
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unresolved'
+        _add({
+            f'atp_requests_total{{view="{view}"}}': 1,
+            f'atp_request_seconds_total{{view="{view}"}}': total,
+            f'atp_sql_queries_total{{view="{view}"}}': stats.sql_count,
+            f'atp_sql_seconds_total{{view="{view}"}}': stats.sql_time,
+            f'atp_template_seconds_total{{view="{view}"}}': stats.template_time,
+            f'atp_fs_request_seconds_total{{view="{view}"}}': stats.fs_time,
+        })
+        return response
+
+
+def collect():
+    """Totals of this process, or of every process when VIDEOS_METRICS_DIR is set."""
+    directory = getattr(settings, 'VIDEOS_METRICS_DIR', None)
+    own = process_totals()
+    if not directory or not os.path.isdir(directory):
+        return own
+    # This process's file may be up to FLUSH_INTERVAL old; use live numbers for it.
+    own_file = f'{socket.gethostname()}-{os.getpid()}.json'
+    totals = defaultdict(float, own)
+    for name in os.listdir(directory):
+        if not name.endswith('.json') or name == own_file:
+            continue
+        try:
+            snapshot = _read_snapshot(os.path.join(directory, name))
+        except (OSError, ValueError):
+            continue
+        for series, value in snapshot.items():
+            totals[series] += value
+    return totals
+
+
+def render_prometheus(totals):
+    lines = []
+    series = dict(totals)
+    typed = set()
+    for key in sorted(series):
+        name = key.split('{', 1)[0]
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} counter')
+        lines.append(f'{key} {series[key]}')
+    return '\n'.join(lines) + '\n'
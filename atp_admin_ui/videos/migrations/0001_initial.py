@@ -0,0 +1,54 @@
+# Generated by Django 5.0 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Video',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('vid_category', models.CharField(max_length=255)),
+                ('search_category', models.CharField(max_length=255)),
+                ('vid_preacher', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('vid_title', models.CharField(max_length=255)),
+                ('vid_code', models.TextField()),
+                ('date', models.CharField(max_length=19)),
+                ('vid_url', models.CharField(max_length=512)),
+                ('video_id', models.CharField(max_length=50)),
+                ('main_category', models.CharField(max_length=255)),
+                ('profile_id', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.CharField(max_length=19)),
+                ('clicks', models.IntegerField(default=0)),
+                ('shorts', models.IntegerField(default=0)),
+                ('language', models.CharField(max_length=10)),
+                ('thumb_url', models.CharField(blank=True, max_length=512, null=True)),
+            ],
+            options={
+                'db_table': 'videos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_name', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=512)),
+                ('count', models.IntegerField()),
+                ('newest', models.CharField(max_length=19)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key_name', '-newest'], name='videos_dupl_key_nam_579e54_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0 on 2026-10-17 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.IntegerField()),
+                ('ext', models.CharField(max_length=4)),
+                ('exists', models.BooleanField()),
+                ('size', models.BigIntegerField(null=True)),
+                ('mtime', models.FloatField(null=True)),
+                ('checked_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='filestatus',
+            constraint=models.UniqueConstraint(fields=('video_id', 'ext'), name='filestatus_video_ext'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0005_facetcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaProbe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.IntegerField()),
+                ('ext', models.CharField(max_length=4)),
+                ('size', models.BigIntegerField()),
+                ('mtime', models.FloatField()),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('duration', models.FloatField(null=True)),
+                ('details', models.JSONField(default=dict)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('mismatch', models.CharField(blank=True, max_length=255)),
+                ('probed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='mediaprobe',
+            constraint=models.UniqueConstraint(fields=('video_id', 'ext'), name='mediaprobe_video_ext'),
+        ),
+    ]
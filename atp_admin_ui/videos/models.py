@@ -1,5 +1,8 @@
 # videos/models.py
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
 
 class Video(models.Model):
     id = models.IntegerField(primary_key=True)
@@ -10,11 +13,11 @@ class Video(models.Model):
     vid_title = models.CharField(max_length=255)
     vid_code = models.TextField()
     date = models.CharField(max_length=19)  # Changed from DateTimeField to handle string values from DB
-    vid_url = models.CharField(max_length=512)
+    vid_url = models.CharField(max_length=512, null=True)  # NULL in some rows of the real table
     video_id = models.CharField(max_length=50)
     main_category = models.CharField(max_length=255)
     profile_id = models.IntegerField(null=True, blank=True)
-    created_at = models.CharField(max_length=19)  # Changed from DateTimeField to handle string values from DB
+    created_at = models.CharField(max_length=19, null=True)  # Changed from DateTimeField to handle string values from DB; NULL in older rows
     clicks = models.IntegerField(default=0)
     shorts = models.IntegerField(default=0)
     language = models.CharField(max_length=10)
@@ -22,4 +25,102 @@ class Video(models.Model):
 
     class Meta:
         managed = False
-        db_table = 'videos'
\ No newline at end of file
+        db_table = 'videos'
+
+
+class DuplicateGroup(models.Model):
+    """Materialized list of duplicate groups, refreshed by ``videos.duplicates``."""
+    key_name = models.CharField(max_length=20)
+    key = models.CharField(max_length=512)
+    count = models.IntegerField()
+    newest = models.CharField(max_length=19)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['key_name', '-newest'])]
+
+
+class FacetCount(models.Model):
+    """Number of videos with one value of a facet field, maintained by ``videos.facets``."""
+    field = models.CharField(max_length=30)
+    value = models.CharField(max_length=512)
+    count = models.IntegerField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['field', 'value'], name='facetcount_field_value')]
+        indexes = [models.Index(fields=['field', '-count'])]
+
+
+class FileStatus(models.Model):
+    """Cached presence/size/mtime of one sidecar file of a video."""
+    video_id = models.IntegerField()
+    ext = models.CharField(max_length=4)
+    exists = models.BooleanField()
+    size = models.BigIntegerField(null=True)
+    mtime = models.FloatField(null=True)
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['video_id', 'ext'], name='filestatus_video_ext')]
+
+
+class MediaProbe(models.Model):
+    """Hash and header metadata of one mp4/mp3/vtt file of a video, maintained by ``videos.media``."""
+    video_id = models.IntegerField()
+    ext = models.CharField(max_length=4)
+    size = models.BigIntegerField()
+    mtime = models.FloatField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    # Seconds: mp4/mp3 running time, end of the last cue for vtt.
+    duration = models.FloatField(null=True)
+    details = models.JSONField(default=dict)
+    # Why the file could not be parsed, and how it disagrees with the video's other files.
+    error = models.CharField(max_length=255, blank=True)
+    mismatch = models.CharField(max_length=255, blank=True)
+    probed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['video_id', 'ext'], name='mediaprobe_video_ext')]
+
+
+class Job(models.Model):
+    """A unit of background work, run by ``manage.py run_jobs`` (see ``videos.jobs``)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(s, s) for s in (QUEUED, RUNNING, DONE, FAILED)]
+
+    kind = models.CharField(max_length=30)
+    payload = models.JSONField(default=dict)
+    # Queued jobs with the same key are coalesced, e.g. one sidecar rewrite per video.
+    key = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    total = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    log = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def progress(self):
+        return round(100 * self.done / self.total) if self.total else (100 if self.status == self.DONE else 0)
+
+    def update(self, **fields):
+        """Write ``fields`` to this job's row without touching the others."""
+        Job.objects.filter(pk=self.pk).update(updated_at=timezone.now(), **fields)
+
+    def advance(self, count, note=''):
+        """Record progress; also the heartbeat that keeps a long job from looking abandoned (STALE_AFTER)."""
+        updates = {'done': F('done') + count, 'locked_at': timezone.now()}
+        if note:
+            updates['log'] = Concat(F('log'), Value(note + '\n'))
+        self.update(**updates)
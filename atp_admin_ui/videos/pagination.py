@@ -0,0 +1,144 @@
+# videos/pagination.py
+"""Keyset (cursor) pagination for the video list.
+
+Pages are addressed by an opaque token holding the ``(created_at, id)`` of the
+row at the page boundary, so every page is a ``WHERE ... LIMIT n`` seek rather
+than an ``OFFSET`` scan, and the total is a cached estimate instead of a
+``COUNT(*)`` per request. Rows without a ``created_at`` come last, in id
+order, as MySQL sorts them anyway.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import F, Q
+
+# Oldest first; pages are read in reverse. NULLs sort first in ascending order
+# on both MySQL and SQLite, so neither needs more than the (created_at, id) index.
+ORDERING = (F('created_at').asc(nulls_first=True), F('id').asc())
+REVERSED = (F('created_at').desc(nulls_last=True), F('id').desc())
+COUNT_CACHE_TIMEOUT = 300
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(video, direction):
+    payload = json.dumps([video.created_at, video.id, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, pk, direction = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+    if direction not in ('next', 'prev') or not isinstance(pk, int) or not isinstance(created_at, (str, type(None))):
+        raise InvalidCursor(token)
+    return created_at, pk, direction
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], 'next')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], 'prev')
+        return None
+
+
+class CursorPaginator:
+    """Newest-first pages over ``(created_at, id)``, rows without a date last."""
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset.order_by(*REVERSED)
+        self.per_page = per_page
+
+    def seek(self, created_at, pk, direction):
+        """Rows after (``next``) or before (``prev``) the boundary row, nearest first."""
+        if created_at is None:
+            if direction == 'next':
+                return self.queryset.filter(created_at__isnull=True, id__lt=pk)
+            return self.queryset.filter(
+                Q(created_at__isnull=False) | Q(created_at__isnull=True, id__gt=pk)
+            ).order_by(*ORDERING)
+        if direction == 'next':
+            return self.queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk) | Q(created_at__isnull=True)
+            )
+        return self.queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)).order_by(*ORDERING)
+
+    def page(self, token=None):
+        if not token:
+            rows = list(self.queryset[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        created_at, pk, direction = decode_cursor(token)
+        rows = list(self.seek(created_at, pk, direction)[:self.per_page + 1])
+        if direction == 'next':
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+
+        has_previous = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page][::-1], self, True, has_previous)
+
+    @property
+    def count(self):
+        """Approximate number of rows, cached for a few minutes per filter."""
+        try:
+            sql = str(self.queryset.query)
+        except EmptyResultSet:
+            # A filter that cannot match, such as pk__in=[].
+            return 0
+        key = 'videos:count:' + hashlib.sha1(sql.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self._estimate() if not self.queryset.query.where else None
+            if count is None:
+                count = self.queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def _estimate(self):
+        # MySQL keeps a row estimate for InnoDB tables that is free to read.
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'mysql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [self.queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
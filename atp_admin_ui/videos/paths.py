@@ -0,0 +1,57 @@
+# videos/paths.py
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .metrics import track_fs
+from .uploads import STAGING_DIRNAME
+
+MEDIA_EXTENSIONS = ['mp4', 'mp3', 'vtt', 'jpg', 'json']
+
+
+def resolve_fs_path(vid_url, ext='mp4'):
+    """Filesystem path of a video's file with extension ``ext``, without side effects."""
+    base_url = os.getenv('BASE_SITE_URL', 'https://www.kjv1611only.com/')
+    rel_path = vid_url.replace(base_url, '')
+    base_fs = os.getenv('FS_PATH', '/data')
+    full_path = os.path.join(base_fs, rel_path)
+    if ext != 'mp4':
+        full_path = os.path.splitext(full_path)[0] + '.' + ext
+    return full_path
+
+
+def get_fs_path(video, ext='mp4'):
+    """Like ``resolve_fs_path`` but creates the parent directory, for writers."""
+    full_path = resolve_fs_path(video.vid_url, ext)
+    dir_path = os.path.dirname(full_path)
+    with track_fs('mkdir'):
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+    return full_path
+
+
+def list_directory(path, extensions):
+    """``(files, dirs)`` directly under ``path``; files are those ending in one of ``extensions``."""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != STAGING_DIRNAME:
+                        dirs.append(entry.path)
+                elif entry.name.endswith(extensions):
+                    files.append(entry.path)
+    except (FileNotFoundError, PermissionError):
+        pass
+    return files, dirs
+
+
+def walk_parallel(root, extensions, workers):
+    """Yield lists of file paths ending in ``extensions``, scanning directories on a thread pool."""
+    with ThreadPoolExecutor(workers) as pool:
+        pending = {pool.submit(list_directory, root, extensions)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, dirs = future.result()
+                pending.update(pool.submit(list_directory, d, extensions) for d in dirs)
+                yield files
@@ -0,0 +1,103 @@
+# videos/resultcache.py
+"""Cache of video list pages: primary keys and counts per query and page.
+
+Entries are keyed on the list query's SQL (which covers the search field,
+query, ordering and columns) plus the page number or cursor, so a repeated
+search costs one primary-key lookup instead of COUNT + page query. Keys carry
+a version number; ``invalidate_results`` bumps it whenever videos are saved or
+deleted through the app, and the cache timeout bounds staleness for changes
+made by other tools. Hits and misses are counted in ``videos.metrics``, per
+process, rather than in the cache itself. The ``a``-prefixed variants serve
+the async views.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+
+from .metrics import process_totals, record_count
+
+VERSION_KEY = 'videos:results:version'
+STAT_KEYS = ('hits', 'misses')
+
+
+def get_cache():
+    """The cache backing list results, or None when disabled."""
+    alias = getattr(settings, 'VIDEOS_RESULT_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def results_version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate_results():
+    """Drop every cached page by moving on to a new version."""
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 2, timeout=None)
+
+
+def query_key(queryset, *parts):
+    """Versioned cache key for ``queryset`` and e.g. a page number or cursor.
+
+    None for a query that cannot match anything (``.none()``, ``pk__in=[]``):
+    it has no SQL, and nothing to cache either.
+    """
+    cache = get_cache()
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return None
+    digest = hashlib.sha1(sql.encode()).hexdigest()
+    return ':'.join(['videos:results', str(results_version(cache)), digest, *map(str, parts)])
+
+
+def stat_series(stat):
+    return f'atp_result_cache_{stat}_total'
+
+
+def lookup(key):
+    """Cached value for ``key`` (None on a miss), counting hits and misses."""
+    value = get_cache().get(key)
+    record_count(stat_series('hits' if value is not None else 'misses'))
+    return value
+
+
+def store(key, value):
+    get_cache().set(key, value)
+
+
+def stats():
+    """``{'hits': n, 'misses': n}`` of this process; /metrics/ has the sums over all processes."""
+    if get_cache() is None:
+        return {}
+    totals = process_totals()
+    return {stat: int(totals.get(stat_series(stat), 0)) for stat in STAT_KEYS}
+
+
+def load_page(queryset, pks):
+    """Videos for cached ``pks`` from ``queryset``, in ``pks`` order."""
+    objects = queryset.in_bulk(pks)
+    return [objects[pk] for pk in pks if pk in objects]
+
+
+# Cache backends block (the file cache on disk I/O), so they run off the event loop.
+aquery_key = sync_to_async(query_key)
+alookup = sync_to_async(lookup)
+astore = sync_to_async(store)
+
+
+async def aload_page(queryset, pks):
+    objects = await queryset.ain_bulk(pks)
+    return [objects[pk] for pk in pks if pk in objects]
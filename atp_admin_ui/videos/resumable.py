@@ -0,0 +1,189 @@
+# videos/resumable.py
+"""Resumable (tus-style) uploads of a video's media files.
+
+An upload for a target path is kept in ``FS_PATH/.uploads/resumable`` as
+``<hash>.part`` (the data, preallocated to its final length) and
+``<hash>.json`` (the byte ranges received so far), outside the media tree so
+scans and imports never see it. Chunks are written in place with
+``os.pwrite`` at their offset, so chunks may arrive in any order or in
+parallel, an interrupted chunk keeps whatever reached the disk, and the
+finished file is renamed over the target without being read again.
+
+Requests carry an ``X-Upload-Token`` signed for one video and extension
+(``upload_token``), which the edit page hands out.
+"""
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+from django.core import signing
+
+from .metrics import track_fs
+from .paths import MEDIA_EXTENSIONS
+from .uploads import FILE_MODE, staging_dir
+
+RESUMABLE_EXTENSIONS = MEDIA_EXTENSIONS
+
+CHUNK_SIZE = 1024 * 1024
+TOKEN_SALT = 'videos.resumable'
+TOKEN_MAX_AGE = 24 * 3600
+
+
+class UploadError(Exception):
+    pass
+
+
+def merge_ranges(ranges, start, end):
+    """Add ``[start, end)`` to a sorted list of disjoint ``[start, end)`` ranges."""
+    merged = []
+    for r_start, r_end in sorted(ranges + [[start, end]]):
+        if merged and r_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], r_end)
+        else:
+            merged.append([r_start, r_end])
+    return merged
+
+
+def upload_token(video_id, ext):
+    return signing.dumps([video_id, ext], salt=TOKEN_SALT)
+
+
+def check_token(token, video_id, ext):
+    """Whether ``token`` was issued for this video and extension in the last TOKEN_MAX_AGE seconds."""
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE) == [video_id, ext]
+    except signing.BadSignature:
+        return False
+
+
+class ResumableUpload:
+    def __init__(self, target_path, state_dir=None):
+        """``state_dir`` must be on the target's filesystem (default: FS_PATH/.uploads/resumable)."""
+        if state_dir is None:
+            state_dir = os.path.join(staging_dir(), 'resumable')
+            os.makedirs(state_dir, exist_ok=True)
+        self.target_path = target_path
+        name = hashlib.sha1(os.path.abspath(target_path).encode()).hexdigest()
+        self.part_path = os.path.join(state_dir, name + '.part')
+        self.state_path = os.path.join(state_dir, name + '.json')
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    @contextmanager
+    def _locked_state(self):
+        with open(self.state_path, 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                state = json.load(f)
+                yield state
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def state(self):
+        try:
+            with open(self.state_path) as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError('No upload in progress.')
+
+    def create(self, length):
+        if length < 0:
+            raise UploadError('Upload-Length must not be negative.')
+        fd = os.open(self.part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, FILE_MODE)
+        try:
+            os.ftruncate(fd, length)
+        finally:
+            os.close(fd)
+        with open(self.state_path, 'w') as f:
+            json.dump({'length': length, 'ranges': []}, f)
+
+    @property
+    def length(self):
+        return self.state()['length']
+
+    @property
+    def offset(self):
+        """Number of contiguous bytes received from the start of the file."""
+        ranges = self.state()['ranges']
+        return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+    def missing_ranges(self, state=None):
+        state = state or self.state()
+        missing = []
+        position = 0
+        for start, end in state['ranges']:
+            if start > position:
+                missing.append([position, start])
+            position = end
+        if position < state['length']:
+            missing.append([position, state['length']])
+        return missing
+
+    def is_complete(self):
+        return not self.missing_ranges()
+
+    def write(self, offset, chunks):
+        """Write an iterable of byte strings starting at ``offset``.
+
+        The received range is recorded even if ``chunks`` raises part way, so
+        the client can resume from the new offset.
+        """
+        length = self.length
+        if offset < 0 or offset > length:
+            raise UploadError(f'Upload-Offset {offset} is outside the upload (length {length}).')
+        position = offset
+        fd = os.open(self.part_path, os.O_WRONLY)
+        try:
+            for chunk in chunks:
+                if position + len(chunk) > length:
+                    raise UploadError('Chunk extends past Upload-Length.')
+                view = memoryview(chunk)
+                with track_fs('resumable_write', len(chunk)):
+                    while view:
+                        written = os.pwrite(fd, view, position)
+                        position += written
+                        view = view[written:]
+        finally:
+            with track_fs('resumable_fsync'):
+                os.fsync(fd)
+            os.close(fd)
+            if position > offset:
+                with self._locked_state() as state:
+                    state['ranges'] = merge_ranges(state['ranges'], offset, position)
+        return position - offset
+
+    def finish(self):
+        """Move the completed file over the target.
+
+        Returns False if a parallel request already finished the upload.
+        """
+        try:
+            with self._locked_state() as state:
+                if self.missing_ranges(state):
+                    raise UploadError('Upload is not complete.')
+                os.replace(self.part_path, self.target_path)
+                os.remove(self.state_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def abort(self):
+        for path in (self.part_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def iter_body(request, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = request.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
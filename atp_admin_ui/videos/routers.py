@@ -0,0 +1,24 @@
+# videos/routers.py
+class LocalStateRouter:
+    """Send the app's own managed models to the ``local`` SQLite database.
+
+    The unmanaged ``Video`` model and Django's contrib apps stay on ``default``
+    (the shared MySQL database); nothing else is migrated into ``local``.
+    """
+
+    def _is_local(self, model):
+        return model._meta.app_label == 'videos' and model._meta.managed
+
+    def db_for_read(self, model, **hints):
+        return 'local' if self._is_local(model) else None
+
+    def db_for_write(self, model, **hints):
+        return 'local' if self._is_local(model) else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'videos':
+            return db == 'local'
+        return db != 'local'
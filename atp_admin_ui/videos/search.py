@@ -0,0 +1,216 @@
+# videos/search.py
+"""Pluggable search backends for the video list.
+
+``ORMSearchBackend`` is the original ``icontains`` filter on the videos table.
+``IndexSearchBackend`` keeps a local inverted index in the ``local`` SQLite
+database: a trigram FTS5 table answers substring queries and a word-token FTS5
+table is used to rank whole-word matches first. Anything the index cannot
+answer (numeric fields, queries shorter than a trigram, missing index) falls
+back to the ORM filter.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models.fields import CharField, TextField, IntegerField, BigIntegerField
+from django.utils.module_loading import import_string
+
+from .models import Video
+from .mappings import DB_FIELDS
+
+SEARCH_FIELDS = [
+    f for f in DB_FIELDS
+    if isinstance(Video._meta.get_field(f), (CharField, TextField))
+]
+
+TRIGRAM_TABLE = 'video_search_trgm'
+TOKEN_TABLE = 'video_search_tokens'
+# Index hits checked against a filtered queryset per query, below every backend's parameter limit.
+FILTER_BATCH = 900
+
+
+class ORMSearchBackend:
+    def search(self, queryset, field, q):
+        try:
+            model_field = Video._meta.get_field(field)
+            if isinstance(model_field, (CharField, TextField)):
+                filter_kwargs = {f'{field}__icontains': q}
+            elif isinstance(model_field, (IntegerField, BigIntegerField)):
+                filter_kwargs = {field: int(q)}
+            else:
+                return queryset
+            return queryset.filter(**filter_kwargs)
+        except (ValueError, TypeError):
+            return queryset
+
+    def update(self, video):
+        pass
+
+    def update_many(self, videos):
+        pass
+
+    def remove(self, pk):
+        pass
+
+    def remove_many(self, pks):
+        pass
+
+
+class RankedResults:
+    """Sequence of videos for a ranked list of primary keys.
+
+    ``pks`` must all be rows of ``queryset`` (see ``restrict_pks``). Only the
+    slice a paginator asks for is loaded from the database, so a ListView can
+    page over it like a queryset.
+    """
+
+    def __init__(self, queryset, pks):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.pks = pks
+
+    def count(self):
+        return len(self.pks)
+
+    def __len__(self):
+        return len(self.pks)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            page = self.pks[key]
+            objects = self.queryset.in_bulk(page)
+            return [objects[pk] for pk in page if pk in objects]
+        return self[key:key + 1][0]
+
+
+def restrict_pks(queryset, pks):
+    """``pks`` (in their order) that are rows of ``queryset``.
+
+    The index lives in another database, so it cannot be joined with the
+    filters; the hits are checked against them in batches instead.
+    """
+    if not queryset.query.where:
+        return pks
+    allowed = set()
+    for start in range(0, len(pks), FILTER_BATCH):
+        allowed.update(
+            queryset.filter(pk__in=pks[start:start + FILTER_BATCH]).order_by().values_list('pk', flat=True)
+        )
+    return [pk for pk in pks if pk in allowed]
+
+
+def _phrase(q):
+    return '"' + q.replace('"', '""') + '"'
+
+
+class IndexSearchBackend(ORMSearchBackend):
+    min_query_length = 3
+
+    def __init__(self, using='local'):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def search(self, queryset, field, q):
+        if field not in SEARCH_FIELDS or len(q) < self.min_query_length:
+            return super().search(queryset, field, q)
+        try:
+            pks = self.ranked_pks(field, q)
+        except DatabaseError:
+            return super().search(queryset, field, q)
+        return RankedResults(queryset, restrict_pks(queryset, pks))
+
+    def ranked_pks(self, field, q):
+        # Substring candidates come from the trigram table; rows where q also
+        # matches as whole words are ranked ahead, newest first within a rank.
+        sql = (
+            f'SELECT t.rowid FROM {TRIGRAM_TABLE} t '
+            f'WHERE t.{field} MATCH %s '
+            f'ORDER BY t.rowid IN (SELECT rowid FROM {TOKEN_TABLE} WHERE {field} MATCH %s) DESC, '
+            f't.created_at DESC, t.rowid DESC'
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [_phrase(q), _phrase(q)])
+            return [row[0] for row in cursor.fetchall()]
+
+    def create_tables(self, drop=False):
+        columns = ', '.join(SEARCH_FIELDS)
+        with self.connection.cursor() as cursor:
+            if drop:
+                cursor.execute(f'DROP TABLE IF EXISTS {TRIGRAM_TABLE}')
+                cursor.execute(f'DROP TABLE IF EXISTS {TOKEN_TABLE}')
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {TRIGRAM_TABLE} '
+                f"USING fts5({columns}, tokenize='trigram')"
+            )
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {TOKEN_TABLE} '
+                f"USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def index_rows(self, rows, replace=True):
+        """Insert ``(id, *SEARCH_FIELDS)`` tuples in both tables.
+
+        With ``replace`` any existing entry for the same id is removed first;
+        a full rebuild into empty tables can skip that.
+        """
+        rows = [tuple('' if v is None else v for v in row) for row in rows]
+        if not rows:
+            return
+        placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+        columns = ', '.join(['rowid'] + SEARCH_FIELDS)
+        pks = [(row[0],) for row in rows]
+        with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+            for table in (TRIGRAM_TABLE, TOKEN_TABLE):
+                if replace:
+                    cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', pks)
+                cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', rows)
+
+    def max_indexed_pk(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT MAX(rowid) FROM {TRIGRAM_TABLE}')
+            return cursor.fetchone()[0] or 0
+
+    def optimize(self):
+        with self.connection.cursor() as cursor:
+            for table in (TRIGRAM_TABLE, TOKEN_TABLE):
+                cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+
+    def update(self, video):
+        self.update_many([video])
+
+    def update_many(self, videos):
+        try:
+            self.index_rows([[video.pk] + [getattr(video, f) for f in SEARCH_FIELDS] for video in videos])
+        except DatabaseError:
+            # The index is optional; a missing table must not break saving.
+            pass
+
+    def remove(self, pk):
+        self.remove_many([pk])
+
+    def remove_many(self, pks):
+        try:
+            with self.connection.cursor() as cursor:
+                for table in (TRIGRAM_TABLE, TOKEN_TABLE):
+                    cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk in pks])
+        except DatabaseError:
+            pass
+
+
+BACKENDS = {
+    'orm': ORMSearchBackend,
+    'index': IndexSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend(name=None):
+    name = name or getattr(settings, 'VIDEOS_SEARCH_BACKEND', 'orm')
+    backend_class = BACKENDS.get(name) or import_string(name)
+    return backend_class()
@@ -0,0 +1,191 @@
+# videos/sidecars.py
+"""Reading and writing the JSON sidecar stored next to each video.
+
+Writes go to a temp file that is renamed over the sidecar, and are skipped
+when the hash of the new ``sql_params`` matches the one on disk. With
+``VIDEOS_SIDECAR_ENCODER = 'orjson'`` (optional dependency) sidecars are
+encoded and parsed with orjson, indented by two spaces instead of four.
+``regenerate`` rewrites the sidecars of a whole queryset on a process pool.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+
+from .mappings import DB_FIELDS
+from .metrics import track_fs
+from .models import Video
+from .paths import get_fs_path
+from .uploads import FILE_MODE
+
+CREATED, UPDATED, UNCHANGED = 'created', 'updated', 'unchanged'
+
+
+def _orjson():
+    try:
+        import orjson
+    except ImportError:
+        raise ImproperlyConfigured("VIDEOS_SIDECAR_ENCODER = 'orjson' requires the orjson package.")
+    return orjson
+
+
+def dumps(data):
+    if getattr(settings, 'VIDEOS_SIDECAR_ENCODER', 'json') == 'orjson':
+        orjson = _orjson()
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=4).encode()
+
+
+def loads(content):
+    if getattr(settings, 'VIDEOS_SIDECAR_ENCODER', 'json') == 'orjson':
+        return _orjson().loads(content)
+    return json.loads(content)
+
+
+def read_sidecar(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def params_digest(sql_params):
+    canonical = json.dumps(sql_params, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def read_sql_params(path):
+    """``sql_params`` of the sidecar at ``path``, or None if it is missing or unreadable."""
+    try:
+        return read_sidecar(path).get('sql_params')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def write_sql_params(path, sql_params):
+    """Replace ``sql_params`` in an existing sidecar, atomically.
+
+    Returns False without writing if the sidecar already holds the same values.
+    """
+    data = read_sidecar(path)
+    if isinstance(data.get('sql_params'), dict) and params_digest(data['sql_params']) == params_digest(sql_params):
+        return False
+    data['sql_params'] = sql_params
+    _write_json(path, data)
+    return True
+
+
+def _write_json(path, data):
+    # A unique temp name, so concurrent writers of one sidecar cannot
+    # interleave in the same temp file; the last rename wins.
+    content = dumps(data)
+    with track_fs('sidecar_write', len(content)):
+        f = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False)
+        try:
+            with f:
+                f.write(content)
+            os.chmod(f.name, FILE_MODE)
+            os.replace(f.name, path)
+        except BaseException:
+            if os.path.exists(f.name):
+                os.remove(f.name)
+            raise
+
+
+def build_sidecar(video):
+    """A new sidecar document for a video that has none yet."""
+    rel_path = video.vid_url.replace(os.getenv('BASE_SITE_URL', 'https://www.kjv1611only.com/'), '')
+    target_filename = os.path.basename(video.vid_url)
+    try:
+        dt = datetime.strptime(video.date, '%Y-%m-%d %H:%M:%S') if video.date else None
+        us_mdY = dt.strftime('%m/%d/%Y') if dt else None
+    except ValueError:
+        us_mdY = None
+    return {
+        "original_filename": target_filename,
+        "target_filename": target_filename,
+        "target_directory_relative": os.path.dirname(rel_path),
+        "original_vtt_filename": None,
+        "uploader": video.main_category.split('(')[-1].rstrip(')') if video.main_category else "Unknown",
+        "target_vtt_filename": target_filename.rsplit('.mp4', 1)[0] + '.vtt',
+        "sql_params": sql_params_for(video),
+        "title": video.name,
+        "us_mdY": us_mdY,
+        "error": None
+    }
+
+
+def sql_params_for(video):
+    return {f: getattr(video, f) for f in DB_FIELDS}
+
+
+def clean_sql_params(sql_params):
+    """``sql_params`` as a dict of DB_FIELDS values converted to their Python types.
+
+    Raises ValidationError listing every missing or invalid field; keys that
+    are not DB_FIELDS are ignored.
+    """
+    if not isinstance(sql_params, dict):
+        raise ValidationError('sql_params is missing or not an object.')
+    cleaned, errors = {}, []
+    for name in DB_FIELDS:
+        if name not in sql_params:
+            errors.append(f'{name}: missing')
+            continue
+        field = Video._meta.get_field(name)
+        value = sql_params[name]
+        try:
+            if value is None and not field.null:
+                raise ValidationError('may not be null')
+            value = field.to_python(value)
+            if value is not None:
+                field.run_validators(value)
+        except ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+            continue
+        cleaned[name] = value
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def write_sidecar(video, path):
+    """Update ``sql_params`` in the sidecar at ``path``, creating it if missing.
+
+    Returns CREATED, UPDATED or UNCHANGED.
+    """
+    try:
+        return UPDATED if write_sql_params(path, sql_params_for(video)) else UNCHANGED
+    except FileNotFoundError:
+        _write_json(path, build_sidecar(video))
+        return CREATED
+
+
+def _regenerate_row(row):
+    video = Video(**dict(zip(DB_FIELDS, row)))
+    try:
+        return write_sidecar(video, get_fs_path(video, 'json'))
+    except (OSError, ValueError, AttributeError) as e:
+        # AttributeError: a NULL column, such as vid_url, where a string is expected.
+        return f'error: video {video.id}: {e}'
+
+
+def regenerate(queryset, workers=None, batch_size=2000):
+    """Rewrite the sidecar of every video in ``queryset``, yielding ``write_sidecar`` results.
+
+    Encoding and file I/O run in ``workers`` processes; rows are streamed to
+    them in batches so memory stays flat for any queryset size.
+    """
+    rows = queryset.order_by().values_list(*DB_FIELDS).iterator(chunk_size=batch_size)
+    with ProcessPoolExecutor(workers, initializer=django.setup) as pool:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield from pool.map(_regenerate_row, batch, chunksize=64)
+                batch = []
+        yield from pool.map(_regenerate_row, batch, chunksize=64)
@@ -0,0 +1,43 @@
+# videos/tasks.py
+"""Filesystem side effects of edits, run from the job queue (``videos.jobs``)."""
+import os
+
+from .filestatus import invalidate_file_status
+from .jobs import task
+from .media import remove_probes
+from .metrics import track_fs
+from .models import Video
+from .paths import get_fs_path, resolve_fs_path
+from .sidecars import write_sidecar
+from .thumbnails import remove_derivatives
+
+
+@task('delete_files')
+def delete_files(job):
+    """Delete the given extensions of a video; missing files are not an error."""
+    payload = job.payload
+    for ext in payload['exts']:
+        path = resolve_fs_path(payload['vid_url'], ext)
+        try:
+            with track_fs('unlink'):
+                os.remove(path)
+            job.advance(1, f'{ext.upper()} file deleted from: {path}')
+        except FileNotFoundError:
+            job.advance(1, f'{ext.upper()} file not found at: {path}')
+    if 'jpg' in payload['exts']:
+        remove_derivatives(payload['vid_url'])
+    remove_probes([payload['video_id']], payload['exts'])
+    invalidate_file_status(payload['video_id'])
+
+
+@task('sidecar')
+def regenerate_sidecar(job):
+    """Write the current database row into the video's JSON sidecar."""
+    video = Video.objects.filter(pk=job.payload['video_id']).first()
+    if video is None:
+        job.advance(1, 'Video no longer exists, nothing to write.')
+        return
+    path = get_fs_path(video, 'json')
+    result = write_sidecar(video, path)
+    job.advance(1, f"JSON file {result} at: {path}")
+    invalidate_file_status(video.id)
@@ -1,3 +1,778 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import struct
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connections
+from django.db.models import F
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from .async_views import AsyncVideoListView, AsyncVideoUpdateView
+from .bench import bench_database, generate_media, generate_videos
+from .columns import COOKIE_NAME, default_columns, project
+from .duplicates import refresh_groups
+from .filestatus import DirectoryListing
+from .export import iter_rows
+from .facets import refresh_facets
+from .forms import VideoForm
+from .indexes import regressions
+from .mappings import DB_FIELDS
+from .metrics import collect, mark_process_dead, record_fs
+from .jobs import STALE_AFTER, claim, drain, enqueue
+from .media import ProbeError, filter_broken, mp3_info, mp4_info, refresh as refresh_probes, vtt_info
+from .models import DuplicateGroup, FileStatus, Job, MediaProbe, Video
+from .paths import MEDIA_EXTENSIONS, get_fs_path, resolve_fs_path
+from .resumable import check_token, upload_token
+from .search import RankedResults, get_search_backend
+from .sidecars import CREATED, UPDATED, _regenerate_row, read_sidecar, write_sidecar
+from .thumbnails import FORMATS, WIDTHS, derivative_path, generate as generate_thumbnails, remove_derivatives
+from .uploads import FILE_MODE
+from .views import VideoListView
+
+# The videos table is unmanaged, so the test database does not get it from
+# migrations; it is created once for the module. FS_PATH points at a temp dir.
+_saved_fs_path = None
+_fs_path = None
+
+# ROOT_URLCONF for tests of the async views, which videos.urls only routes with ASYNC_VIEWS=1.
+urlpatterns = [
+    path('async/', AsyncVideoListView.as_view(), name='async_video_list'),
+    path('async/<int:pk>/', AsyncVideoUpdateView.as_view(), name='async_video_update'),
+    path('', include('videos.urls')),
+]
+
+
+def setUpModule():
+    global _saved_fs_path, _fs_path
+    with connections['default'].schema_editor() as editor:
+        editor.create_model(Video)
+    _saved_fs_path = os.environ.get('FS_PATH')
+    _fs_path = tempfile.mkdtemp()
+    os.environ['FS_PATH'] = _fs_path
+
+
+def tearDownModule():
+    with connections['default'].schema_editor() as editor:
+        editor.delete_model(Video)
+    shutil.rmtree(_fs_path, ignore_errors=True)
+    if _saved_fs_path is None:
+        del os.environ['FS_PATH']
+    else:
+        os.environ['FS_PATH'] = _saved_fs_path
+
+
+@override_settings(VIDEOS_JOBS_MODE='worker')
+class VideosTestCase(TestCase):
+    """Runs against both databases with the result cache as shipped: file based."""
+    databases = {'default', 'local'}
+    rows = 60
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'results': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cls.cache_dir},
+            },
+            VIDEOS_RESULT_CACHE='results',
+        ))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_videos(cls.rows, 'default', duplicate_rate=0.2)
+
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+
+    def form_data(self, video, **changes):
+        data = {f: '' if getattr(video, f) is None else getattr(video, f) for f in VideoForm._meta.fields}
+        data.update(changes)
+        return data
+
+    def csrf_token(self, url):
+        self.client.get(url)
+        return self.client.cookies['csrftoken'].value
+
+
+class EditViewTests(VideosTestCase):
+    def test_save_with_upload_checks_csrf(self):
+        video = Video.objects.get(pk=1)
+        url = reverse('video_update', args=[video.pk])
+        token = self.csrf_token(url)
+        response = self.client.post(url, self.form_data(
+            video, clicks=video.clicks + 1, csrfmiddlewaretoken=token,
+            vtt_file=SimpleUploadedFile('a.vtt', b'WEBVTT\n'),
+        ))
+        self.assertRedirects(response, reverse('video_list'), fetch_redirect_response=False)
+        self.assertEqual(Video.objects.get(pk=1).clicks, video.clicks + 1)
+        with open(resolve_fs_path(video.vid_url, 'vtt'), 'rb') as f:
+            self.assertEqual(f.read(), b'WEBVTT\n')
+
+    def test_post_without_token_is_rejected(self):
+        video = Video.objects.get(pk=1)
+        response = self.client.post(reverse('video_update', args=[video.pk]), self.form_data(video, clicks=0))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Video.objects.get(pk=1).clicks, video.clicks)
+
+
+
+class ResumableUploadTests(VideosTestCase):
+    def test_upload_with_token(self):
+        video = Video.objects.get(pk=4)
+        url = reverse('video_resumable_upload', args=[video.pk, 'vtt'])
+        body = b'WEBVTT\n\n00:00.000 --> 00:01.000\nhello\n'
+        token = upload_token(video.pk, 'vtt')
+        self.assertEqual(self.client.post(url, HTTP_UPLOAD_LENGTH=str(len(body)), HTTP_X_UPLOAD_TOKEN=token).status_code, 201)
+        response = self.client.patch(
+            url, body[:10], content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET='0', HTTP_X_UPLOAD_TOKEN=token,
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.head(url, HTTP_X_UPLOAD_TOKEN=token)['Upload-Offset'], '10')
+        # Upload state stays out of the directory that reconcile and import_sidecars walk.
+        target = resolve_fs_path(video.vid_url, 'vtt')
+        self.assertEqual(os.listdir(os.path.dirname(target)), [])
+        response = self.client.patch(
+            url, body[10:], content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET='10', HTTP_X_UPLOAD_TOKEN=token,
+        )
+        self.assertEqual(response.status_code, 204)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), body)
+        self.assertEqual(os.listdir(os.path.dirname(target)), [os.path.basename(target)])
+
+    def test_requests_without_a_valid_token_are_rejected(self):
+        url = reverse('video_resumable_upload', args=[5, 'vtt'])
+        for token in ('', 'forged', upload_token(6, 'vtt'), upload_token(5, 'mp4')):
+            with self.subTest(token=token):
+                self.assertEqual(self.client.post(url, HTTP_UPLOAD_LENGTH='4', HTTP_X_UPLOAD_TOKEN=token).status_code, 403)
+        self.assertEqual(self.client.options(url).status_code, 204)
+
+    def test_edit_page_lists_tokens(self):
+        response = self.client.get(reverse('video_update', args=[4]))
+        uploads = {ext: (url, token) for ext, url, token in response.context['resumable_uploads']}
+        url, token = uploads['mp4']
+        self.assertEqual(url, reverse('video_resumable_upload', args=[4, 'mp4']))
+        self.assertTrue(check_token(token, 4, 'mp4'))
+
+
+@override_settings(ROOT_URLCONF='videos.tests')
+class AsyncViewTests(VideosTestCase):
+    async def test_save_with_upload_checks_csrf(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+        video = await Video.objects.aget(pk=2)
+        url = reverse('async_video_update', args=[video.pk])
+        await client.get(url)
+        token = client.cookies['csrftoken'].value
+        response = await client.post(url, self.form_data(
+            video, clicks=video.clicks + 1, csrfmiddlewaretoken=token,
+            vtt_file=SimpleUploadedFile('b.vtt', b'WEBVTT\n'),
+        ))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual((await Video.objects.aget(pk=2)).clicks, video.clicks + 1)
+        response = await client.post(url, self.form_data(video))
+        self.assertEqual(response.status_code, 403)
+
+    async def test_list_pages_with_async_orm_and_result_cache(self):
+        client = AsyncClient()
+        url = reverse('async_video_list') + '?q=grace&field=name&page=1'
+        response = await client.get(reverse('video_list') + '?q=grace&field=name')
+        expected = [v.pk for v, _ in response.context['rows']]
+        # The sync paginator is the fallback; it must not run for a plain queryset.
+        with mock.patch.object(VideoListView, 'paginate_queryset', side_effect=AssertionError):
+            first = await client.get(url)
+            second = await client.get(url)
+        for response in (first, second):
+            self.assertEqual([v.pk for v, _ in response.context['rows']], expected)
+        self.assertEqual(second.context['result_cache_stats']['hits'], first.context['result_cache_stats']['hits'] + 2)
+
+
+class ListViewTests(VideosTestCase):
+    def test_empty_querysets_with_result_cache(self):
+        url = reverse('video_list')
+        for query in ('?duplicates=1', '?duplicates=1&key=title_date', '?broken=1'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(url + query).status_code, 200)
+
+    def test_facet_counts_are_labelled_as_catalogue_totals(self):
+        response = self.client.get(reverse('video_list') + '?vid_category=Sermons')
+        self.assertContains(response, 'Counts are catalogue totals, not counts within these results.')
+
+    def test_facet_counts_are_refreshed_by_a_job(self):
+        url = reverse('video_list')
+        response = self.client.get(url)
+        self.assertEqual(response.context['facets'], [])
+        self.assertContains(response, 'Facet counts are not computed yet')
+        self.assertTrue(Job.objects.filter(kind='facets', key='facets', status=Job.QUEUED).exists())
+        drain()
+        facets = dict(self.client.get(url).context['facets'])
+        counts = {entry['value']: entry['count'] for entry in facets['language']}
+        self.assertEqual(sum(counts.values()), self.rows)
+        self.assertEqual(counts['en'], Video.objects.filter(language='en').count())
+
+    def test_search_with_multi_value_facets(self):
+        expected = Video.objects.filter(
+            name__icontains='grace', vid_category__in=['Sermons', 'Music'], language__in=['en', 'es'],
+        )
+        self.assertTrue(expected.exists())
+        response = self.client.get(
+            reverse('video_list') + '?q=grace&field=name&vid_category=Sermons&vid_category=Music&language=en&language=es'
+        )
+        self.assertEqual(response.context['paginator'].count, expected.count())
+        self.assertEqual(sorted(v.pk for v, _ in response.context['rows']), sorted(expected.values_list('pk', flat=True)))
+        selected = {
+            field: [entry['value'] for entry in entries if entry['selected']]
+            for field, entries in response.context['facets']
+        }
+        self.assertEqual(selected, {'vid_category': ['Music', 'Sermons'], 'language': ['en', 'es']})
+
+    def test_cached_page_matches_uncached(self):
+        url = reverse('video_list') + '?q=grace&field=name'
+        first = self.client.get(url)
+        files = {p: p.stat().st_mtime_ns for p in Path(self.cache_dir).rglob('*')}
+        second = self.client.get(url)
+        self.assertEqual(
+            [v.pk for v, _ in first.context['rows']], [v.pk for v, _ in second.context['rows']],
+        )
+        self.assertEqual(second.context['result_cache_stats']['hits'], first.context['result_cache_stats']['hits'] + 2)
+        # Hits are counted in memory; a cached page writes nothing to the cache.
+        self.assertEqual({p: p.stat().st_mtime_ns for p in Path(self.cache_dir).rglob('*')}, files)
+
+
+class ColumnTests(VideosTestCase):
+    def test_projection_selects_only_needed_columns(self):
+        sql = str(project(Video.objects.all(), ['name', 'vid_code']).query)
+        select = sql[:sql.index(' FROM ')]
+        for column in ('id', 'vid_url', 'created_at', 'name'):
+            self.assertIn(f'"videos"."{column}"', select)
+        for column in ('vid_title', 'vid_category', 'language'):
+            self.assertNotIn(f'"videos"."{column}"', select)
+        # The long text column only as a prefix one past the limit.
+        self.assertIn('SUBSTR("videos"."vid_code", 1, 101) AS "vid_code_preview"', select)
+        self.assertEqual(select.count('"videos"."vid_code"'), 1)
+
+    @override_settings(VIDEOS_LIST_TRUNCATE=20)
+    def test_list_truncates_long_text(self):
+        Video.objects.filter(pk=1).update(vid_code='x' * 20)
+        response = self.client.get(reverse('video_list') + '?columns=vid_code&columns=name&columns=bogus&paging=cursor')
+        self.assertEqual(response.context['columns'], ['name', 'vid_code'])
+        self.assertEqual(response.cookies[COOKIE_NAME].value, 'name,vid_code')
+        cells = {video.pk: dict(zip(response.context['columns'], row)) for video, row in response.context['rows']}
+        for pk, row in cells.items():
+            code = Video.objects.get(pk=pk).vid_code
+            self.assertEqual(row['vid_code'], code if len(code) <= 20 else code[:20] + '…')
+        self.assertIn('…', ''.join(row['vid_code'] for row in cells.values()))
+        for video, _ in response.context['rows']:
+            self.assertEqual(video.get_deferred_fields(), set(default_columns()) - {'id', 'vid_url', 'created_at', 'name'})
+        # The columns are remembered for the next visit.
+        self.assertEqual(self.client.get(reverse('video_list')).context['columns'], ['name', 'vid_code'])
+
+    def test_no_valid_columns_falls_back_to_the_defaults(self):
+        response = self.client.get(reverse('video_list') + '?columns=bogus')
+        self.assertEqual(response.context['columns'], default_columns())
+
+
+class IndexSearchTests(VideosTestCase):
+    def setUp(self):
+        super().setUp()
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        self.enterContext(override_settings(VIDEOS_SEARCH_BACKEND='index'))
+        call_command('build_search_index', stdout=io.StringIO())
+
+    def test_search_respects_facet_filter(self):
+        expected = Video.objects.filter(name__icontains='grace', vid_category='Sermons')
+        self.assertTrue(Video.objects.filter(name__icontains='grace').exclude(vid_category='Sermons').exists())
+        response = self.client.get(reverse('video_list') + '?q=grace&field=name&vid_category=Sermons')
+        self.assertEqual(response.context['paginator'].count, expected.count())
+        self.assertEqual(sorted(v.pk for v, _ in response.context['rows']), sorted(expected.values_list('pk', flat=True)))
+
+    def test_search_with_multi_value_facets(self):
+        expected = Video.objects.filter(
+            name__icontains='grace', vid_category__in=['Sermons', 'Music'], language__in=['en', 'es'],
+        )
+        self.assertTrue(expected.exists())
+        response = self.client.get(
+            reverse('video_list') + '?q=grace&field=name&vid_category=Sermons&vid_category=Music&language=en&language=es'
+        )
+        self.assertEqual(response.context['paginator'].count, expected.count())
+        self.assertEqual(sorted(v.pk for v, _ in response.context['rows']), sorted(expected.values_list('pk', flat=True)))
+
+    def test_bulk_action_on_search_respects_facet_filter(self):
+        expected = set(Video.objects.filter(name__icontains='grace', vid_category='Sermons').values_list('pk', flat=True))
+        token = self.csrf_token(reverse('video_list'))
+        self.client.post(reverse('video_bulk'), {
+            'action': 'set_field', 'bulk_field': 'language', 'bulk_value': 'xx', 'scope': 'search',
+            'q': 'grace', 'field': 'name', 'vid_category': 'Sermons', 'expected_count': str(len(expected)),
+            'csrfmiddlewaretoken': token,
+        })
+        self.assertEqual(set(Job.objects.get(kind='bulk_set_field').payload['ids']), expected)
+
+
+class BulkActionTests(VideosTestCase):
+    def bulk(self, **data):
+        token = self.csrf_token(reverse('video_list'))
+        return self.client.post(reverse('video_bulk'), {
+            'action': 'set_field', 'bulk_field': 'language', 'bulk_value': 'xx', 'scope': 'search',
+            'csrfmiddlewaretoken': token, **data,
+        })
+
+    def test_search_scope_needs_a_filter(self):
+        response = self.bulk(q='', field='name', expected_count=str(self.rows))
+        self.assertRedirects(response, reverse('video_list'), fetch_redirect_response=False)
+        self.assertFalse(Job.objects.filter(kind='bulk_set_field').exists())
+
+    def test_search_scope_needs_the_shown_count(self):
+        matching = Video.objects.filter(vid_category='Sermons').count()
+        self.bulk(vid_category='Sermons', expected_count=str(matching + 1))
+        self.assertFalse(Job.objects.filter(kind='bulk_set_field').exists())
+        response = self.bulk(vid_category='Sermons', expected_count=str(matching))
+        job = Job.objects.get(kind='bulk_set_field')
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]), fetch_redirect_response=False)
+        self.assertEqual(job.total, matching)
+
+
+class ExportTests(VideosTestCase):
+    def export(self, query):
+        response = self.client.get(reverse('video_export') + query)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_of_filtered_list(self):
+        response, body = self.export('?format=csv&vid_category=Sermons')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'filename="videos-\d{8}-\d{6}\.csv"')
+        header, *rows = csv.reader(io.StringIO(body.decode()))
+        self.assertEqual(header, DB_FIELDS)
+        expected = Video.objects.filter(vid_category='Sermons')
+        self.assertEqual(sorted(int(row[0]) for row in rows), sorted(expected.values_list('pk', flat=True)))
+        video = expected.get(pk=int(rows[0][0]))
+        self.assertEqual(rows[0], ['' if getattr(video, f) is None else str(getattr(video, f)) for f in DB_FIELDS])
+
+    def test_gzipped_jsonl_of_search(self):
+        response, body = self.export('?format=jsonl&compress=gzip&q=grace&field=name')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.jsonl.gz"'))
+        rows = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual(list(rows[0]), DB_FIELDS)
+        expected = Video.objects.filter(name__icontains='grace').values_list('pk', flat=True)
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(expected))
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(reverse('video_export') + '?format=xml').status_code, 400)
+
+    def test_ranked_rows_keep_rank_order_across_chunks(self):
+        pks = list(Video.objects.order_by('?').values_list('pk', flat=True)[:25])
+        rows = list(iter_rows(RankedResults(Video.objects.all(), pks), chunk_size=7))
+        self.assertEqual([row[0] for row in rows], pks)
+
+
+class JobQueueTests(VideosTestCase):
+    def test_advancing_job_is_not_requeued(self):
+        enqueue('sidecar', {'video_id': 1})
+        enqueue('sidecar', {'video_id': 2})
+        job = claim('worker-a')
+        long_ago = timezone.now() - STALE_AFTER * 2
+        Job.objects.filter(pk=job.pk).update(locked_at=long_ago)
+        job.advance(1, 'still going')
+        self.assertNotEqual(claim('worker-b').pk, job.pk)
+        self.assertEqual(Job.objects.get(pk=job.pk).locked_by, 'worker-a')
+        # A job that stopped advancing is taken over.
+        Job.objects.filter(pk=job.pk).update(locked_at=long_ago)
+        self.assertEqual(claim('worker-c').pk, job.pk)
+
+
+class DuplicatesTests(VideosTestCase):
+    def test_groups_are_refreshed_by_a_job(self):
+        url = reverse('video_list') + '?duplicates=1&key=video_id'
+        response = self.client.get(url)
+        self.assertEqual(response.context['duplicate_groups_page'].paginator.count, 0)
+        self.assertTrue(Job.objects.filter(kind='duplicates', key='duplicates:video_id', status=Job.QUEUED).exists())
+        drain()
+        response = self.client.get(url)
+        self.assertGreater(response.context['duplicate_groups_page'].paginator.count, 0)
+        self.assertFalse(Job.objects.filter(kind='duplicates', status=Job.QUEUED).exists())
+
+    def test_save_queues_a_refresh(self):
+        refresh_groups('video_id')
+        video = Video.objects.get(pk=11)
+        url = reverse('video_update', args=[video.pk])
+        token = self.csrf_token(url)
+        response = self.client.post(
+            url, self.form_data(video, video_id=Video.objects.get(pk=12).video_id, csrfmiddlewaretoken=token),
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Job.objects.filter(kind='duplicates', key='duplicates:video_id', status=Job.QUEUED).exists())
+        drain()
+        keys = DuplicateGroup.objects.filter(key_name='video_id').values_list('key', flat=True)
+        self.assertIn(Video.objects.get(pk=12).video_id, keys)
+
+
+class CursorPagingTests(VideosTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Older rows of the real table have no created_at; enough of them here
+        # that a page boundary falls between two of them.
+        cls.undated = list(range(59, 0, -4))
+        Video.objects.filter(pk__in=cls.undated).update(created_at=None)
+
+    def walk(self, query, cursor_attr):
+        url = reverse('video_list') + '?paging=cursor'
+        pks, cursor = [], None
+        while True:
+            page = self.client.get(url + query + (f'&cursor={cursor}' if cursor else '')).context['page_obj']
+            pks.append([video.pk for video in page.object_list])
+            cursor = getattr(page, cursor_attr)
+            if cursor is None:
+                return pks, page
+
+    def test_pages_cover_rows_without_created_at(self):
+        pages, last = self.walk('', 'next_cursor')
+        expected = list(Video.objects.order_by(F('created_at').desc(nulls_last=True), '-id').values_list('pk', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(expected[-len(self.undated):], self.undated)
+        # And back from the last page, which ends with the NULL rows.
+        back = [last.previous_cursor]
+        url = reverse('video_list') + '?paging=cursor&cursor='
+        while back[-1]:
+            page = self.client.get(url + back[-1]).context['page_obj']
+            back.append(page.previous_cursor)
+            pages.pop()
+            self.assertEqual([video.pk for video in page.object_list], pages[-1])
+        self.assertEqual(len(pages), 1)
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        url = reverse('video_list') + '?paging=cursor&cursor='
+        for cursor in ('garbage', 'W1tdLDEsIm5leHQiXQ', 'WyIiLCJ4IiwibmV4dCJd'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(url + cursor).status_code, 400)
+
+    def test_empty_result(self):
+        response = self.client.get(reverse('video_list') + '?paging=cursor&broken=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class FileStatusTests(VideosTestCase):
+    def test_directory_listing(self):
+        with tempfile.TemporaryDirectory() as root:
+            for name in ('a', 'b', 'c'):
+                os.makedirs(os.path.join(root, name, 'sub'))
+                with open(os.path.join(root, name, '1.mp4'), 'wb') as f:
+                    f.write(b'x' * 10)
+            listing = DirectoryListing(max_dirs=2)
+            entries = listing.get(os.path.join(root, 'a'))
+            self.assertEqual(list(entries), ['1.mp4'])
+            self.assertEqual(entries['1.mp4'][0], 10)
+            self.assertEqual(listing.get(os.path.join(root, 'missing')), {})
+            # Listings are reused until evicted, least recently used first.
+            open(os.path.join(root, 'a', '2.mp4'), 'wb').close()
+            self.assertEqual(list(listing.get(os.path.join(root, 'a'))), ['1.mp4'])
+            listing.get(os.path.join(root, 'b'))
+            self.assertEqual(list(listing.listings), [os.path.join(root, 'a'), os.path.join(root, 'b')])
+            listing.get(os.path.join(root, 'a'))
+            listing.get(os.path.join(root, 'c'))
+            self.assertEqual(list(listing.listings), [os.path.join(root, 'a'), os.path.join(root, 'c')])
+            listing.get(os.path.join(root, 'b'))
+            self.assertEqual(sorted(listing.get(os.path.join(root, 'a'))), ['1.mp4', '2.mp4'])
+
+    def test_scan_files(self):
+        videos = list(Video.objects.order_by('pk')[:3])
+        Video.objects.filter(pk=videos[2].pk).update(vid_url=None)
+        FileStatus.objects.create(video_id=10 ** 6, ext='mp4', exists=True, size=1, mtime=0, checked_at=timezone.now())
+        with tempfile.TemporaryDirectory() as root, mock.patch.dict(os.environ, {'FS_PATH': root}):
+            generate_media(videos[:2], exts=('mp4', 'jpg'))
+            os.remove(resolve_fs_path(videos[1].vid_url, 'jpg'))
+            call_command('scan_files', stdout=io.StringIO())
+        self.assertEqual(FileStatus.objects.count(), self.rows * len(MEDIA_EXTENSIONS))
+        self.assertFalse(FileStatus.objects.filter(video_id=10 ** 6).exists())
+        found = {
+            (status.video_id, status.ext): (status.exists, status.size)
+            for status in FileStatus.objects.filter(video_id__in=[v.pk for v in videos], exists=True)
+        }
+        self.assertEqual(found, {
+            (videos[0].pk, 'mp4'): (True, 4096), (videos[0].pk, 'jpg'): (True, 4096), (videos[1].pk, 'mp4'): (True, 4096),
+        })
+        # Statuses of videos deleted since the last scan go with the next one.
+        Video.objects.filter(pk=videos[0].pk).delete()
+        call_command('scan_files', stdout=io.StringIO())
+        self.assertFalse(FileStatus.objects.filter(video_id=videos[0].pk).exists())
+        self.assertEqual(FileStatus.objects.count(), (self.rows - 1) * len(MEDIA_EXTENSIONS))
+
+
+class SidecarTests(VideosTestCase):
+    def test_write_leaves_only_the_sidecar(self):
+        video = Video.objects.get(pk=9)
+        path = get_fs_path(video, 'json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.assertEqual(write_sidecar(video, path), CREATED)
+        video.clicks += 1
+        self.assertEqual(write_sidecar(video, path), UPDATED)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+        self.assertEqual(os.stat(path).st_mode & 0o777, FILE_MODE)
+        self.assertEqual(read_sidecar(path)['sql_params']['clicks'], video.clicks)
+
+    def test_regenerate_reports_rows_with_missing_fields(self):
+        row = dict(zip(DB_FIELDS, Video.objects.values_list(*DB_FIELDS).get(pk=10)), vid_url=None)
+        result = _regenerate_row(tuple(row[f] for f in DB_FIELDS))
+        self.assertTrue(result.startswith('error: video 10: '), result)
+
+
+class ImportSidecarsTests(VideosTestCase):
+    def test_duplicate_ids_in_a_directory(self):
+        videos = list(Video.objects.order_by('pk')[:2])
+        with tempfile.TemporaryDirectory() as root:
+            for directory, name, video in (('a', '1.json', videos[0]), ('a', '2.json', videos[0]), ('b', '1.json', videos[1])):
+                os.makedirs(os.path.join(root, directory), exist_ok=True)
+                write_sidecar(video, os.path.join(root, directory, name))
+            out = io.StringIO()
+            call_command('import_sidecars', path=root, workers=1, dry_run=True, format='json', stdout=out, stderr=io.StringIO())
+        events = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([(e['kind'], e['id']) for e in events], [('duplicate', videos[0].pk)])
+
+
+class ReconcileTests(VideosTestCase):
+    def test_reports_each_kind_of_difference(self):
+        videos = list(Video.objects.order_by('pk')[:4])
+        with tempfile.TemporaryDirectory() as root, mock.patch.dict(os.environ, {'FS_PATH': root}):
+            Video.objects.filter(pk=videos[0].pk).update(vid_url=None)
+            generate_media(videos[1:], exts=('mp4',))
+            for video in videos[1:]:
+                write_sidecar(video, resolve_fs_path(video.vid_url, 'json'))
+            missing = resolve_fs_path(videos[1].vid_url)
+            os.remove(missing)
+            orphan = os.path.join(root, 'video', 'orphan.mp4')
+            open(orphan, 'wb').close()
+            Video.objects.filter(pk=videos[2].pk).update(clicks=F('clicks') + 1)
+            drifted = resolve_fs_path(videos[2].vid_url, 'json')
+            Video.objects.exclude(pk__in=[v.pk for v in videos]).delete()
+            out = io.StringIO()
+            call_command('reconcile', workers=1, format='json', stdout=out, stderr=io.StringIO())
+        events = sorted((json.loads(line) for line in out.getvalue().splitlines()), key=lambda e: e['kind'])
+        self.assertEqual(events, [
+            {'kind': 'missing_file', 'id': videos[1].pk, 'path': missing},
+            {'kind': 'missing_url', 'id': videos[0].pk},
+            {'kind': 'orphan_file', 'path': orphan},
+            {'kind': 'sidecar_drift', 'id': videos[2].pk, 'path': drifted, 'fields': 'clicks'},
+        ])
+
+
+def box(kind, payload):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def mp4_bytes(seconds, version=0, timescale=1000):
+    """An mp4 whose moov/mvhd gives a running time of ``seconds``."""
+    if version == 1:
+        mvhd = bytes([1, 0, 0, 0]) + bytes(16) + struct.pack('>IQ', timescale, int(seconds * timescale))
+    else:
+        mvhd = bytes(4) + bytes(8) + struct.pack('>II', timescale, int(seconds * timescale))
+    return box(b'ftyp', b'isom') + box(b'mdat', bytes(64)) + box(b'moov', box(b'mvhd', mvhd + bytes(80)))
+
+
+VTT = b'WEBVTT\n\n00:00:01.000 --> 00:00:04.500\nIn the beginning\n\n01:02:03.250 --> 01:02:05.750\nAmen\n'
+
+
+class MediaParserTests(SimpleTestCase):
+    def test_mp4_duration(self):
+        self.assertEqual(mp4_info(mp4_bytes(120.5)), {'duration': 120.5})
+        self.assertEqual(mp4_info(mp4_bytes(7200, version=1, timescale=90000)), {'duration': 7200})
+
+    def test_mp4_errors(self):
+        data = mp4_bytes(60)
+        for broken, message in ((data[:-10], 'truncated'), (box(b'ftyp', b'isom'), 'no moov box')):
+            with self.subTest(message=message), self.assertRaisesRegex(ProbeError, message):
+                mp4_info(broken)
+
+    def test_mp3_cbr_after_id3_tag(self):
+        id3 = b'ID3\x03\x00\x00' + bytes([0, 0, 0, 20]) + bytes(20)
+        # MPEG-1 layer III, 128 kbit/s, 44.1 kHz, joint stereo; ten seconds of frames.
+        data = id3 + b'\xff\xfb\x90\x64' + bytes(160000 - 4)
+        self.assertEqual(mp3_info(data), {
+            'version': '1', 'bitrate': 128, 'sample_rate': 44100, 'channels': 'stereo', 'vbr': False, 'duration': 10.0,
+        })
+
+    def test_mp3_vbr_frame_count(self):
+        xing = b'Xing' + struct.pack('>II', 1, 1000)
+        data = b'\xff\xfb\x90\xc4' + bytes(17) + xing + bytes(400)
+        info = mp3_info(data)
+        self.assertEqual((info['channels'], info['vbr']), ('mono', True))
+        self.assertAlmostEqual(info['duration'], 1000 * 1152 / 44100)
+
+    def test_mp3_without_frames(self):
+        with self.assertRaisesRegex(ProbeError, 'no MPEG audio frame'):
+            mp3_info(b'\xff\x00' * 100)
+
+    def test_vtt_cues_and_end(self):
+        self.assertEqual(vtt_info(VTT), {'cues': 2, 'duration': 3725.75})
+        self.assertEqual(vtt_info(b'\xef\xbb\xbf' + VTT)['cues'], 2)
+        with self.assertRaisesRegex(ProbeError, 'missing WEBVTT header'):
+            vtt_info(b'1\n00:00:01,000 --> 00:00:02,000\n')
+        with self.assertRaisesRegex(ProbeError, 'invalid cue timing'):
+            vtt_info(b'WEBVTT\n\n00:01 --> soon\n')
+
+
+class BrokenFilterTests(VideosTestCase):
+    def test_probes_and_broken_filter(self):
+        videos = list(Video.objects.order_by('pk')[:3])
+        files = [
+            {'mp4': mp4_bytes(3730), 'vtt': VTT},  # fine: subtitles end within the video
+            {'mp4': mp4_bytes(600), 'vtt': VTT},  # subtitles run past the end
+            {'mp4': mp4_bytes(600)[:-10]},  # truncated upload
+        ]
+        with tempfile.TemporaryDirectory() as root, mock.patch.dict(os.environ, {'FS_PATH': root}):
+            for video, contents in zip(videos, files):
+                for ext, data in contents.items():
+                    with open(get_fs_path(video, ext), 'wb') as f:
+                        f.write(data)
+            self.assertEqual(refresh_probes([(v.pk, v.vid_url) for v in videos]), (5, 0))
+        probes = {(p.video_id, p.ext): p for p in MediaProbe.objects.all()}
+        self.assertEqual(probes[videos[0].pk, 'mp4'].duration, 3730)
+        self.assertEqual(probes[videos[0].pk, 'vtt'].details, {'cues': 2, 'duration': 3725.75})
+        self.assertEqual(probes[videos[1].pk, 'vtt'].mismatch, 'subtitles end at 3726s, video is 600s long')
+        self.assertIn('truncated', probes[videos[2].pk, 'mp4'].error)
+        broken = filter_broken(Video.objects.all(), {'broken': '1'})
+        self.assertEqual(sorted(broken.values_list('pk', flat=True)), [videos[1].pk, videos[2].pk])
+        self.assertEqual(filter_broken(Video.objects.all(), {}).count(), self.rows)
+        response = self.client.get(reverse('video_list') + '?broken=1')
+        self.assertEqual(sorted(v.pk for v, _ in response.context['rows']), [videos[1].pk, videos[2].pk])
+
+
+class ThumbnailTests(SimpleTestCase):
+    def test_remove_derivatives_only_removes_that_video(self):
+        base = 'https://www.kjv1611only.com/video/thumbs/'
+        paths = {
+            name: [derivative_path(base + name + '.mp4', width, fmt) for width in WIDTHS for fmt in FORMATS]
+            for name in ('12', '12.1', '123')
+        }
+        for path in sum(paths.values(), []):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'wb').close()
+        remove_derivatives(base + '12.mp4')
+        self.assertFalse(any(os.path.exists(path) for path in paths['12']))
+        self.assertTrue(all(os.path.exists(path) for path in paths['12.1'] + paths['123']))
+
+    def test_generate_leaves_no_temp_files(self):
+        vid_url = 'https://www.kjv1611only.com/video/thumbs/gen.mp4'
+        source = resolve_fs_path(vid_url, 'jpg')
+        os.makedirs(os.path.dirname(source), exist_ok=True)
+        Image.new('RGB', (1280, 720), 'navy').save(source)
+        self.assertEqual(generate_thumbnails(vid_url), len(WIDTHS) * len(FORMATS))
+        directory = os.path.dirname(derivative_path(vid_url, WIDTHS[0], 'jpg'))
+        names = [n for n in os.listdir(directory) if n.startswith('gen.')]
+        self.assertEqual(sorted(names), sorted(f'gen.{w}.{f}' for w in WIDTHS for f in FORMATS))
+        with Image.open(derivative_path(vid_url, 320, 'webp')) as image:
+            self.assertEqual(image.size, (320, 180))
+        with mock.patch.object(Image.Image, 'save', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                generate_thumbnails(vid_url, force=True)
+        self.assertEqual(sorted(n for n in os.listdir(directory) if n.startswith('gen.')), sorted(names))
+        self.assertFalse([n for n in os.listdir(directory) if n.endswith('.tmp')])
+
+
+class MetricsTests(SimpleTestCase):
+    def test_dead_worker_files_are_folded_into_retired_totals(self):
+        series = 'atp_fs_operations_total{op="unlink"}'
+        host = socket.gethostname()
+        with tempfile.TemporaryDirectory() as directory, override_settings(VIDEOS_METRICS_DIR=directory):
+            for pid, value in ((101, 2), (102, 3), (103, 4)):
+                with open(os.path.join(directory, f'{host}-{pid}.json'), 'w') as f:
+                    json.dump({series: value}, f)
+            before = collect()[series]
+            mark_process_dead(101, directory)
+            mark_process_dead(102, directory)
+            mark_process_dead(104, directory)
+            self.assertEqual(collect()[series], before)
+            self.assertEqual(
+                sorted(os.listdir(directory)), [f'{host}-103.json', f'{host}-retired.json', f'{host}-retired.lock'],
+            )
+
+    def test_exiting_processes_fold_their_files(self):
+        series = 'atp_fs_operations_total{op="unlink"}'
+        host = socket.gethostname()
+        context = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as directory, override_settings(VIDEOS_METRICS_DIR=directory):
+            before = collect().get(series, 0)
+            with ProcessPoolExecutor(2, mp_context=context) as pool:
+                list(pool.map(record_fs, ['unlink'] * 4, [0] * 4, [0.0] * 4))
+            processes = [context.Process(target=record_fs, args=('unlink', 0, 0.0)) for _ in range(3)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            self.assertEqual(collect()[series], before + 7)
+            self.assertEqual(sorted(os.listdir(directory)), [f'{host}-retired.json', f'{host}-retired.lock'])
+
+
+class QueryCountTests(VideosTestCase):
+    """Queries per request on each database; a change here is a regression unless it is intended."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # As after `refresh_facets` / `duplicates --refresh`, so requests do not refresh them.
+        refresh_facets()
+        refresh_groups('video_id')
+
+    def assertQueries(self, default, local, func):
+        with self.assertNumQueries(default, using='default'), self.assertNumQueries(local, using='local'):
+            return func()
+
+    def test_list_page(self):
+        url = reverse('video_list')
+        # COUNT + page; file status lookup and inserts, facet marker + one query per facet.
+        self.assertQueries(2, 9, lambda: self.client.get(url))
+        # Count and page keys come from the result cache.
+        self.assertQueries(1, 7, lambda: self.client.get(url))
+
+    def test_search(self):
+        self.assertQueries(2, 8, lambda: self.client.get(reverse('video_list') + '?q=grace&field=name'))
+
+    def test_duplicates_page(self):
+        self.assertQueries(1, 4, lambda: self.client.get(reverse('video_list') + '?duplicates=1'))
+
+    def test_edit_page_and_save(self):
+        video = Video.objects.get(pk=3)
+        url = reverse('video_update', args=[video.pk])
+        self.assertQueries(1, 1, lambda: self.client.get(url))
+        token = self.client.cookies['csrftoken'].value
+        response = self.assertQueries(5, 5, lambda: self.client.post(
+            url, self.form_data(video, clicks=video.clicks + 1, csrfmiddlewaretoken=token),
+        ))
+        self.assertEqual(response.status_code, 302)
+
+
+class QueryPlanTests(SimpleTestCase):
+    """The list, search and duplicates queries use the recommended indexes (index_advisor --check)."""
+
+    def test_index_advisor_check(self):
+        out = io.StringIO()
+        call_command('index_advisor', check=True, rows=2000, stdout=out, stderr=io.StringIO())
+        self.assertIn('Query plans OK.', out.getvalue())
+
+    def test_check_notices_missing_indexes(self):
+        with tempfile.TemporaryDirectory() as tmp, bench_database(Path(tmp) / 'videos.sqlite3') as using:
+            generate_videos(200, using)
+            self.assertTrue(regressions(using))
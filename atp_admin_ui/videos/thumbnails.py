@@ -0,0 +1,114 @@
+# videos/thumbnails.py
+"""Fixed-size thumbnail derivatives of each video's ``.jpg``.
+
+Derivatives are written under ``FS_PATH/.thumbs`` mirroring the media tree,
+one file per width and format (``<name>.320.webp``). They are regenerated
+by a ``thumbnails`` job when a thumbnail is uploaded, built on first request
+by ``VideoThumbnailView`` when missing, and back-filled for the whole
+catalogue by ``manage.py build_thumbnails``.
+"""
+import os
+import tempfile
+
+from PIL import Image
+
+from .jobs import task
+from .metrics import track_fs
+from .models import Video
+from .paths import resolve_fs_path
+from .uploads import FILE_MODE
+
+THUMBS_DIRNAME = '.thumbs'
+WIDTHS = (640, 320, 160)
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+CONTENT_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'jpg': {'quality': 80, 'optimize': True, 'progressive': True},
+}
+
+
+def derivative_path(vid_url, width, fmt):
+    source = resolve_fs_path(vid_url, 'jpg')
+    fs_path = os.getenv('FS_PATH', '/data')
+    rel = os.path.relpath(os.path.splitext(source)[0], fs_path)
+    return os.path.join(fs_path, THUMBS_DIRNAME, f'{rel}.{width}.{fmt}')
+
+
+def is_fresh(path, source_mtime):
+    try:
+        return os.stat(path).st_mtime >= source_mtime
+    except FileNotFoundError:
+        return False
+
+
+def _save(image, path, fmt):
+    # A unique temp name: the thumbnail view and the thumbnails job may write
+    # the same derivative at once, and each must rename only its own file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with track_fs('thumbnail_write'), os.fdopen(fd, 'wb') as f:
+            image.save(f, FORMATS[fmt], **SAVE_OPTIONS[fmt])
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def generate(vid_url, force=False):
+    """Write every missing or outdated derivative of a video; returns how many were written.
+
+    Raises FileNotFoundError when the video has no thumbnail.
+    """
+    source = resolve_fs_path(vid_url, 'jpg')
+    source_mtime = os.stat(source).st_mtime
+    todo = [
+        (width, fmt) for width in WIDTHS for fmt in FORMATS
+        if force or not is_fresh(derivative_path(vid_url, width, fmt), source_mtime)
+    ]
+    if not todo:
+        return 0
+    os.makedirs(os.path.dirname(derivative_path(vid_url, WIDTHS[0], 'jpg')), exist_ok=True)
+    with track_fs('thumbnail_read', os.path.getsize(source)), Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding; far cheaper than a full-size decode.
+        image.draft('RGB', (WIDTHS[0], image.height * WIDTHS[0] // image.width))
+        image = image.convert('RGB')
+    # Largest first, each size resized from the previous one.
+    for width in WIDTHS:
+        if image.width > width:
+            image = image.resize((width, max(1, image.height * width // image.width)), Image.LANCZOS)
+        for fmt in FORMATS:
+            if (width, fmt) in todo:
+                _save(image, derivative_path(vid_url, width, fmt), fmt)
+    return len(todo)
+
+
+def remove_derivatives(vid_url):
+    # Only the exact <stem>.<width>.<fmt> names: a prefix match would also
+    # take the derivatives of another video whose stem starts with this one.
+    paths = [derivative_path(vid_url, width, fmt) for width in WIDTHS for fmt in FORMATS]
+    directory = os.path.dirname(paths[0])
+    try:
+        names = set(os.listdir(directory))
+    except FileNotFoundError:
+        return
+    for path in paths:
+        if os.path.basename(path) in names:
+            with track_fs('unlink'):
+                os.remove(path)
+
+
+@task('thumbnails')
+def regenerate_thumbnails(job):
+    video = Video.objects.filter(pk=job.payload['video_id']).first()
+    if video is None:
+        job.advance(1, 'Video no longer exists, nothing to do.')
+        return
+    try:
+        written = generate(video.vid_url, force=True)
+    except FileNotFoundError:
+        job.advance(1, 'No thumbnail to resize.')
+        return
+    job.advance(1, f'{written} thumbnail derivatives written.')
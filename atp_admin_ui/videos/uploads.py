@@ -0,0 +1,150 @@
+# videos/uploads.py
+"""Streaming upload handling for media replacement.
+
+``StagedUploadHandler`` writes the request body straight into a temp file
+under ``FS_PATH`` while hashing it, so a replaced file is written once and
+``commit_upload`` can move it over the live path with an atomic
+``os.replace``. A failed or interrupted upload never touches the file that is
+being served.
+"""
+import errno
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+from .metrics import track_fs
+
+logger = logging.getLogger(__name__)
+
+STAGING_DIRNAME = '.uploads'
+
+
+def staging_dir():
+    path = os.path.join(os.getenv('FS_PATH', '/data'), STAGING_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@dataclass
+class UploadMetrics:
+    size: int
+    sha256: str
+    seconds: float
+
+    @property
+    def mb_per_second(self):
+        return self.size / (1024 * 1024) / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f'{self.size} bytes, sha256 {self.sha256}, {self.seconds:.2f}s at {self.mb_per_second:.1f} MB/s'
+
+
+class StagedUploadedFile(UploadedFile):
+    """An upload already on disk in the staging directory, with its checksum."""
+
+    def __init__(self, file, name, content_type, size, charset, content_type_extra, metrics):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.metrics = metrics
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # The file was committed with os.replace, nothing left to clean up.
+            pass
+
+
+class StagedUploadHandler(FileUploadHandler):
+    chunk_size = 1024 * 1024
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = tempfile.NamedTemporaryFile(dir=staging_dir(), suffix='.upload')
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.started = time.perf_counter()
+
+    def receive_data_chunk(self, raw_data, start):
+        with track_fs('upload_write', len(raw_data)):
+            self.file.write(raw_data)
+        self.hasher.update(raw_data)
+        self.size += len(raw_data)
+
+    def file_complete(self, file_size):
+        with track_fs('upload_fsync'):
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.file.seek(0)
+        metrics = UploadMetrics(self.size, self.hasher.hexdigest(), time.perf_counter() - self.started)
+        logger.info('Received %s: %s', self.file_name, metrics)
+        return StagedUploadedFile(
+            self.file, self.file_name, self.content_type, self.size,
+            self.charset, self.content_type_extra, metrics,
+        )
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            try:
+                self.file.close()
+            except FileNotFoundError:
+                pass
+
+
+def _read_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Temp files are created 0600; committed media must get normal permissions.
+FILE_MODE = 0o666 & ~_read_umask()
+
+
+def commit_upload(uploaded_file, path):
+    """Atomically put ``uploaded_file`` at ``path`` and return its metrics.
+
+    Staged uploads are renamed into place; anything else (or a staging
+    directory on another filesystem) is copied to a temp file next to
+    ``path`` first.
+    """
+    started = time.perf_counter()
+    if isinstance(uploaded_file, StagedUploadedFile):
+        source = uploaded_file.temporary_file_path()
+        try:
+            with track_fs('commit_rename', uploaded_file.size):
+                os.chmod(source, FILE_MODE)
+                os.replace(source, path)
+            return uploaded_file.metrics
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            uploaded_file.seek(0)
+
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.upload')
+    try:
+        with track_fs('commit_copy', uploaded_file.size), os.fdopen(fd, 'wb') as destination:
+            for chunk in uploaded_file.chunks():
+                destination.write(chunk)
+                hasher.update(chunk)
+                size += len(chunk)
+            destination.flush()
+            os.fsync(destination.fileno())
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return UploadMetrics(size, hasher.hexdigest(), time.perf_counter() - started)
+
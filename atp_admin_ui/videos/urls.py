@@ -1,7 +1,21 @@
+from django.conf import settings
 from django.urls import path, include
-from .views import VideoListView, VideoUpdateView
+from .views import (
+    VideoListView, VideoUpdateView, VideoResumableUploadView, VideoBulkActionView, JobListView, JobDetailView,
+    MetricsView, VideoThumbnailView, VideoExportView,
+)
+
+if settings.VIDEOS_ASYNC_VIEWS:
+    from .async_views import AsyncVideoListView as VideoListView, AsyncVideoUpdateView as VideoUpdateView
 
 urlpatterns = [
     path('', VideoListView.as_view(), name='video_list'),
+    path('export/', VideoExportView.as_view(), name='video_export'),
     path('<int:pk>/', VideoUpdateView.as_view(), name='video_update'),
+    path('<int:pk>/upload/<str:ext>/', VideoResumableUploadView.as_view(), name='video_resumable_upload'),
+    path('<int:pk>/thumb/<int:width>.<str:fmt>', VideoThumbnailView.as_view(), name='video_thumbnail'),
+    path('bulk/', VideoBulkActionView.as_view(), name='video_bulk'),
+    path('jobs/', JobListView.as_view(), name='job_list'),
+    path('jobs/<int:pk>/', JobDetailView.as_view(), name='job_detail'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,75 +1,185 @@
 # videos/views.py
 import os
-import json
-from datetime import datetime
 from django.urls import reverse, reverse_lazy
-from django.views.generic import ListView, UpdateView, DeleteView
+from django.views.generic import ListView, UpdateView, DeleteView, DetailView, View
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.db.models.fields import CharField, TextField, IntegerField, BigIntegerField
-from django.db.models import Count
-from collections import defaultdict
+from django.core.paginator import Paginator
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.contrib import messages
-from .models import Video
+from django.core.exceptions import BadRequest, ValidationError
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date
+from .models import Video, Job
 from .forms import VideoForm
 from .mappings import DB_FIELDS
+from .search import RankedResults, get_search_backend
+from .pagination import CursorPaginator, CursorPage, InvalidCursor
+from .uploads import StagedUploadHandler, commit_upload
+from .resumable import RESUMABLE_EXTENSIONS, ResumableUpload, UploadError, check_token, iter_body, upload_token
+from .duplicates import DUPLICATE_KEYS, KEY_FIELDS, get_groups, invalidate_groups, videos_for_groups, last_refreshed
+from .paths import MEDIA_EXTENSIONS, get_fs_path, resolve_fs_path
+from .jobs import enqueue
+from .filestatus import attach_file_status, invalidate_file_status
+from .bulk import ACTIONS, EDITABLE_FIELDS, start_bulk_job
+from .columns import COOKIE_NAME, build_rows, default_columns, parse_columns, project
+from .resultcache import get_cache, invalidate_results, load_page, lookup, query_key, stats as result_cache_stats, store
+from .metrics import collect, render_prometheus
+from .sidecars import loads
+from .export import EXPORT_FORMATS, export_stream
+from .media import PROBED_EXTENSIONS, filter_broken, probes_for, queue_probe, remove_probes
+from .facets import FACET_FIELDS, facet_panel, facet_query, facet_rows, filter_facets, record_change, selected_facets
+from .thumbnails import CONTENT_TYPES, FORMATS, WIDTHS, derivative_path, generate as generate_thumbnails
 
-def get_fs_path(video, ext='mp4'):
-    base_url = os.getenv('BASE_SITE_URL', 'https://www.kjv1611only.com/')
-    rel_path = video.vid_url.replace(base_url, '')
-    base_fs = os.getenv('FS_PATH', '/data')
-    full_path = os.path.join(base_fs, rel_path)
-    if ext != 'mp4':
-        full_path = os.path.splitext(full_path)[0] + '.' + ext
-    dir_path = os.path.dirname(full_path)
-    if not os.path.exists(dir_path):
-        os.makedirs(dir_path)
-    return full_path
 
 class VideoListView(ListView):
     model = Video
     template_name = 'videos/list.html'
     paginate_by = 50
     ordering = ['-created_at']
+    duplicate_groups_per_page = 25
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        if self.request.GET.get('duplicates'):
+            # The duplicates page lists groups instead of the normal list.
+            return Video.objects.none()
+        queryset = project(super().get_queryset(), self.visible_columns())
         q = self.request.GET.get('q')
         field = self.request.GET.get('field', 'video_id')
+        queryset = filter_facets(queryset, self.request.GET)
+        queryset = filter_broken(queryset, self.request.GET)
         if q and field in DB_FIELDS:
-            try:
-                model_field = Video._meta.get_field(field)
-                if isinstance(model_field, (CharField, TextField)):
-                    filter_kwargs = {f'{field}__icontains': q}
-                elif isinstance(model_field, (IntegerField, BigIntegerField)):
-                    filter_kwargs = {field: int(q)}
-                else:
-                    return queryset
-                queryset = queryset.filter(**filter_kwargs)
-            except:
-                pass
+            queryset = get_search_backend().search(queryset, field, q)
         return queryset
 
+    def visible_columns(self):
+        if not hasattr(self, '_columns'):
+            if 'columns' in self.request.GET:
+                self._columns = parse_columns(','.join(self.request.GET.getlist('columns')))
+            else:
+                self._columns = parse_columns(self.request.COOKIES.get(COOKIE_NAME))
+            self._columns = self._columns or default_columns()
+        return self._columns
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        if 'columns' in self.request.GET:
+            response.set_cookie(COOKIE_NAME, ','.join(self.visible_columns()), max_age=365 * 24 * 3600, samesite='Lax')
+        return response
+
+    def cursor_mode(self):
+        paging = self.request.GET.get('paging', getattr(settings, 'VIDEOS_PAGINATION', 'page'))
+        return paging == 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        # Ranked search results are already a list of keys; only querysets can
+        # seek, and only querysets are worth caching.
+        if not isinstance(queryset, QuerySet):
+            return super().paginate_queryset(queryset, page_size)
+        if self.cursor_mode():
+            return self.paginate_cursor(queryset, page_size)
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        key = query_key(queryset, page_size, page.number) if get_cache() is not None else None
+        if key:
+            pks = lookup(key)
+            if pks is None:
+                page.object_list = list(page.object_list)
+                store(key, [video.pk for video in page.object_list])
+            else:
+                page.object_list = load_page(queryset, pks)
+        return (paginator, page, page.object_list, is_paginated)
+
+    def paginate_cursor(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        cursor = self.request.GET.get('cursor')
+        key = query_key(paginator.queryset, page_size, cursor) if get_cache() is not None else None
+        cached = lookup(key) if key else None
+        if cached:
+            pks, has_next, has_previous = cached
+            page = CursorPage(load_page(paginator.queryset, pks), paginator, has_next, has_previous)
+        else:
+            try:
+                page = paginator.page(cursor)
+            except InvalidCursor:
+                raise BadRequest(f"Invalid cursor: {cursor}")
+            if key:
+                store(key, ([video.pk for video in page.object_list], page.has_next(), page.has_previous()))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        key = query_key(queryset, 'count') if isinstance(queryset, QuerySet) and get_cache() is not None else None
+        if key:
+            count = lookup(key)
+            if count is None:
+                count = paginator.count
+                store(key, count)
+            # Paginator.count is a cached_property.
+            paginator.count = count
+        return paginator
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['cursor_mode'] = isinstance(context.get('paginator'), CursorPaginator)
         context['fields'] = DB_FIELDS
         context['selected_field'] = self.request.GET.get('field', 'video_id')
         context['q'] = self.request.GET.get('q', '')
+        context['file_extensions'] = MEDIA_EXTENSIONS
+        context['bulk_actions'] = ACTIONS
+        context['bulk_fields'] = EDITABLE_FIELDS
+        context['result_cache_stats'] = result_cache_stats()
+        context['export_formats'] = EXPORT_FORMATS
+        context['selected_facets'] = selected_facets(self.request.GET)
+        context['broken'] = self.request.GET.get('broken') == '1'
+        context['filter_query'] = facet_query(self.request.GET) + ('&broken=1' if context['broken'] else '')
 
         if self.request.GET.get('duplicates'):
-            # Find duplicates based on video_id, group by video_id, sort groups by newest created_at in each
-            duplicates_qs = Video.objects.values('video_id').annotate(count=Count('video_id')).filter(count__gt=1)
-            duplicate_ids = [d['video_id'] for d in duplicates_qs]
-            duplicates = Video.objects.filter(video_id__in=duplicate_ids).order_by('video_id', '-created_at')
-            grouped_duplicates = defaultdict(list)
-            for video in duplicates:
-                grouped_duplicates[video.video_id].append(video)
-            context['grouped_duplicates'] = dict(grouped_duplicates)
+            key_name = self.request.GET.get('key', 'video_id')
+            if key_name not in DUPLICATE_KEYS:
+                key_name = 'video_id'
+            groups_page = Paginator(get_groups(key_name), self.duplicate_groups_per_page).get_page(
+                self.request.GET.get('dup_page')
+            )
+            context['grouped_duplicates'] = videos_for_groups(key_name, [g.key for g in groups_page])
+            context['duplicate_groups_page'] = groups_page
+            context['duplicate_keys'] = DUPLICATE_KEYS
+            context['duplicate_key'] = key_name
+            context['duplicate_key_label'] = DUPLICATE_KEYS[key_name]
+            context['duplicates_refreshed'] = last_refreshed(key_name)
             context['show_duplicates'] = True
         else:
+            videos = attach_file_status(context['object_list'])
+            context['columns'] = self.visible_columns()
+            context['rows'] = build_rows(videos, context['columns'])
+            context['facets'] = facet_panel(self.request.GET)
             context['show_duplicates'] = False
 
         return context
 
+
+class VideoExportView(VideoListView):
+    """The current list or search results as a CSV or JSON Lines download, optionally gzipped."""
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f"Unknown export format, use one of: {', '.join(EXPORT_FORMATS)}")
+        compress = request.GET.get('compress') == 'gzip'
+        filename = f"videos-{timezone.now():%Y%m%d-%H%M%S}.{fmt}{'.gz' if compress else ''}"
+        response = StreamingHttpResponse(
+            export_stream(self.get_queryset(), fmt, compress),
+            content_type='application/gzip' if compress else EXPORT_FORMATS[fmt],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+# CSRF is checked in _post, once the upload handler is in place.
+@method_decorator(csrf_exempt, name='dispatch')
 class VideoUpdateView(UpdateView):
     model = Video
     form_class = VideoForm
@@ -77,6 +187,13 @@ class VideoUpdateView(UpdateView):
     pk_url_kwarg = 'pk'
 
     def post(self, request, *args, **kwargs):
+        # Uploads must stream to FS_PATH, so the handler has to be installed
+        # before anything (including the CSRF check) reads request.POST.
+        request.upload_handlers.insert(0, StagedUploadHandler(request))
+        return self._post(request, *args, **kwargs)
+
+    @method_decorator(csrf_protect)
+    def _post(self, request, *args, **kwargs):
         self.object = self.get_object()
         if 'delete_video' in request.POST:
             return self.delete_file('mp4')
@@ -95,18 +212,25 @@ class VideoUpdateView(UpdateView):
         else:
             return super().post(request, *args, **kwargs)
 
+    def queue_file_deletion(self, exts):
+        job = enqueue(
+            'delete_files',
+            {'video_id': self.object.id, 'vid_url': self.object.vid_url, 'exts': exts},
+            key=f"delete_files:{self.object.id}:{','.join(exts)}", total=len(exts),
+        )
+        for ext in exts:
+            path = resolve_fs_path(self.object.vid_url, ext)
+            messages.info(self.request, f"Queued deletion of {ext.upper()} file at: {path} (job #{job.pk})")
+        return job
+
     def delete_file(self, ext):
         try:
-            path = get_fs_path(self.object, ext)
-            messages.info(self.request, f"Attempting to delete {ext.upper()} file at: {path}")
-            if os.path.exists(path):
-                os.remove(path)
-                messages.success(self.request, f"{ext.upper()} file deleted successfully from: {path}")
-            else:
-                messages.warning(self.request, f"{ext.upper()} file not found at: {path}")
+            self.queue_file_deletion([ext])
             if ext == 'jpg':
                 self.object.thumb_url = None
                 self.object.save()
+                get_search_backend().update(self.object)
+                invalidate_results()
                 messages.success(self.request, "Thumbnail URL cleared in database.")
         except Exception as e:
             messages.error(self.request, f"Error deleting {ext.upper()} file: {str(e)}")
@@ -114,18 +238,16 @@ class VideoUpdateView(UpdateView):
 
     def delete_all(self):
         try:
-            extensions = ['mp4', 'mp3', 'vtt', 'jpg', 'json']
-            for ext in extensions:
-                path = get_fs_path(self.object, ext)
-                messages.info(self.request, f"Attempting to delete {ext.upper()} file at: {path}")
-                if os.path.exists(path):
-                    os.remove(path)
-                    messages.success(self.request, f"{ext.upper()} file deleted successfully from: {path}")
-                else:
-                    messages.warning(self.request, f"{ext.upper()} file not found at: {path}")
+            self.queue_file_deletion(MEDIA_EXTENSIONS)
             messages.info(self.request, f"Deleting database entry for video ID: {self.object.id}")
+            pk = self.object.pk
             self.object.delete()
-            messages.success(self.request, "All files and database entry deleted successfully.")
+            get_search_backend().remove(pk)
+            invalidate_results()
+            record_change(removed=facet_rows([self.object]))
+            invalidate_groups()
+            remove_probes([pk])
+            messages.success(self.request, "Database entry deleted; file deletion queued.")
         except Exception as e:
             messages.error(self.request, f"Error deleting all files and entry: {str(e)}")
         return redirect(self.get_success_url())
@@ -133,12 +255,32 @@ class VideoUpdateView(UpdateView):
     def delete_db_only(self):
         try:
             messages.info(self.request, f"Deleting database entry for video ID: {self.object.id} (files remain intact)")
+            pk = self.object.pk
             self.object.delete()
+            get_search_backend().remove(pk)
+            invalidate_results()
+            record_change(removed=facet_rows([self.object]))
+            invalidate_groups()
+            remove_probes([pk])
+            invalidate_file_status(pk)
             messages.success(self.request, "Database entry deleted successfully.")
         except Exception as e:
             messages.error(self.request, f"Error deleting database entry: {str(e)}")
         return redirect(self.get_success_url())
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            context['thumbnail_version'] = int(os.stat(resolve_fs_path(self.object.vid_url, 'jpg')).st_mtime)
+        except OSError:
+            context['thumbnail_version'] = None
+        context['media_probes'] = probes_for(self.object)
+        context['resumable_uploads'] = [
+            (ext, reverse('video_resumable_upload', args=[self.object.pk, ext]), upload_token(self.object.pk, ext))
+            for ext in RESUMABLE_EXTENSIONS
+        ]
+        return context
+
     def get_success_url(self):
         return reverse('video_list')
 
@@ -150,13 +292,12 @@ class VideoUpdateView(UpdateView):
                 json_file = self.request.FILES['json_file']
                 json_path = get_fs_path(instance, 'json')
                 messages.info(self.request, f"Uploading JSON file to: {json_path}")
-                with open(json_path, 'wb+') as destination:
-                    for chunk in json_file.chunks():
-                        destination.write(chunk)
-                messages.success(self.request, f"JSON file uploaded successfully to: {json_path}")
+                # Parse before committing so an invalid file never replaces the sidecar.
+                data = loads(json_file.read())
+                json_file.seek(0)
+                metrics = commit_upload(json_file, json_path)
+                messages.success(self.request, f"JSON file uploaded successfully to: {json_path} ({metrics})")
                 # Update DB from JSON
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
                 sql_params = data.get('sql_params', {})
                 for k, v in sql_params.items():
                     if k != 'id' and k in DB_FIELDS:
@@ -166,21 +307,19 @@ class VideoUpdateView(UpdateView):
                 thumb_file = self.request.FILES['thumb_file']
                 thumb_path = get_fs_path(instance, 'jpg')
                 messages.info(self.request, f"Uploading thumbnail to: {thumb_path}")
-                with open(thumb_path, 'wb+') as destination:
-                    for chunk in thumb_file.chunks():
-                        destination.write(chunk)
-                messages.success(self.request, f"Thumbnail uploaded successfully to: {thumb_path}")
+                metrics = commit_upload(thumb_file, thumb_path)
+                messages.success(self.request, f"Thumbnail uploaded successfully to: {thumb_path} ({metrics})")
                 instance.thumb_url = instance.vid_url.rsplit('.mp4', 1)[0] + '.jpg'
                 messages.success(self.request, f"Thumbnail URL updated in database to: {instance.thumb_url}")
+                job = enqueue('thumbnails', {'video_id': instance.id}, key=f'thumbnails:{instance.id}')
+                messages.info(self.request, f"Queued thumbnail resizing (job #{job.pk})")
             if 'video_file' in self.request.FILES:
                 video_file = self.request.FILES['video_file']
                 video_path = get_fs_path(instance, 'mp4')
                 messages.info(self.request, f"Replacing video file at: {video_path}")
                 try:
-                    with open(video_path, 'wb') as destination:  # ← 'wb' instead of 'wb+'
-                            for chunk in video_file.chunks():
-                                destination.write(chunk)
-                    messages.success(self.request, f"Video file successfully replaced at: {video_path}")
+                    metrics = commit_upload(video_file, video_path)
+                    messages.success(self.request, f"Video file successfully replaced at: {video_path} ({metrics})")
                 except Exception as e:
                     messages.error(self.request, f"Failed to write video file: {str(e)}")
             
@@ -189,77 +328,244 @@ class VideoUpdateView(UpdateView):
                 audio_path = get_fs_path(instance, 'mp3')
                 messages.info(self.request, f"Replacing audio file → {audio_path}")
                 try:
-                    with open(audio_path, 'wb') as f:  # ← 'wb' instead of 'wb+' → truncates old file
-                        for chunk in audio_file.chunks():
-                            f.write(chunk)
+                    metrics = commit_upload(audio_file, audio_path)
                     messages.success(
                         self.request,
-                        f"✓ Audio file successfully replaced at: {audio_path} "
-                        f"({audio_file.size} bytes written)"
+                        f"✓ Audio file successfully replaced at: {audio_path} ({metrics})"
                     )
                 except Exception as e:
                     messages.error(self.request, f"✗ Failed to replace audio file: {str(e)}")
             elif form.cleaned_data['audio_delete']:
-                audio_path = get_fs_path(instance, 'mp3')
-                messages.info(self.request, f"Deleting audio file at: {audio_path}")
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
-                    messages.success(self.request, f"Audio file deleted successfully from: {audio_path}")
-                else:
-                    messages.warning(self.request, f"Audio file not found at: {audio_path}")
+                self.queue_file_deletion(['mp3'])
             if 'vtt_file' in self.request.FILES:
                 vtt_file = self.request.FILES['vtt_file']
                 vtt_path = get_fs_path(instance, 'vtt')
                 messages.info(self.request, f"Replacing VTT file at: {vtt_path}")
-                with open(vtt_path, 'wb+') as destination:
-                    for chunk in vtt_file.chunks():
-                        destination.write(chunk)
-                messages.success(self.request, f"VTT file replaced successfully at: {vtt_path}")
+                metrics = commit_upload(vtt_file, vtt_path)
+                messages.success(self.request, f"VTT file replaced successfully at: {vtt_path} ({metrics})")
             elif form.cleaned_data['vtt_delete']:
-                vtt_path = get_fs_path(instance, 'vtt')
-                messages.info(self.request, f"Deleting VTT file at: {vtt_path}")
-                if os.path.exists(vtt_path):
-                    os.remove(vtt_path)
-                    messages.success(self.request, f"VTT file deleted successfully from: {vtt_path}")
-                else:
-                    messages.warning(self.request, f"VTT file not found at: {vtt_path}")
+                self.queue_file_deletion(['vtt'])
             messages.info(self.request, "Saving changes to database...")
+            # The form has already applied its changes to the instance.
+            before = list(Video.objects.filter(pk=instance.pk).values_list(*FACET_FIELDS))
             instance.save()
+            get_search_backend().update(instance)
+            invalidate_results()
+            record_change(removed=before, added=facet_rows([instance]))
+            if KEY_FIELDS.intersection(form.changed_data):
+                invalidate_groups()
             messages.success(self.request, "Database changes saved successfully.")
-            # Now update or create JSON
-            json_path = get_fs_path(instance, 'json')
-            messages.info(self.request, f"Updating/Creating JSON file at: {json_path}")
-            if os.path.exists(json_path):
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                data['sql_params'] = {f: getattr(instance, f) for f in DB_FIELDS}
-                with open(json_path, 'w') as f:
-                    json.dump(data, f, indent=4)
-                messages.success(self.request, f"JSON file updated successfully at: {json_path}")
-            else:
-                rel_path = instance.vid_url.replace(os.getenv('BASE_SITE_URL', 'https://www.kjv1611only.com/'), '')
-                target_filename = os.path.basename(instance.vid_url)
-                try:
-                    dt = datetime.strptime(instance.date, '%Y-%m-%d %H:%M:%S') if instance.date else None
-                    us_mdY = dt.strftime('%m/%d/%Y') if dt else None
-                except ValueError:
-                    us_mdY = None
-                data = {
-                    "original_filename": target_filename,
-                    "target_filename": target_filename,
-                    "target_directory_relative": os.path.dirname(rel_path),
-                    "original_vtt_filename": None,
-                    "uploader": instance.main_category.split('(')[-1].rstrip(')') if instance.main_category else "Unknown",
-                    "target_vtt_filename": target_filename.rsplit('.mp4', 1)[0] + '.vtt',
-                    "sql_params": {f: getattr(instance, f) for f in DB_FIELDS},
-                    "title": instance.name,
-                    "us_mdY": us_mdY,
-                    "error": None
-                }
-                with open(json_path, 'w') as f:
-                    json.dump(data, f, indent=4)
-                messages.success(self.request, f"JSON file created successfully at: {json_path}")
+            # The sidecar is rewritten from the saved row off the request path.
+            job = enqueue('sidecar', {'video_id': instance.id}, key=f'sidecar:{instance.id}')
+            messages.info(self.request, f"Queued JSON file update at: {get_fs_path(instance, 'json')} (job #{job.pk})")
+            if any(f'{name}_file' in self.request.FILES for name in ('video', 'audio', 'vtt')):
+                job = queue_probe(instance)
+                messages.info(self.request, f"Queued media check of the uploaded files (job #{job.pk})")
         except Exception as e:
             messages.error(self.request, f"Error during form validation or file operations: {str(e)}")
             return self.form_invalid(form)
-        return super().form_valid(form)
\ No newline at end of file
+        finally:
+            invalidate_file_status(self.object.id)
+        return super().form_valid(form)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class VideoResumableUploadView(View):
+    """tus-style resumable upload of one media file of a video.
+
+    POST (Upload-Length) starts an upload, HEAD reports Upload-Offset, PATCH
+    (Upload-Offset + application/offset+octet-stream body) writes a chunk and
+    DELETE discards it. Unlike strict tus, PATCH accepts any offset inside the
+    upload so chunks can be sent in parallel; Upload-Offset in responses is
+    always the contiguous prefix received so far.
+
+    tus clients send no CSRF token, so every request but OPTIONS must carry
+    the X-Upload-Token shown on the edit page instead.
+    """
+    tus_version = '1.0.0'
+
+    def dispatch(self, request, *args, **kwargs):
+        if kwargs['ext'] not in RESUMABLE_EXTENSIONS:
+            raise Http404(f"Unsupported extension: {kwargs['ext']}")
+        if request.method != 'OPTIONS' and not check_token(
+                request.headers.get('X-Upload-Token', ''), kwargs['pk'], kwargs['ext']):
+            return self.tus_response(403)
+        self.object = get_object_or_404(Video, pk=kwargs['pk'])
+        self.upload = ResumableUpload(get_fs_path(self.object, kwargs['ext']))
+        return super().dispatch(request, *args, **kwargs)
+
+    def tus_response(self, status, **headers):
+        response = HttpResponse(status=status)
+        response['Tus-Resumable'] = self.tus_version
+        for name, value in headers.items():
+            response[name.replace('_', '-')] = str(value)
+        return response
+
+    def options(self, request, *args, **kwargs):
+        return self.tus_response(
+            204, Tus_Version=self.tus_version, Tus_Extension='creation,termination',
+            Allow='OPTIONS, HEAD, POST, PATCH, DELETE',
+        )
+
+    def head(self, request, *args, **kwargs):
+        if not self.upload.exists():
+            return self.tus_response(404)
+        return self.tus_response(
+            200, Upload_Offset=self.upload.offset, Upload_Length=self.upload.length, Cache_Control='no-store',
+        )
+
+    def post(self, request, *args, **kwargs):
+        try:
+            length = int(request.headers['Upload-Length'])
+            self.upload.create(length)
+        except (KeyError, ValueError, UploadError) as e:
+            return HttpResponseBadRequest(f"Invalid Upload-Length: {e}")
+        if length == 0:
+            self.complete()
+        return self.tus_response(201, Location=request.path, Upload_Offset=0)
+
+    def patch(self, request, *args, **kwargs):
+        if request.content_type != 'application/offset+octet-stream':
+            return self.tus_response(415)
+        if not self.upload.exists():
+            return self.tus_response(404)
+        try:
+            self.upload.write(int(request.headers['Upload-Offset']), iter_body(request))
+        except (KeyError, ValueError, UploadError) as e:
+            return HttpResponseBadRequest(f"Invalid chunk: {e}")
+        except OSError as e:
+            # Client went away mid-chunk; what arrived is kept for resuming.
+            return HttpResponseBadRequest(f"Upload interrupted: {e}")
+        offset = self.upload.offset
+        if self.upload.is_complete():
+            self.complete()
+        return self.tus_response(204, Upload_Offset=offset)
+
+    def delete(self, request, *args, **kwargs):
+        self.upload.abort()
+        return self.tus_response(204)
+
+    def complete(self):
+        finished = self.upload.finish()
+        invalidate_file_status(self.object.id)
+        if finished and self.kwargs['ext'] in PROBED_EXTENSIONS:
+            queue_probe(self.object)
+        if finished and self.kwargs['ext'] == 'jpg':
+            self.object.thumb_url = self.object.vid_url.rsplit('.mp4', 1)[0] + '.jpg'
+            self.object.save()
+            get_search_backend().update(self.object)
+            invalidate_results()
+            enqueue('thumbnails', {'video_id': self.object.id}, key=f'thumbnails:{self.object.id}')
+
+
+class VideoThumbnailView(View):
+    """A resized thumbnail of a video, generated on first request if missing.
+
+    Links add ``?v=<thumbnail mtime>``, so those URLs change whenever the
+    thumbnail does and can be cached for a year; others revalidate hourly.
+    """
+
+    def get(self, request, pk, width, fmt):
+        if width not in WIDTHS or fmt not in FORMATS:
+            raise Http404(f"No {width}px {fmt} thumbnails")
+        vid_url = Video.objects.filter(pk=pk).values_list('vid_url', flat=True).first()
+        if vid_url is None:
+            raise Http404("No video found matching the query")
+        path = derivative_path(vid_url, width, fmt)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            try:
+                generate_thumbnails(vid_url)
+            except FileNotFoundError:
+                raise Http404("Video has no thumbnail")
+            stat = os.stat(path)
+
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = FileResponse(open(path, 'rb'), content_type=CONTENT_TYPES[fmt])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if 'v' in request.GET:
+            patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=3600)
+        return response
+
+
+class VideoBulkActionView(View):
+    """Start a bulk action on the selected videos, or on every result of the current search.
+
+    ``scope=search`` needs a search or filter, so it can never mean the whole
+    catalogue, and the number of matches the page showed (``expected_count``),
+    so rows that started matching since are not acted on unseen.
+    """
+
+    def post(self, request, *args, **kwargs):
+        if request.POST.get('scope') == 'search':
+            queryset = filter_broken(filter_facets(Video.objects.all(), request.POST), request.POST)
+            q = request.POST.get('q')
+            field = request.POST.get('field', 'video_id')
+            searching = bool(q) and field in DB_FIELDS
+            if not (searching or selected_facets(request.POST) or request.POST.get('broken') == '1'):
+                messages.error(request, "Bulk action not started: search or filter the list before acting on all matches.")
+                return redirect('video_list')
+            if searching:
+                queryset = get_search_backend().search(queryset, field, q)
+            if isinstance(queryset, RankedResults):
+                # Ranked hits, already restricted to the facet and broken filters.
+                ids = list(queryset.pks)
+            else:
+                ids = list(queryset.values_list('pk', flat=True))
+            if request.POST.get('expected_count') != str(len(ids)):
+                messages.error(
+                    request, f"Bulk action not started: the search now matches {len(ids)} videos, not "
+                    f"{request.POST.get('expected_count') or 'the number shown'}; check the list and try again.",
+                )
+                return redirect('video_list')
+        else:
+            ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+        try:
+            job = start_bulk_job(
+                request.POST.get('action'), ids,
+                field=request.POST.get('bulk_field'), value=request.POST.get('bulk_value', ''),
+            )
+        except ValidationError as e:
+            messages.error(request, f"Bulk action not started: {' '.join(e.messages)}")
+            return redirect('video_list')
+        messages.info(request, f"Started {ACTIONS[request.POST['action']].lower()} for {job.total} videos.")
+        return redirect('job_detail', pk=job.pk)
+
+
+class JobListView(ListView):
+    model = Job
+    template_name = 'videos/jobs.html'
+    paginate_by = 50
+    ordering = ['-pk']
+
+    def get_queryset(self):
+        queryset = super().get_queryset().defer('payload', 'log')
+        status = self.request.GET.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['statuses'] = [s for s, _ in Job.STATUS_CHOICES]
+        context['status'] = self.request.GET.get('status', '')
+        return context
+
+
+class JobDetailView(DetailView):
+    model = Job
+    template_name = 'videos/job.html'
+
+
+class MetricsView(View):
+    """Request, SQL, template and filesystem totals in Prometheus text format."""
+
+    def get(self, request, *args, **kwargs):
+        # Result cache hits and misses are among the totals.
+        return HttpResponse(render_prometheus(collect()), content_type='text/plain; version=0.0.4')